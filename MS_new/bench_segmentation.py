@@ -0,0 +1,102 @@
+"""
+实例分割吞吐量基准测试（CPU）。
+
+对比以下配置的每秒处理图像数:
+- per_call: 每次调用都重新创建模型（原实现）
+- resident: 常驻模型，不合并批次
+- batched: 常驻模型，并发请求合并成动态批次
+- 以及可选的 TorchScript / 动态int8量化 版本
+
+用法（在MS_new目录执行）:
+    python bench_segmentation.py --images 32 --concurrency 4 --batch 4 --threads 4 --quantize --torchscript
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import torch
+from torchvision.models.detection import maskrcnn_resnet50_fpn
+
+from segmentation import SegmentationService
+
+
+def load_images(folder, count, size):
+    """从文件夹读取图像，不足时用随机图像补齐"""
+    images = []
+    if os.path.isdir(folder):
+        for name in sorted(os.listdir(folder)):
+            if name.lower().endswith(('.jpg', '.png', '.jpeg')):
+                image = cv2.imread(os.path.join(folder, name))
+                if image is not None:
+                    images.append(cv2.resize(image, (size[1], size[0])))
+            if len(images) >= count:
+                break
+    rng = np.random.default_rng(0)
+    while len(images) < count:
+        images.append(rng.integers(0, 256, (size[0], size[1], 3), dtype=np.uint8))
+    return images
+
+
+def per_call(image):
+    """原实现：每次调用都创建并加载模型"""
+    model = maskrcnn_resnet50_fpn(pretrained=True)
+    model.eval()
+    tensor = torch.from_numpy(image).permute(2, 0, 1).float() / 255.0
+    with torch.no_grad():
+        model(tensor.unsqueeze(0))
+
+
+def run(segment, images, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(lambda image: segment(image.copy()), images))
+    return len(images) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='实例分割吞吐量基准测试')
+    parser.add_argument('--input', default='images', help='图像文件夹，图像不足时用随机图像补齐')
+    parser.add_argument('--images', type=int, default=16, help='每种配置处理的图像数')
+    parser.add_argument('--size', type=int, nargs=2, default=[480, 640], help='图像高、宽')
+    parser.add_argument('--concurrency', type=int, default=4, help='并发请求数')
+    parser.add_argument('--batch', type=int, default=4, help='batched配置的最大批大小')
+    parser.add_argument('--wait', type=float, default=10, help='凑批的最长等待时间（毫秒）')
+    parser.add_argument('--threads', type=int, default=None, help='torch计算线程数')
+    parser.add_argument('--per-call-images', type=int, default=2, help='per_call配置处理的图像数（很慢）')
+    parser.add_argument('--torchscript', action='store_true', help='同时测试TorchScript模型')
+    parser.add_argument('--quantize', action='store_true', help='同时测试动态int8量化模型')
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    images = load_images(args.input, args.images, args.size)
+    results = []
+
+    if args.per_call_images:
+        results.append(('per_call', run(per_call, images[:args.per_call_images], 1)))
+
+    configs = [('resident', dict(max_batch=1)), ('batched', dict(max_batch=args.batch))]
+    if args.quantize:
+        configs.append(('batched+int8', dict(max_batch=args.batch, quantize=True)))
+    if args.torchscript:
+        configs.append(('batched+torchscript', dict(max_batch=args.batch, torchscript=True)))
+
+    for name, options in configs:
+        service = SegmentationService(max_wait=args.wait / 1000, threads=args.threads,
+                                      device='cpu', **options)
+        service.warmup(tuple(args.size))
+        concurrency = 1 if options['max_batch'] == 1 else args.concurrency
+        throughput = run(service.segment, images, concurrency)
+        results.append((name, throughput))
+        print(f"{name}: 平均批大小 {service.stats()['avg_batch_size']:.2f}")
+
+    print(f"{'配置':<24}{'图像/秒':>10}")
+    for name, throughput in results:
+        print(f"{name:<24}{throughput:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,26 @@
 import random
+import threading
 import cv2
 import numpy as np
-from torchvision.models.detection import maskrcnn_resnet50_fpn
-import torch
+from segmentation import SegmentationService
+
+_segmentation_service = None # 常驻的实例分割服务，每个从节点进程一个
+_segmentation_lock = threading.Lock()
+
+def init_segmentation(**options):
+    """
+    创建并预热实例分割服务，从节点启动时调用一次。
+
+    Args:
+        **options: 传给SegmentationService的参数（批大小、等待时间、线程数、TorchScript、量化）
+    """
+    global _segmentation_service
+    with _segmentation_lock:
+        if _segmentation_service is None:
+            service = SegmentationService(**options)
+            service.warmup()
+            _segmentation_service = service
+    return _segmentation_service
 
 def random_crop(image):
     height, width = image.shape[:2]
@@ -32,27 +50,9 @@ def add_noise(image):
     return noisy.astype(np.uint8)
 
 def instance_segmentation(image):
-    # 使用预训练的Mask R-CNN模型
-    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-    model = maskrcnn_resnet50_fpn(pretrained=True)
-    model.eval()
-    model.to(device)
-    
-    # 预处理图像
-    image_tensor = torch.from_numpy(image).permute(2, 0, 1).float() / 255.0
-    image_tensor = image_tensor.unsqueeze(0).to(device)
-    
-    # 进行实例分割
-    with torch.no_grad():
-        prediction = model(image_tensor)
-    
-    # 在原图上绘制分割结果
-    masks = prediction[0]['masks']
-    if len(masks) > 0:
-        mask = masks[0, 0].cpu().numpy()
-        image[mask > 0.5] = [255, 0, 0]  # 用红色标记第一个检测到的对象
-    
-    return image
+    # 使用常驻的Mask R-CNN模型，并发的分割请求在服务中合并成批次推理
+    service = _segmentation_service or init_segmentation()
+    return service.segment(image)
 
 def random_processing(image):
     methods = [random_crop, add_noise, instance_segmentation]
@@ -1,6 +1,18 @@
+import bisect
+import hashlib
+import logging
+import math
 import random
 from collections import defaultdict
 
+logger = logging.getLogger(__name__)
+
+
+def stable_hash(key):
+    """与进程无关的64位哈希（内置hash()对字符串加了随机盐，每个进程结果不同）"""
+    return int.from_bytes(hashlib.blake2b(str(key).encode(), digest_size=8).digest(), 'big')
+
+
 class LoadBalancer:
     def __init__(self):
         self.algorithms = {
@@ -22,14 +34,9 @@ class LoadBalancer:
             slave_index = (i + self.current_index) % len(slaves)
             slave = slaves[slave_index]  # 获取实际的slave节点
             distributed_tasks[slave].append(task)
-            print(f"分配任务 {task} 到节点 {slave}")  # 调试信息
+            logger.debug("分配任务 %s 到节点 %s", task, slave)  # 调试信息
             
         self.current_index = (self.current_index + len(tasks)) % len(slaves)
-        
-        # 打印任务分配情况
-        for slave, tasks in distributed_tasks.items():
-            print(f"节点 {slave} 分配到 {len(tasks)} 个任务")
-            
         return distributed_tasks
 
     def random_distribution(self, tasks, slaves):
@@ -38,7 +45,7 @@ class LoadBalancer:
         for task in tasks:
             slave = random.choice(slaves)
             distributed_tasks[slave].append(task)
-            print(f"分配任务 {task} 到节点 {slave}")  # 调试信息
+            logger.debug("分配任务 %s 到节点 %s", task, slave)  # 调试信息
         return distributed_tasks
 
     def least_connections(self, tasks, slaves):
@@ -48,7 +55,7 @@ class LoadBalancer:
             slave = min(slaves, key=lambda s: self.connections[s])
             distributed_tasks[slave].append(task)
             self.connections[slave] += 1
-            print(f"分配任务 {task} 到节点 {slave}")  # 调试信息
+            logger.debug("分配任务 %s 到节点 %s", task, slave)  # 调试信息
         return distributed_tasks
 
     def weighted_round_robin(self, tasks, slaves, weights=None):
@@ -64,22 +71,34 @@ class LoadBalancer:
             for i, weight in enumerate(weights):
                 if slave_index < weight:
                     distributed_tasks[slaves[i]].append(task)
-                    print(f"分配任务 {task} 到节点 {slaves[i]}")  # 调试信息
+                    logger.debug("分配任务 %s 到节点 %s", task, slaves[i])  # 调试信息
                     break
                 slave_index -= weight
             self.current_index = (self.current_index + 1) % total_weight
         
         return distributed_tasks
 
-    def ip_hash(self, tasks, slaves):
-        """IP哈希算法"""
+    def ip_hash(self, tasks, slaves, load_factor=1.25, vnodes=160):
+        """
+        一致性哈希算法（有界负载）
+        
+        按任务（图片路径）的稳定哈希在虚拟节点环上选择节点，同一图片总是分配给同一节点；
+        节点增减时只有约1/N的任务改变归属。每个节点最多分配
+        ceil(load_factor * 任务数 / 节点数) 个任务，超出时沿环顺时针转给下一个节点。
+        """
+        ring = sorted((stable_hash(f"{slave}#{i}"), index)
+                      for index, slave in enumerate(slaves) for i in range(vnodes))
+        hashes = [h for h, _ in ring]
+        capacity = math.ceil(load_factor * len(tasks) / len(slaves))
         distributed_tasks = defaultdict(list)
         for task in tasks:
-            hash_value = hash(task)
-            slave_index = hash_value % len(slaves)
-            slave = slaves[slave_index]
+            start = bisect.bisect(hashes, stable_hash(task))
+            for i in range(len(ring)):
+                slave = slaves[ring[(start + i) % len(ring)][1]]
+                if len(distributed_tasks[slave]) < capacity:
+                    break
             distributed_tasks[slave].append(task)
-            print(f"分配任务 {task} 到节点 {slave}")  # 调试信息
+            logger.debug("分配任务 %s 到节点 %s", task, slave)  # 调试信息
         return distributed_tasks
 
     def custom_algorithm(self, tasks, slaves):
@@ -109,7 +128,7 @@ class LoadBalancer:
                 selected_slave = random.choice(slaves)
             
             distributed_tasks[selected_slave].append(task)
-            print(f"分配任务 {task} 到节点 {selected_slave}")
+            logger.debug("分配任务 %s 到节点 %s", task, selected_slave)  # 调试信息
             
         return distributed_tasks
 
@@ -127,11 +146,14 @@ class LoadBalancer:
         if not slaves:
             raise ValueError("没有可用的从节点")
             
-        print(f"\n使用算法 {algorithm_name} 分配 {len(tasks)} 个任务到 {len(slaves)} 个节点")
-        
         if algorithm_name not in self.algorithms:
             raise ValueError(f"未知的算法: {algorithm_name}")
             
-        return self.algorithms[algorithm_name](tasks, slaves)
+        distributed_tasks = self.algorithms[algorithm_name](tasks, slaves)
+        
+        # 每次分配只打印一次各节点的任务数，逐任务的明细用DEBUG级别日志记录
+        counts = ", ".join(f"{slave}: {len(assigned)}" for slave, assigned in distributed_tasks.items())
+        print(f"\n使用算法 {algorithm_name} 分配 {len(tasks)} 个任务到 {len(slaves)} 个节点 ({counts})")
+        return distributed_tasks
 
     # 其他负载均衡算法的实现... 
\ No newline at end of file
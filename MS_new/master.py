@@ -1,13 +1,22 @@
 import os
 import time
 import socket
-import pickle
 import struct
-import cv2
 from load_balancer import LoadBalancer
 from monitor import Monitor
 import concurrent.futures
-from queue import Queue
+from queue import Empty, Queue
+
+
+def recv_exact(sock, size):
+    """接收恰好size字节"""
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("连接在数据中途关闭")
+        data += chunk
+    return data
 
 class Master:
     def __init__(self, slave_nodes, load_balancer):
@@ -20,32 +29,37 @@ class Master:
         self.monitor = Monitor()
         self.task_queue = Queue()  # 任务队列
         self.slave_status = {node: True for node in slave_nodes}  # 记录节点状态
+        self.slave_capacity = {}  # 节点 -> 可同时处理的任务数
+        
+    def query_capacity(self, slave_addr):
+        """查询从节点可同时处理的任务数（发送长度为0的消息），查询失败时按1处理"""
+        try:
+            with socket.create_connection(slave_addr, timeout=5) as sock:
+                sock.sendall(struct.pack('>L', 0))
+                return max(1, struct.unpack('>L', recv_exact(sock, 4))[0])
+        except (OSError, ConnectionError):
+            return 1
         
     def send_to_slave(self, image_path, slave_addr):
-        """发送图像到从节点处理"""
-        host, port = slave_addr
+        """
+        发送图像到从节点处理
         
-        # 读取图像
-        image = cv2.imread(image_path)
-        if image is None:
+        图像文件的原始字节经sendfile由内核直接发送，主节点不解码、不重新编码。
+        消息格式: | 长度 (4字节) | 图像文件内容 |，从节点回复 b'done' 或 b'bad!'（无法解码）
+        """
+        size = os.path.getsize(image_path)
+        if size == 0:
             raise ValueError(f"无法读取图像: {image_path}")
-            
-        # 编码图像数据
-        _, img_encoded = cv2.imencode('.jpg', image)
-        data = pickle.dumps(img_encoded)
         
-        # 连接从节点
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.connect((host, port))
-        
-        # 发送数据
-        sock.sendall(struct.pack('>L', len(data)))
-        sock.sendall(data)
-        
-        # 接收处理完成信号
-        result = sock.recv(4)
+        with open(image_path, 'rb') as f, socket.create_connection(slave_addr) as sock:
+            sock.sendall(struct.pack('>L', size))
+            sock.sendfile(f) # 零拷贝发送文件内容
+            
+            # 接收处理结果
+            result = recv_exact(sock, 4)
         
-        sock.close()
+        if result == b'bad!':
+            raise ValueError(f"无法读取图像: {image_path}")
         return result == b'done'
         
     def process_images(self, image_folder, algorithm='round_robin'):
@@ -62,14 +76,19 @@ class Master:
         
         start_time = time.time()
         
+        # 每个从节点按其容量创建工作线程，使从节点的所有工作线程始终有任务可做
+        for slave_addr in self.slave_nodes:
+            self.slave_capacity[slave_addr] = self.query_capacity(slave_addr)
+            print(f"节点 {slave_addr} 容量: {self.slave_capacity[slave_addr]}")
+        
         # 创建工作线程池
-        with concurrent.futures.ThreadPoolExecutor(max_workers=len(self.slave_nodes)) as executor:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=sum(self.slave_capacity.values())) as executor:
             futures = []
             
-            # 为每个从节点创建一个工作线程
             for slave_addr in self.slave_nodes:
-                future = executor.submit(self.worker_thread, slave_addr)
-                futures.append(future)
+                for _ in range(self.slave_capacity[slave_addr]):
+                    future = executor.submit(self.worker_thread, slave_addr)
+                    futures.append(future)
             
             # 等待所有任务完成
             concurrent.futures.wait(futures)
@@ -85,7 +104,7 @@ class Master:
         while True:
             try:
                 task = self.task_queue.get_nowait()
-            except Queue.Empty:
+            except Empty:
                 break
                 
             # 处理任务
@@ -13,6 +13,7 @@ class Monitor:
             'total_images': 0,
             'processed_images': 0
         }
+        self.lock = threading.Lock()  # 多个工作线程同时记录处理时间
         
     def start_monitoring(self):
         """开始监控系统资源"""
@@ -36,8 +37,9 @@ class Monitor:
             
     def record_processing_time(self, processing_time):
         """记录单个图像的处理时间"""
-        self.stats['processing_times'].append(processing_time)
-        self.stats['processed_images'] += 1
+        with self.lock:
+            self.stats['processing_times'].append(processing_time)
+            self.stats['processed_images'] += 1
         
     def set_total_images(self, total):
         """设置需要处理的总图像数"""
@@ -0,0 +1,115 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+import torch
+from torchvision.models.detection import maskrcnn_resnet50_fpn
+
+
+class SegmentationService:
+    """
+    常驻的Mask R-CNN实例分割服务。
+
+    模型在创建时加载一次并预热，之后所有分割请求共用该模型。
+    后台推理线程把并发到达的请求合并成动态批次：拿到第一个请求后，
+    最多再等待max_wait秒或凑满max_batch个请求，然后一次推理整批图像。
+
+    CPU选项:
+        threads: torch计算线程数（torch.set_num_threads）
+        torchscript: 使用TorchScript编译后的模型
+        quantize: 对全连接层做动态int8量化
+    """
+
+    def __init__(self, max_batch=4, max_wait=0.01, threads=None, torchscript=False, quantize=False,
+                 device=None):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.device = torch.device(device or ('cuda' if torch.cuda.is_available() else 'cpu'))
+        if threads:
+            torch.set_num_threads(threads)
+
+        model = maskrcnn_resnet50_fpn(pretrained=True)
+        model.eval()
+        if quantize and self.device.type == 'cpu':
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        model.to(self.device)
+        self.scripted = torchscript
+        if torchscript:
+            model = torch.jit.script(model)
+        self.model = model
+
+        self._requests = queue.Queue()
+        self.batches = 0
+        self.images = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def warmup(self, size=(480, 640)):
+        """用一张空白图像推理一次，使首个真实请求不承担初始化开销"""
+        self.segment(np.zeros((size[0], size[1], 3), dtype=np.uint8))
+
+    def submit(self, image):
+        """
+        提交一张图像。
+
+        Returns:
+            concurrent.futures.Future: 结果为标注后的图像
+        """
+        future = Future()
+        self._requests.put((image, future))
+        return future
+
+    def segment(self, image):
+        """分割一张图像并等待结果"""
+        return self.submit(image).result()
+
+    def _next_batch(self):
+        batch = [self._requests.get()] # 等待第一个请求
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._requests.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                results = self._infer([image for image, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+            self.batches += 1
+            self.images += len(batch)
+
+    def _infer(self, images):
+        """对一批图像推理，并在每张图像上标出第一个检测到的对象"""
+        tensors = [torch.from_numpy(image).permute(2, 0, 1).float().div_(255.0).to(self.device)
+                   for image in images]
+        with torch.no_grad():
+            predictions = self.model(tensors)
+        if self.scripted:
+            predictions = predictions[1] # TorchScript模型返回 (losses, detections)
+
+        results = []
+        for image, prediction in zip(images, predictions):
+            masks = prediction['masks']
+            if len(masks) > 0:
+                mask = masks[0, 0].cpu().numpy()
+                image[mask > 0.5] = [255, 0, 0] # 用红色标记第一个检测到的对象
+            results.append(image)
+        return results
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'images': self.images,
+            'avg_batch_size': self.images / self.batches if self.batches else 0.0
+        }
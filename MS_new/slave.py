@@ -1,40 +1,76 @@
 import cv2
+import numpy as np
 import os
 import socket
-import pickle
 import struct
-from image_processing import random_processing
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from image_processing import init_segmentation, random_processing
+
+MAX_IMAGE_SIZE = 64 * 1024 * 1024 # 单个图像最大64MB
+
+
+def recv_exact(conn, size):
+    """接收恰好size字节到预分配的缓冲区"""
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        n = conn.recv_into(view[received:])
+        if n == 0:
+            raise ConnectionError("连接在数据中途关闭")
+        received += n
+    return buffer
 
 class Slave:
-    def __init__(self, host='localhost', port=5000):
+    def __init__(self, host='localhost', port=5000, workers=None):
         self.host = host
         self.port = port
+        self.workers = workers or os.cpu_count() or 1 # 同时处理的任务数，默认等于CPU核心数
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
         self.processed_count = 0
+        self.count_lock = threading.Lock()
         
     def start(self):
-        """启动从节点服务器"""
+        """启动从节点服务器，每个连接交给工作线程处理，接收线程立即继续accept"""
         self.socket.bind((self.host, self.port))
-        self.socket.listen(1)
-        print(f"Slave 节点启动在 {self.host}:{self.port}")
+        self.socket.listen(128)
+        print(f"Slave 节点启动在 {self.host}:{self.port}，工作线程数 {self.workers}")
         
         while True:
             conn, addr = self.socket.accept()
             print(f"接收到来自 {addr} 的连接")
-            
-            # 接收图像数据
-            data_size = struct.unpack('>L', conn.recv(4))[0]
+            self.executor.submit(self._handle_connection, conn)
+    
+    def _handle_connection(self, conn):
+        """
+        处理一个连接：接收图像、解码、处理并回复
+        
+        长度为0的消息是容量查询，回复4字节的工作线程数，
+        主节点据此决定同时向本节点发送多少个任务。
+        """
+        try:
+            # 接收图像数据：原始图像文件字节，直接接收到预分配的缓冲区
+            data_size = struct.unpack('>L', recv_exact(conn, 4))[0]
+            if data_size == 0:
+                conn.sendall(struct.pack('>L', self.workers))
+                return
+            if data_size > MAX_IMAGE_SIZE:
+                print(f"图像过大: {data_size} 字节")
+                return
             print(f"准备接收 {data_size} 字节的数据")
             
-            data = b''
-            while len(data) < data_size:
-                data += conn.recv(4096)
+            data = recv_exact(conn, data_size)
             print(f"接收完成，实际接收 {len(data)} 字节")
             
-            # 解析接收到的数据
+            # 直接从接收缓冲区解码，不经过中间拷贝
             print("开始解析图像数据...")
-            image_data = pickle.loads(data)
-            image = cv2.imdecode(image_data, cv2.IMREAD_COLOR)
+            image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                print("无法解码图像")
+                conn.sendall(b'bad!')
+                return
             print(f"图像大小: {image.shape}")
             
             # 处理图像
@@ -46,8 +82,12 @@ class Slave:
             print("发送处理完成信号...")
             conn.sendall(b'done')
             
-            self.processed_count += 1
-            print(f"已处理图像数量: {self.processed_count}")
+            with self.count_lock:
+                self.processed_count += 1
+                print(f"已处理图像数量: {self.processed_count}")
+        except Exception as e:
+            print(f"处理连接错误: {e}")
+        finally:
             conn.close()
             print("连接关闭\n")
 
@@ -56,7 +96,19 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--host', default='localhost')
     parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=None, help='工作线程数，默认等于CPU核心数')
+    parser.add_argument('--seg-batch', type=int, default=4, help='实例分割的最大批大小')
+    parser.add_argument('--seg-wait', type=float, default=10, help='凑批的最长等待时间（毫秒）')
+    parser.add_argument('--torch-threads', type=int, default=None, help='torch计算线程数')
+    parser.add_argument('--torchscript', action='store_true', help='使用TorchScript模型')
+    parser.add_argument('--quantize', action='store_true', help='对模型做动态int8量化（仅CPU）')
     args = parser.parse_args()
     
-    slave = Slave(args.host, args.port)
+    # 启动时加载并预热实例分割模型，之后所有任务共用
+    print("加载实例分割模型...")
+    init_segmentation(max_batch=args.seg_batch, max_wait=args.seg_wait / 1000,
+                      threads=args.torch_threads, torchscript=args.torchscript,
+                      quantize=args.quantize)
+    
+    slave = Slave(args.host, args.port, args.workers)
     slave.start()
\ No newline at end of file
@@ -0,0 +1,229 @@
+import asyncio
+import logging
+import signal
+import time
+from batch import BatchError, BatchSummary, batch_error, batch_result, batch_tasks
+from cluster_state import StateDiff
+from load_balancer import UnknownAlgorithm
+from master import Master
+from protocol import StreamConnection
+from connection_pool import AsyncConnectionPool, PoolExhausted
+
+
+class AsyncMaster(Master):
+    """
+    基于asyncio事件循环的主节点。
+
+    与Master处理相同的消息类型（register、task、batch、heartbeat、health_check、
+    status_request、subscribe、profile_start、profile_stop），但所有连接由一个事件循环处理，不再为每个连接创建线程；
+    任务以非阻塞方式转发给从节点，同一连接上的多个任务可以并发处理。
+    """
+
+    def __init__(self, host='0.0.0.0', port=5008, max_idle_per_slave=4, max_requests_per_slave=8,
+                 backlog=128, probe_interval=0, metrics_port=0, trace_path=None, trace_sample=0.0):
+        super().__init__(host, port, max_idle_per_slave, max_requests_per_slave, backlog,
+                         probe_interval, metrics_port, trace_path, trace_sample)
+        self.connection_pool = AsyncConnectionPool(
+            max_idle=max_idle_per_slave,
+            max_concurrent=max_requests_per_slave
+        )
+        self._pending = set() # 正在处理的任务协程，保留引用防止被回收
+
+    def start(self):
+        """启动事件循环并开始处理连接"""
+        logging.info(f"主节点(asyncio)启动于 {self.host}:{self.port}")
+        self._start_prober()
+        self._start_metrics()
+        try:
+            asyncio.run(self._serve())
+        except KeyboardInterrupt:
+            self._signal_handler(signal.SIGINT, None)
+        finally:
+            self._cleanup()
+
+    async def _serve(self):
+        self.socket.setblocking(False)
+        server = await asyncio.start_server(self._handle_client, sock=self.socket)
+        heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            heartbeat_task.cancel()
+
+    async def _heartbeat_loop(self):
+        """定期移除心跳超时的从节点"""
+        while self.running:
+            self._remove_offline_slaves()
+            await asyncio.sleep(10)
+
+    async def _handle_client(self, reader, writer):
+        """
+        处理一个连接上的全部消息。
+
+        注册、心跳、健康检查和状态查询直接在事件循环中处理；
+        任务创建独立的协程，转发期间不阻塞同一连接上的后续消息。
+        """
+        address = writer.get_extra_info('peername')
+        conn = StreamConnection(reader, writer)
+        try:
+            while self.running:
+                received_before = conn.bytes_received
+                received = await conn.recv()
+                if received is None:
+                    break
+                request_id, message = received
+                message_type = message.get('type', 'response') # 响应帧没有type字段
+                if message_type in ('task', 'batch'):
+                    self._count_bytes(message, conn.bytes_received - received_before, 0)
+
+                if message_type == 'register':
+                    self._handle_register(message, address)
+                elif message_type == 'task':
+                    task = asyncio.create_task(self._handle_task_async(message, conn, request_id))
+                    self._pending.add(task)
+                    task.add_done_callback(self._pending.discard)
+                elif message_type == 'batch':
+                    task = asyncio.create_task(self._handle_batch_async(message, conn, request_id))
+                    self._pending.add(task)
+                    task.add_done_callback(self._pending.discard)
+                elif message_type == 'subscribe':
+                    task = asyncio.create_task(self._handle_subscribe_async(message, conn, request_id))
+                    self._pending.add(task)
+                    task.add_done_callback(self._pending.discard)
+                elif message_type == 'health_check':
+                    self._handle_health_check(conn, request_id)
+                elif message_type == 'status_request':
+                    self._handle_status_request(conn, request_id)
+                elif message_type == 'heartbeat':
+                    self._handle_heartbeat(message, address)
+                elif message_type in ('profile_start', 'profile_stop'):
+                    task = asyncio.create_task(self._handle_profile_async(message, conn, request_id))
+                    self._pending.add(task)
+                    task.add_done_callback(self._pending.discard)
+                else:
+                    conn.send(self._unknown_message(message), request_id)
+                await writer.drain()
+        except Exception as e:
+            logging.error(f"处理连接错误: {e}")
+        finally:
+            conn.close()
+
+    async def _handle_task_async(self, message, conn, request_id):
+        """
+        转发一个任务并返回响应，流程与Master._handle_task一致
+
+        在单独的协程中运行，异常没有调用方接收：任何异常都以错误响应返回给客户端，客户端不会一直等待该请求ID
+        """
+        try:
+            response = await self._dispatch_task_async(message)
+        except Exception as e:
+            logging.error(f"处理任务错误: {e}")
+            response = {'status': 'error', 'message': f"处理任务错误: {e}"}
+        self._count_bytes(message, 0, await self._send(conn, response, request_id))
+
+    async def _dispatch_task_async(self, message):
+        """选择从节点并以非阻塞方式转发任务，返回从节点的响应或错误响应，流程与Master._dispatch_task一致"""
+        invalid = self._invalid_task(message)
+        if invalid:
+            return invalid
+        task_start = time.time()
+        trace_id = self.tracer.continue_trace(message['data'])
+        try:
+            selected_slave = self._select_slave(message, trace_id) # 选择只读取内存数据，直接在事件循环中执行
+        except UnknownAlgorithm as e:
+            return self._finish_task(message, self._reject_algorithm(e), trace_id, task_start)
+
+        if not selected_slave:
+            return self._finish_task(message, {'status': 'error', 'message': '无可用从节点'}, trace_id, task_start)
+
+        response = await self._forward_async(selected_slave, message, trace_id)
+        if response.get('status') == 'rejected':
+            retry_slave = self._select_slave(message, trace_id, exclude=selected_slave['address'])
+            if retry_slave:
+                response = await self._forward_async(retry_slave, message, trace_id)
+        return self._finish_task(message, response, trace_id, task_start)
+
+    async def _forward_async(self, slave, message, trace_id):
+        """以非阻塞方式将任务转发给选中的从节点，流程与Master._forward一致"""
+        cost = self.load_balancer.task_started(slave['address'], message['data'])
+        forward_start = time.time()
+        try:
+            response = await self.connection_pool.request(slave['address'], message)
+            self._on_task_success(slave, message['data'], response, time.time() - forward_start)
+        except PoolExhausted as e:
+            logging.warning(f"任务分发等待超时: {e}")
+            response = {'status': 'error', 'message': '从节点繁忙'}
+        except Exception as e:
+            response = self._on_task_failure(slave, e)
+        finally:
+            self.load_balancer.task_finished(slave['address'], cost)
+            self.tracer.add(trace_id, 'master.forward', forward_start, time.time() - forward_start,
+                            slave=f"{slave['address'][0]}:{slave['address'][1]}")
+        return response
+
+    async def _handle_batch_async(self, message, conn, request_id):
+        """
+        并发分发批量任务，流程与Master._handle_batch一致。
+
+        同时在途的任务数不超过集群的并发请求上限，每个任务完成后立即返回结果帧。
+        """
+        try:
+            tasks = batch_tasks(message)
+        except BatchError as e:
+            logging.warning(f"批量任务被拒绝: {e}")
+            await self._send(conn, batch_error(message, e), request_id)
+            return
+        ordered = message['data'].get('ordered', False)
+        window = asyncio.Semaphore(max(1, len(self.slaves) * self.connection_pool.max_concurrent))
+        summary = BatchSummary(len(tasks))
+
+        async def run(index, task):
+            async with window:
+                return index, await self._dispatch_task_async(task)
+
+        # 按顺序创建协程，信号量保证窗口外的任务在等待中不占用从节点连接
+        running = [asyncio.create_task(run(i, task)) for i, task in enumerate(tasks)]
+        buffered = {} # ordered模式下提前完成、尚未轮到返回的结果
+        next_to_send = 0
+        sent = 0 # 结果帧字节数，同一连接上的其他协程也在发送，按每帧累计
+        try:
+            for finished in asyncio.as_completed(running):
+                index, response = await finished
+                summary.add(response)
+                if not ordered:
+                    sent += await self._send(conn, batch_result(index, response), request_id)
+                    continue
+                buffered[index] = response
+                while next_to_send in buffered:
+                    sent += await self._send(conn, batch_result(next_to_send, buffered.pop(next_to_send)), request_id)
+                    next_to_send += 1
+            sent += await self._send(conn, summary.to_message(), request_id)
+            self._count_bytes(message, 0, sent)
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def _handle_subscribe_async(self, message, conn, request_id):
+        """定期推送状态增量，流程与Master._handle_subscribe一致，连接关闭后结束"""
+        interval = max(0.1, float(message.get('interval', 1.0)))
+        diff = StateDiff()
+        while self.running and not conn.writer.is_closing():
+            await self._send(conn, self._state_update(diff), request_id)
+            await asyncio.sleep(interval)
+
+    async def _handle_profile_async(self, message, conn, request_id):
+        """在线程中转发剖析控制消息（阻塞的单独连接），不阻塞事件循环"""
+        await self._send(conn, await asyncio.to_thread(self._relay_profile, message), request_id)
+
+    async def _send(self, conn, message, request_id):
+        """发送一帧并等待发送缓冲区排空，返回帧的字节数（失败时为0）"""
+        sent_before = conn.bytes_sent
+        try:
+            conn.send(message, request_id)
+            size = conn.bytes_sent - sent_before # 在让出事件循环之前计算，不含其他协程的帧
+            await conn.writer.drain()
+            return size
+        except Exception as e:
+            logging.error(f"发送响应失败: {e}")
+            return 0
@@ -0,0 +1,125 @@
+"""
+批量任务的消息格式。
+
+请求:
+    {
+        'type': 'batch',
+        'data': {
+            'algorithm': 'round_robin',   # 负载均衡算法，单个任务可覆盖
+            'ordered': False,             # 是否按提交顺序返回结果
+            'tasks': [
+                {'image_path': 'image/00006_00.jpg', 'operation': 'noise', 'input_size': 48213},
+                ...
+            ]
+        }
+    }
+
+响应（均带回请求ID）:
+    每个任务一个 {'type': 'batch_result', 'index': 任务序号, 'result': 任务响应}
+    最后一个   {'type': 'batch_summary', 'total': ..., 'succeeded': ..., 'failed': ..., 'elapsed': ...}
+    请求格式错误时不分发任何任务，只返回一个带'status': 'error'和'message'的batch_summary
+"""
+import time
+from load_balancer import ALGORITHMS
+
+REQUIRED_FIELDS = ('operation', 'image_path')
+
+
+class BatchError(ValueError):
+    """批量任务请求格式错误"""
+
+
+def _validate(data):
+    """检查批量任务请求，列出全部格式错误的任务，有错误时抛出BatchError"""
+    if not isinstance(data, dict) or not isinstance(data.get('tasks', []), list):
+        raise BatchError("批量任务请求格式错误: data.tasks 必须是列表")
+    errors = []
+    if data.get('algorithm', 'round_robin') not in ALGORITHMS:
+        errors.append(f"未知的负载均衡算法 {data.get('algorithm')}")
+    for index, item in enumerate(data.get('tasks', [])):
+        if not isinstance(item, dict):
+            errors.append(f"#{index}: 不是字典")
+            continue
+        missing = [field for field in REQUIRED_FIELDS if not isinstance(item.get(field), str)]
+        if missing:
+            errors.append(f"#{index}: 缺少 {', '.join(missing)}")
+        elif item.get('algorithm', 'round_robin') not in ALGORITHMS:
+            errors.append(f"#{index}: 未知的负载均衡算法 {item.get('algorithm')}")
+    if errors:
+        raise BatchError(f"批量任务格式错误（可用的算法: {', '.join(ALGORITHMS)}）: {'; '.join(errors)}")
+
+
+def batch_tasks(message):
+    """
+    将批量任务请求展开为单个任务消息的列表。
+
+    Raises:
+        BatchError: 请求或其中任一任务格式错误（先检查全部任务，不会只展开一部分）
+    """
+    data = message.get('data')
+    _validate(data)
+    algorithm = data.get('algorithm', 'round_robin')
+    tasks = []
+    for item in data.get('tasks', []):
+        task_data = {
+            'type': 'image',
+            'operation': item['operation'],
+            'image_path': item['image_path'],
+            'algorithm': item.get('algorithm', algorithm)
+        }
+        if 'seed' in item:
+            task_data['seed'] = item['seed']
+        if 'durability' in item:
+            task_data['durability'] = item['durability']
+        if 'trace_id' in item:
+            task_data['trace_id'] = item['trace_id']
+        if 'input_size' in item:
+            task_data['input_size'] = item['input_size']
+        tasks.append({'type': 'task', 'data': task_data})
+    return tasks
+
+
+def batch_error(message, error):
+    """请求格式错误时的汇总帧，批量任务中的任务均未分发"""
+    data = message.get('data')
+    tasks = data.get('tasks') if isinstance(data, dict) else None
+    total = len(tasks) if isinstance(tasks, list) else 0
+    return {
+        'type': 'batch_summary',
+        'status': 'error',
+        'message': str(error),
+        'total': total,
+        'succeeded': 0,
+        'failed': total,
+        'elapsed': 0.0
+    }
+
+
+def batch_result(index, response):
+    """单个任务的结果帧"""
+    return {'type': 'batch_result', 'index': index, 'result': response}
+
+
+class BatchSummary:
+    """批量任务的完成情况统计"""
+
+    def __init__(self, total):
+        self.total = total
+        self.succeeded = 0
+        self.failed = 0
+        self.start_time = time.time()
+
+    def add(self, response):
+        if response.get('status') == 'success':
+            self.succeeded += 1
+        else:
+            self.failed += 1
+
+    def to_message(self):
+        return {
+            'type': 'batch_summary',
+            'total': self.total,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'elapsed': time.time() - self.start_time
+        }
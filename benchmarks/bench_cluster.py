@@ -0,0 +1,208 @@
+"""
+本地集群基准测试：比较load_balancer.py中的所有负载均衡算法。
+
+在临时端口上启动一个主节点和N个从节点（各自为独立进程，工作目录为临时目录），
+对每种算法运行相同的负载：image/ 下的图片，到达时间和操作由固定的随机种子生成，
+每种算法先预热，再重复测量 --repeat 次。
+
+每次测量输出吞吐量、延迟分位数、错误率、各从节点的任务占比和不均衡度
+（任务数最多的节点 / 平均任务数，1.0表示完全均衡），结果取各次测量的中位数。
+
+用法（在项目根目录执行）:
+    python -m benchmarks.bench_cluster --slaves 2 --rate 20 --duration 30 --repeat 3 --json results.json
+"""
+import argparse
+import json
+import os
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_master import free_port, wait_for_port
+from client import ARRIVAL_PROCESSES, Client, parse_mix
+from load_balancer import ALGORITHMS
+from protocol import connect
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class LocalCluster:
+    """在本机临时端口上运行的主节点和从节点进程"""
+
+    def __init__(self, slaves=2, workers=None, mode='threaded', keep=False, result_cache=False):
+        self.slave_count = slaves
+        self.workers = workers
+        self.result_cache = result_cache # 默认关闭结果缓存，否则后测试的算法会命中先前的结果
+        self.mode = mode
+        self.keep = keep # 保留临时目录（日志和输出图片）
+        self.workdir = None
+        self.master_address = None
+        self.slave_ports = []
+        self.processes = []
+
+    def start(self):
+        self.workdir = tempfile.mkdtemp(prefix='bench_cluster_')
+        port = free_port()
+        self.master_address = ('127.0.0.1', port)
+        self._spawn(['master.py', '--host', '127.0.0.1', '--port', str(port), '--mode', self.mode])
+        wait_for_port(self.master_address)
+        for _ in range(self.slave_count):
+            slave_port = free_port()
+            command = ['slave.py', '127.0.0.1', str(port), str(slave_port)]
+            if self.workers:
+                command += ['--workers', str(self.workers)]
+            if not self.result_cache:
+                command += ['--cache-memory', '0', '--cache-disk', '0']
+            self._spawn(command)
+            self.slave_ports.append(slave_port)
+        self.wait_for_slaves()
+
+    def _spawn(self, command):
+        command[0] = os.path.join(ROOT, command[0])
+        self.processes.append(subprocess.Popen(
+            [sys.executable] + command, cwd=self.workdir,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+
+    def wait_for_slaves(self, timeout=60):
+        """等待所有从节点完成注册"""
+        deadline = time.time() + timeout
+        conn = connect(self.master_address, timeout=5)
+        try:
+            while time.time() < deadline:
+                if len(conn.request({'type': 'status_request'})['slaves']) >= self.slave_count:
+                    return
+                for process in self.processes:
+                    if process.poll() is not None:
+                        raise RuntimeError(f"进程启动失败: {process.args}")
+                time.sleep(0.2)
+        finally:
+            conn.close()
+        raise RuntimeError(f"从节点未能在{timeout}秒内全部注册")
+
+    def stop(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.processes = []
+        if self.workdir and not self.keep:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def __enter__(self):
+        try:
+            self.start()
+        except BaseException:
+            self.stop()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def new_client(address):
+    client = Client(*address)
+    signal.signal(signal.SIGINT, signal.default_int_handler) # 不使用客户端的信号处理（会写汇总日志）
+    return client
+
+
+def run_once(cluster, algorithm, args, image_files, duration, seed):
+    """以一个新的客户端运行一次负载，返回该次测量的结果"""
+    client = new_client(cluster.master_address)
+    client.run_load(algorithm, args.rate, duration, args.arrival, args.concurrency, args.mix,
+                    args.burst_size, seed, image_files)
+    report = client.algorithm_report(algorithm)
+
+    counts = {}
+    for port in cluster.slave_ports:
+        histogram = client.algorithm_logs.get(str(port), {}).get(algorithm)
+        counts[str(port)] = histogram.count if histogram else 0
+    total = sum(counts.values())
+    mean = total / len(counts) if counts else 0
+    return {
+        'throughput': report['throughput'],
+        'sent': report['sent'],
+        'completed': report['completed'],
+        'error_rate': report['error_rate'],
+        'mean_ms': report['mean'] * 1000,
+        'p50_ms': report['p50'] * 1000,
+        'p90_ms': report['p90'] * 1000,
+        'p99_ms': report['p99'] * 1000,
+        'p99.9_ms': report['p99.9'] * 1000,
+        'max_ms': report['max'] * 1000,
+        'slave_share': {port: count / total if total else 0.0 for port, count in counts.items()},
+        'imbalance': max(counts.values()) / mean if mean else 0.0,
+        'share_cv': statistics.pstdev(counts.values()) / mean if mean else 0.0
+    }
+
+
+def median_result(runs):
+    """各次测量中数值指标的中位数"""
+    result = {}
+    for key, value in runs[0].items():
+        if isinstance(value, dict):
+            result[key] = {k: statistics.median(run[key][k] for run in runs) for k in value}
+        else:
+            result[key] = statistics.median(run[key] for run in runs)
+    return result
+
+
+def bench_algorithm(cluster, algorithm, args, image_files):
+    if args.warmup > 0:
+        run_once(cluster, algorithm, args, image_files, args.warmup, args.seed + 1)
+    runs = [run_once(cluster, algorithm, args, image_files, args.duration, args.seed)
+            for _ in range(args.repeat)]
+    return {'runs': runs, 'median': median_result(runs)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地集群负载均衡算法基准测试')
+    parser.add_argument('--slaves', type=int, default=2, help='从节点数')
+    parser.add_argument('--workers', type=int, default=None, help='每个从节点的工作进程数')
+    parser.add_argument('--mode', choices=['threaded', 'async'], default='threaded', help='主节点模式')
+    parser.add_argument('--algorithms', nargs='+', default=list(ALGORITHMS), choices=ALGORITHMS)
+    parser.add_argument('--rate', type=float, default=20, help='平均到达速率（任务/秒）')
+    parser.add_argument('--duration', type=float, default=30, help='每次测量的时长（秒）')
+    parser.add_argument('--warmup', type=float, default=5, help='每种算法的预热时长（秒）')
+    parser.add_argument('--repeat', type=int, default=3, help='每种算法的测量次数')
+    parser.add_argument('--arrival', choices=ARRIVAL_PROCESSES, default='poisson', help='到达过程')
+    parser.add_argument('--burst-size', type=int, default=10, help='burst到达过程每次突发的任务数')
+    parser.add_argument('--concurrency', type=int, default=32, help='客户端并发连接数')
+    parser.add_argument('--mix', type=parse_mix, help="操作比例，如 'crop=2,noise=1,grayscale=1'")
+    parser.add_argument('--seed', type=int, default=1, help='负载的随机种子')
+    parser.add_argument('--result-cache', action='store_true', help='启用从节点的结果缓存')
+    parser.add_argument('--keep', action='store_true', help='保留集群的临时目录')
+    parser.add_argument('--json', help='将结果写入JSON文件')
+    args = parser.parse_args()
+
+    image_files = Client.list_images(os.path.join(ROOT, 'image'))
+    if not image_files:
+        sys.exit("image/ 下没有图片")
+
+    results = {}
+    with LocalCluster(args.slaves, args.workers, args.mode, args.keep, args.result_cache) as cluster:
+        for algorithm in args.algorithms:
+            results[algorithm] = bench_algorithm(cluster, algorithm, args, image_files)
+
+    print(f"{'算法':<26}{'吞吐(个/秒)':>12}{'p50(ms)':>10}{'p99(ms)':>10}{'p99.9(ms)':>11}"
+          f"{'错误率':>8}{'不均衡度':>10}")
+    for algorithm, result in results.items():
+        m = result['median']
+        print(f"{algorithm:<26}{m['throughput']:>12.2f}{m['p50_ms']:>10.1f}{m['p99_ms']:>10.1f}"
+              f"{m['p99.9_ms']:>11.1f}{m['error_rate']:>8.2%}{m['imbalance']:>10.2f}")
+    if args.json:
+        config = {k: v for k, v in vars(args).items() if k not in ('json', 'mix')}
+        config['mix'] = dict(zip(*args.mix)) if args.mix else None
+        with open(args.json, 'w') as f:
+            json.dump({'config': config, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+"""
+主节点基准测试：对比线程模式与asyncio模式。
+
+测试内容:
+1. 连接速率：多个并发客户端反复执行 建立连接 -> health_check -> 断开，统计每秒完成的连接数
+2. 转发延迟：多个并发客户端通过持久连接提交任务，由一个立即响应的模拟从节点处理，
+   统计吞吐量及p50/p99转发延迟
+
+每种模式都会在子进程中启动一个主节点。
+
+用法（在项目根目录执行）:
+    python -m benchmarks.bench_master --clients 200 --duration 5
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from protocol import Connection, connect
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class FakeSlave:
+    """立即返回成功响应的模拟从节点"""
+
+    def __init__(self):
+        self.socket = socket.socket()
+        self.socket.bind(('127.0.0.1', 0))
+        self.socket.listen(128)
+        self.port = self.socket.getsockname()[1]
+        self.master_conn = None
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def register(self, master_address):
+        self.master_conn = connect(master_address)
+        self.master_conn.send({'type': 'register', 'port': self.port})
+
+    def _accept_loop(self):
+        while True:
+            client_socket, _ = self.socket.accept()
+            threading.Thread(target=self._serve, args=(client_socket,), daemon=True).start()
+
+    def _serve(self, client_socket):
+        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn = Connection(client_socket)
+        try:
+            while True:
+                received = conn.recv()
+                if received is None:
+                    break
+                request_id, _ = received
+                conn.send({'status': 'success', 'execution_time': 0.0}, request_id)
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+
+def wait_for_port(address, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(address, timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"主节点未能在{timeout}秒内启动")
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(q / 100 * len(sorted_values)))
+    return sorted_values[index]
+
+
+def run_clients(count, target):
+    threads = [threading.Thread(target=target, daemon=True) for _ in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def bench_connections(address, clients, duration):
+    """统计每秒完成的 连接 + health_check 次数"""
+    completed = [0] * clients
+    errors = [0] * clients
+    deadline = time.perf_counter() + duration
+    counter = iter(range(clients))
+    lock = threading.Lock()
+
+    def worker():
+        with lock:
+            index = next(counter)
+        while time.perf_counter() < deadline:
+            try:
+                conn = connect(address, timeout=5)
+                conn.request({'type': 'health_check'})
+                conn.close()
+                completed[index] += 1
+            except OSError:
+                errors[index] += 1
+
+    start = time.perf_counter()
+    run_clients(clients, worker)
+    elapsed = time.perf_counter() - start
+    return {
+        'connections_per_sec': sum(completed) / elapsed,
+        'connection_errors': sum(errors)
+    }
+
+
+def bench_forwarding(address, clients, requests_per_client):
+    """统计任务转发的吞吐量和延迟"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    task = {
+        'type': 'task',
+        'data': {
+            'type': 'image',
+            'operation': 'crop',
+            'image_path': 'image/00006_00.jpg',
+            'algorithm': 'round_robin'
+        }
+    }
+
+    def worker():
+        local = []
+        failed = 0
+        try:
+            conn = connect(address, timeout=30)
+        except OSError:
+            with lock:
+                errors[0] += requests_per_client
+            return
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            try:
+                response = conn.request(task)
+            except OSError:
+                failed += 1
+                break
+            if response.get('status') != 'success':
+                failed += 1
+            local.append(time.perf_counter() - start)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    start = time.perf_counter()
+    run_clients(clients, worker)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'tasks_per_sec': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'task_errors': errors[0]
+    }
+
+
+def bench_mode(mode, args):
+    port = free_port()
+    address = ('127.0.0.1', port)
+    process = subprocess.Popen(
+        [sys.executable, 'master.py', '--host', '127.0.0.1', '--port', str(port),
+         '--mode', mode, '--backlog', str(args.backlog)],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(address)
+        slave = FakeSlave()
+        slave.register(address)
+        time.sleep(0.5) # 等待注册完成
+        result = {'mode': mode}
+        result.update(bench_connections(address, args.clients, args.duration))
+        result.update(bench_forwarding(address, args.clients, args.requests))
+        return result
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='主节点基准测试')
+    parser.add_argument('--clients', type=int, default=200, help='并发客户端数')
+    parser.add_argument('--duration', type=float, default=5, help='连接速率测试时长（秒）')
+    parser.add_argument('--requests', type=int, default=50, help='每个客户端提交的任务数')
+    parser.add_argument('--backlog', type=int, default=128, help='主节点监听队列大小')
+    parser.add_argument('--modes', nargs='+', default=['threaded', 'async'])
+    parser.add_argument('--json', help='将结果写入JSON文件')
+    args = parser.parse_args()
+
+    results = [bench_mode(mode, args) for mode in args.modes]
+    print(f"{'模式':<10}{'连接/秒':>12}{'连接错误':>10}{'任务/秒':>12}{'p50(ms)':>10}{'p99(ms)':>10}{'任务错误':>10}")
+    for r in results:
+        print(f"{r['mode']:<10}{r['connections_per_sec']:>12.1f}{r['connection_errors']:>10}"
+              f"{r['tasks_per_sec']:>12.1f}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['task_errors']:>10}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+噪声处理基准测试。
+
+对比原先逐像素Python循环的实现与noise.py中的向量化实现的耗时及加速比。
+两者输出的统计等价性由 tests/test_noise.py 检查。
+
+用法（在项目根目录执行）:
+    python -m benchmarks.bench_noise --image image/00006_00.jpg
+    python -m benchmarks.bench_noise --height 240 --width 320
+"""
+import argparse
+import random
+import time
+
+import cv2
+import numpy as np
+
+from noise import apply_noise, make_rng
+
+
+def legacy_noise(img, layers=3):
+    """原slave.py中的噪声实现（逐像素循环），仅用于对比"""
+    for _ in range(layers):
+        noise = np.random.normal(0, 25, img.shape).astype(np.uint8)
+        img = cv2.add(img, noise)
+        prob = 0.05
+        thresh = 1 - prob
+        for i in range(img.shape[0]):
+            for j in range(img.shape[1]):
+                rdn = random.random()
+                if rdn < prob:
+                    img[i][j] = 0
+                elif rdn > thresh:
+                    img[i][j] = 255
+    return img
+
+
+def load_image(args):
+    if args.image:
+        img = cv2.imread(args.image)
+        if img is None:
+            raise SystemExit(f"无法读取图片: {args.image}")
+        return img
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, (args.height, args.width, 3), dtype=np.uint8)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='噪声处理基准测试')
+    parser.add_argument('--image', help='输入图片，不指定时使用随机生成的图像')
+    parser.add_argument('--height', type=int, default=240)
+    parser.add_argument('--width', type=int, default=320)
+    parser.add_argument('--repeat', type=int, default=5, help='向量化实现的重复次数')
+    args = parser.parse_args()
+
+    img = load_image(args)
+    print(f"图像尺寸: {img.shape}")
+
+    random.seed(0)
+    np.random.seed(0)
+    start = time.perf_counter()
+    legacy = legacy_noise(img.copy())
+    legacy_time = time.perf_counter() - start
+
+    rng = make_rng(0)
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        apply_noise(img.copy(), rng)
+    vectorized_time = (time.perf_counter() - start) / args.repeat
+
+    print(f"原实现耗时: {legacy_time:.4f}秒")
+    print(f"向量化实现耗时: {vectorized_time:.4f}秒")
+    print(f"加速比: {legacy_time / vectorized_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,173 +1,487 @@
-import socket
-import json
+import argparse
+import queue
 import random
+import threading
 import time
 import signal
 import sys
 import logging
 from datetime import datetime
 import os
+from histogram import LatencyHistogram
+from protocol import connect
+from tracing import Tracer
+
+OPERATIONS = ['crop', 'noise', 'grayscale']
+ARRIVAL_PROCESSES = ('constant', 'poisson', 'burst')
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def arrival_times(process, rate, duration, rng, burst_size=10):
+    """
+    生成开环负载的任务到达时间。
+
+    Args:
+        process (str): 到达过程，constant（固定间隔）、poisson（泊松过程）
+            或 burst（每 burst_size/rate 秒同时到达 burst_size 个任务）
+        rate (float): 平均到达速率（任务/秒）
+        duration (float): 持续时间（秒）
+        rng (random.Random): 随机数生成器
+        burst_size (int): 每次突发的任务数
+
+    Yields:
+        float: 相对开始时间的到达时刻（秒），非递减
+    """
+    t = 0.0
+    if process == 'constant':
+        while t < duration:
+            yield t
+            t += 1.0 / rate
+    elif process == 'poisson':
+        while True:
+            t += rng.expovariate(rate)
+            if t >= duration:
+                return
+            yield t
+    elif process == 'burst':
+        while t < duration:
+            for _ in range(burst_size):
+                yield t
+            t += burst_size / rate
+    else:
+        raise ValueError(f"未知的到达过程: {process}")
+
+
+def parse_mix(spec):
+    """
+    解析操作比例，如 'crop=2,noise=1,grayscale=1'。
+
+    Returns:
+        tuple: (操作列表, 权重列表)
+    """
+    operations, weights = [], []
+    for item in spec.split(','):
+        operation, _, weight = item.partition('=')
+        operation = operation.strip()
+        if operation not in OPERATIONS:
+            raise ValueError(f"未知的操作: {operation}")
+        operations.append(operation)
+        weights.append(float(weight) if weight else 1.0)
+    return operations, weights
+
 
 class Client:
-    def __init__(self, master_host='localhost', master_port=5008):
+    def __init__(self, master_host='localhost', master_port=5008, tracer=None):
         self.master_address = (master_host, master_port)
+        self.tracer = tracer or Tracer() # 默认不追踪；追踪ID在提交任务时按采样率分配
         self.running = True
-        self.algorithm_logs = {}
-        self.start_time = None
-        self.end_time = None
+        self.algorithm_logs = {} # 从节点端口 -> 算法 -> 执行时间直方图
+        self.results = {} # 算法 -> 客户端统计（发送数、完成数、错误数、耗时、延迟直方图）
+        self.stats_lock = threading.Lock()
+        self.connection = None # 与主节点的持久连接，多个任务复用
         signal.signal(signal.SIGINT, self._signal_handler) # 捕获Ctrl+C信号
-        
+
     def _signal_handler(self, signum, frame):
         print("\n正在关闭客户端...")
-        self.end_time = time.time()  # 记录结束时间
         self._save_summary_logs()
+        self.tracer.close()
         self.running = False
         sys.exit(0)
-        
+
+    @staticmethod
+    def _input_size(image_path):
+        """图片文件大小（字节），供主节点的代价模型使用；无法读取时返回None"""
+        try:
+            return os.path.getsize(image_path)
+        except OSError:
+            return None
+
+    def _task_message(self, image_path, operation, algorithm):
+        """构造任务消息，带上输入大小，采样到的任务带上追踪ID"""
+        message = {
+            'type': 'task',
+            'data': {
+                'type': 'image',
+                'operation': operation,
+                'image_path': image_path,
+                'algorithm': algorithm
+            }
+        }
+        size = self._input_size(image_path)
+        if size is not None:
+            message['data']['input_size'] = size
+        self.tracer.continue_trace(message['data'])
+        return message
+
     def submit_task(self, task):
         """
         向主节点提交任务并等待结果
-        
+
         Args:
             task (dict): 任务信息字典，包含算法类型和图像处理参数
-        
+
         Returns:
             dict: 从节点返回的处理结果
         """
-        # 创建新的socket连接
-        client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM) 
+        message = self._task_message(task['data']['image_path'], task['data']['operation'], task['algorithm'])
+        trace_id = message['data'].get('trace_id')
+        self._algorithm_stats(task['algorithm'])['sent'] += 1
+        start = time.perf_counter()
         try:
-            # 连接到主节点
-            client_socket.connect(self.master_address)
-            
-            # 构造任务消息
-            message = {
-                'type': 'task',
-                'data': {
-                    'type': 'image',
-                    'operation': task['data']['operation'],
-                    'image_path': task['data']['image_path'],
-                    'algorithm': task['algorithm']
-                }
+            if self.connection is None:
+                connect_start = time.time()
+                self.connection = connect(self.master_address) # 连接到主节点
+                self.tracer.add(trace_id, 'client.connect', connect_start, time.time() - connect_start)
+            request_start = time.time()
+            response = self.connection.request(message) # 发送任务请求并接收响应
+            self.tracer.add(trace_id, 'client.request', request_start, time.time() - request_start,
+                            status=response.get('status'))
+        except Exception:
+            # 连接失效时丢弃，下次提交重新建立连接
+            self.close()
+            self._record_error(task['algorithm'])
+            raise
+
+        self._record_result(response, task['algorithm'], time.perf_counter() - start)
+        return response
+
+    def submit_batch(self, tasks, algorithm='round_robin', ordered=False):
+        """
+        以一个批量请求提交多个任务，主节点并发分发，结果完成一个返回一个
+
+        Args:
+            tasks (list): 任务信息字典列表，格式同create_image_task的返回值
+            algorithm (str): 负载均衡算法
+            ordered (bool): 是否按提交顺序返回结果
+
+        Yields:
+            tuple: (任务序号, 处理结果)
+
+        Returns:
+            dict: 批量任务汇总（batch_summary）
+        """
+        items = []
+        for task in tasks:
+            item = {
+                'operation': task['data']['operation'],
+                'image_path': task['data']['image_path']
+            }
+            size = self._input_size(item['image_path'])
+            if size is not None:
+                item['input_size'] = size
+            self.tracer.continue_trace(item) # 批量任务中的每个任务单独采样和追踪
+            items.append(item)
+        message = {
+            'type': 'batch',
+            'data': {
+                'algorithm': algorithm,
+                'ordered': ordered,
+                'tasks': items
             }
-            client_socket.send(json.dumps(message).encode()) # 发送任务请求
-            response = json.loads(client_socket.recv(1024).decode()) # 接收从节点响应
-            
-            # 记录任务执行情况
+        }
+        self._algorithm_stats(algorithm)['sent'] += len(tasks)
+        start = time.perf_counter() # 批量任务中的所有任务同时到达，延迟从提交时刻算起
+        request_start = time.time()
+        try:
+            if self.connection is None:
+                self.connection = connect(self.master_address)
+            for response in self.connection.stream(message):
+                if response.get('type') == 'batch_summary':
+                    if response.get('status') == 'error':
+                        # 请求被拒绝，没有任何任务被分发
+                        for _ in range(len(tasks)):
+                            self._record_error(algorithm)
+                    return response
+                self._record_result(response['result'], algorithm, time.perf_counter() - start)
+                self.tracer.add(items[response['index']].get('trace_id'), 'client.request', request_start,
+                                time.time() - request_start, status=response['result'].get('status'))
+                yield response['index'], response['result']
+        except Exception:
+            self.close()
+            raise
+
+    def _algorithm_stats(self, algorithm):
+        stats = self.results.get(algorithm)
+        if stats is None:
+            stats = self.results.setdefault(algorithm, {
+                'sent': 0,
+                'completed': 0,
+                'errors': 0,
+                'elapsed': 0.0,
+                'latency': LatencyHistogram()
+            })
+        return stats
+
+    def _record_result(self, response, algorithm, latency=None):
+        """记录任务执行情况"""
+        with self.stats_lock:
+            stats = self._algorithm_stats(algorithm)
+            stats['completed'] += 1
+            if response.get('status') != 'success':
+                stats['errors'] += 1
+            elif latency is not None:
+                stats['latency'].record(latency)
+
             if 'slave' in response:
                 # 提取从节点端口号
                 slave_port = response['slave'].split(':')[1]
-                algorithm = task['algorithm']
                 execution_time = response.get('execution_time', 0)
-                
-                # 初始化该从节点的统计信息（如果不存在）
-                if slave_port not in self.algorithm_logs:
-                    self.algorithm_logs[slave_port] = {}
-                
-                # 初始化该算法的统计信息（如果不存在）
-                if algorithm not in self.algorithm_logs[slave_port]:
-                    self.algorithm_logs[slave_port][algorithm] = {
-                        'count': 0,
-                        'total_time': 0
-                    }
-                
-                # 更新统计信息
-                self.algorithm_logs[slave_port][algorithm]['count'] += 1
-                self.algorithm_logs[slave_port][algorithm]['total_time'] += execution_time
-                
-            return response
-        finally:
-            client_socket.close()
-            
+
+                # 初始化该从节点该算法的直方图（如果不存在）
+                histograms = self.algorithm_logs.setdefault(slave_port, {})
+                if algorithm not in histograms:
+                    histograms[algorithm] = LatencyHistogram()
+                histograms[algorithm].record(execution_time)
+
+    def _record_error(self, algorithm):
+        """记录未得到响应的任务"""
+        with self.stats_lock:
+            stats = self._algorithm_stats(algorithm)
+            stats['completed'] += 1
+            stats['errors'] += 1
+
+    def close(self):
+        """关闭与主节点的连接"""
+        if self.connection:
+            self.connection.close()
+        self.connection = None
+
+    def algorithm_report(self, algorithm):
+        """
+        算法的客户端统计。
+
+        Returns:
+            dict: 发送数、完成数、吞吐量（成功任务/秒）、错误率和延迟分位数（秒）
+        """
+        stats = self._algorithm_stats(algorithm)
+        latency = stats['latency']
+        report = {
+            'algorithm': algorithm,
+            'sent': stats['sent'],
+            'completed': stats['completed'],
+            'errors': stats['errors'],
+            'elapsed': stats['elapsed'],
+            'throughput': latency.count / stats['elapsed'] if stats['elapsed'] else 0.0,
+            'error_rate': stats['errors'] / stats['completed'] if stats['completed'] else 0.0
+        }
+        report.update(latency.summary(PERCENTILES))
+        return report
+
+    def print_report(self):
+        """打印各算法的吞吐量、延迟分位数和错误率"""
+        header = f"{'算法':<26}{'完成':>8}{'吞吐(个/秒)':>12}"
+        header += ''.join(f"{f'p{q:g}(ms)':>12}" for q in PERCENTILES) + f"{'错误率':>10}"
+        print(header)
+        for algorithm in self.results:
+            r = self.algorithm_report(algorithm)
+            line = f"{algorithm:<26}{r['completed']:>8}{r['throughput']:>12.1f}"
+            line += ''.join(f"{r[f'p{q:g}'] * 1000:>12.1f}" for q in PERCENTILES)
+            print(line + f"{r['error_rate']:>10.2%}")
+
     def _save_summary_logs(self):
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
+
         # 保存从节点统计
         for slave_port, algorithms in self.algorithm_logs.items():
             log_filename = f"summary_slave_{slave_port}_{timestamp}.log"
             with open(log_filename, 'w') as f:
                 f.write(f"从节点端口: {slave_port}\n")
                 f.write("=" * 50 + "\n")
-                
-                for algorithm, stats in algorithms.items():
+
+                for algorithm, histogram in algorithms.items():
                     f.write(f"\n算法: {algorithm}\n")
-                    f.write(f"总任务数: {stats['count']}\n")
-                    f.write(f"总执行时间: {stats['total_time']:.2f}秒\n")
-                    avg_time = stats['total_time'] / stats['count'] if stats['count'] > 0 else 0
-                    f.write(f"平均执行时间: {avg_time:.2f}秒\n")
+                    f.write(f"总任务数: {histogram.count}\n")
+                    f.write(f"总执行时间: {histogram.total:.2f}秒\n")
+                    for q in PERCENTILES:
+                        f.write(f"p{q:g}执行时间: {histogram.percentile(q):.3f}秒\n")
                     f.write("-" * 30 + "\n")
-        
-        # 保存客户端整体执行时间统计
-        if self.start_time and self.end_time:
-            total_time = self.end_time - self.start_time
-            client_log_filename = f"client_{self.current_algorithm}_{timestamp}.log"
+
+        # 保存客户端统计，每个算法一个文件
+        for algorithm in self.results:
+            r = self.algorithm_report(algorithm)
+            client_log_filename = f"client_{algorithm}_{timestamp}.log"
             with open(client_log_filename, 'w') as f:
-                f.write(f"负载均衡算法: {self.current_algorithm}\n")
+                f.write(f"负载均衡算法: {algorithm}\n")
                 f.write("=" * 50 + "\n")
-                f.write(f"开始时间: {datetime.fromtimestamp(self.start_time)}\n")
-                f.write(f"结束时间: {datetime.fromtimestamp(self.end_time)}\n")
-                f.write(f"总运行时间: {total_time:.2f}秒\n")
-                f.write(f"处理图片数量: {self.processed_images}\n")
-                f.write(f"平均每张图片处理时间: {total_time/self.processed_images:.2f}秒\n")
+                f.write(f"总运行时间: {r['elapsed']:.2f}秒\n")
+                f.write(f"发送任务数: {r['sent']}\n")
+                f.write(f"完成任务数: {r['completed']}\n")
+                f.write(f"吞吐量: {r['throughput']:.2f}个/秒\n")
+                f.write(f"错误率: {r['error_rate']:.2%}\n")
+                for q in PERCENTILES:
+                    f.write(f"p{q:g}延迟: {r[f'p{q:g}'] * 1000:.1f}毫秒\n")
+                f.write(f"最大延迟: {r['max'] * 1000:.1f}毫秒\n")
                 f.write("-" * 50 + "\n")
 
     def create_image_task(self, image_path, algorithm='round_robin'):
-        operations = ['crop', 'noise', 'grayscale']
-        
         return {
             'algorithm': algorithm,  # 使用指定的算法
             'data': {
                 'type': 'image',
-                'operation': random.choice(operations),
+                'operation': random.choice(OPERATIONS),
                 'image_path': image_path
             }
         }
 
-    def run(self):
-        # 指定要使用的负载均衡算法
-        self.current_algorithm = 'round_robi'  # 可以改为: 'least_connections', 'random', 'weighted_response_time'
-        self.processed_images = 0
-        
-        # 获取image文件夹下的所有图片
-        image_files = []
-        for file in os.listdir('image'):
-            if file.lower().endswith(('.png', '.jpg', '.jpeg')):
-                image_files.append(os.path.join('image', file))
-        
+    @staticmethod
+    def list_images(directory='image'):
+        """获取图片文件夹下的所有图片"""
+        return [os.path.join(directory, file) for file in sorted(os.listdir(directory))
+                if file.lower().endswith(('.png', '.jpg', '.jpeg'))]
+
+    def run(self, algorithm='round_robin', image_files=None):
+        """
+        将图片文件夹中的所有图片作为一个批量任务提交，由主节点并发分发到各从节点
+
+        Returns:
+            bool: 批量任务被接受且所有任务都成功时为True
+        """
+        image_files = image_files or self.list_images()
         if not image_files:
             print("没有找到图片文件")
-            return
-            
-        print(f"使用负载均衡算法: {self.current_algorithm}")
+            return False
+
+        print(f"使用负载均衡算法: {algorithm}")
+        start = time.perf_counter()
+        summary = None
         try:
-            self.start_time = time.time()  # 记录开始时间
-            
-            for image_path in image_files:
-                task = self.create_image_task(image_path, self.current_algorithm)
-                result = self.submit_task(task)
-                self.processed_images += 1
-                print(f"图片: {image_path}")
+            tasks = [self.create_image_task(image_path, algorithm) for image_path in image_files]
+            results = self.submit_batch(tasks, algorithm)
+            while True:
+                try:
+                    index, result = next(results)
+                except StopIteration as stop:
+                    summary = stop.value # 生成器的返回值为batch_summary
+                    break
+                task = tasks[index]
+                print(f"图片: {task['data']['image_path']}")
                 print(f"操作: {task['data']['operation']}")
-                print(f"算法: {self.current_algorithm}")
+                print(f"算法: {algorithm}")
                 print(f"执行结果: {result}")
                 print("-" * 50)
-                time.sleep(0.5)
-            
-            self.end_time = time.time()  # 记录结束时间
-            self._save_summary_logs()
-            print("\n所有图片处理完成，已生成汇总日志")
-            print(f"总运行时间: {self.end_time - self.start_time:.2f}秒")
-            self.running = False
-                
-        except KeyboardInterrupt:
-            print("\n正在关闭客户端...")
-            self.end_time = time.time()
-            self._save_summary_logs()
         except Exception as e:
             print(f"错误: {e}")
-            self.end_time = time.time()
-            self._save_summary_logs()
+        finally:
+            self._algorithm_stats(algorithm)['elapsed'] += time.perf_counter() - start
+            self.close()
+        print(f"总运行时间: {time.perf_counter() - start:.2f}秒")
+
+        if summary is None:
+            print("错误: 未收到批量任务汇总")
+            return False
+        if summary.get('status') == 'error':
+            print(f"错误: 批量任务被拒绝: {summary.get('message')}")
+            return False
+        print(f"批量任务汇总: 共{summary['total']}个，成功{summary['succeeded']}个，失败{summary['failed']}个")
+        return summary['failed'] == 0
+
+    def run_load(self, algorithm, rate, duration, arrival='poisson', concurrency=16, mix=None,
+                 burst_size=10, seed=None, image_files=None):
+        """
+        开环负载测试：任务按到达过程生成，不等待前一个任务完成。
+
+        Args:
+            algorithm (str): 负载均衡算法
+            rate (float): 平均到达速率（任务/秒）
+            duration (float): 发送任务的持续时间（秒）
+            arrival (str): 到达过程，见arrival_times
+            concurrency (int): 并发连接数，即客户端同时在途的最大任务数
+            mix (tuple): 操作比例 (操作列表, 权重列表)，默认各操作等比例
+            burst_size (int): burst到达过程每次突发的任务数
+            seed (int): 随机种子，相同种子产生相同的到达时间和任务序列
+            image_files (list): 图片路径列表，默认使用image文件夹
+
+        延迟从任务的计划到达时刻算起，连接全部繁忙时的排队时间也计入延迟，
+        避免闭环测试中慢响应推迟后续请求而低估延迟的问题。
+        """
+        rng = random.Random(seed)
+        operations, weights = mix or (OPERATIONS, [1.0] * len(OPERATIONS))
+        image_files = image_files or self.list_images()
+        arrivals = queue.Queue()
+        stats = self._algorithm_stats(algorithm)
+
+        def worker():
+            conn = None
+            while True:
+                item = arrivals.get()
+                if item is None:
+                    break
+                scheduled, message = item
+                trace_id = message['data'].get('trace_id')
+                dequeued = time.time()
+                waited = time.perf_counter() - scheduled # 计划到达时刻到开始发送之间的排队时间（连接全部繁忙）
+                self.tracer.add(trace_id, 'client.queue', dequeued - waited, waited)
+                try:
+                    if conn is None:
+                        conn = connect(self.master_address)
+                        self.tracer.add(trace_id, 'client.connect', dequeued, time.time() - dequeued)
+                    request_start = time.time()
+                    response = conn.request(message)
+                    self.tracer.add(trace_id, 'client.request', request_start, time.time() - request_start,
+                                    status=response.get('status'))
+                except Exception as e:
+                    logging.error(f"任务提交失败: {e}")
+                    if conn:
+                        conn.close()
+                    conn = None
+                    self._record_error(algorithm)
+                    continue
+                self._record_result(response, algorithm, time.perf_counter() - scheduled)
+            if conn:
+                conn.close()
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+        for t in threads:
+            t.start()
+
+        print(f"负载测试: 算法={algorithm} 到达过程={arrival} 速率={rate}/秒 并发={concurrency}")
+        start = time.perf_counter()
+        for offset in arrival_times(arrival, rate, duration, rng, burst_size):
+            message = self._task_message(rng.choice(image_files), rng.choices(operations, weights)[0], algorithm)
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            with self.stats_lock:
+                stats['sent'] += 1
+            arrivals.put((start + offset, message))
+        for _ in threads:
+            arrivals.put(None)
+        for t in threads:
+            t.join()
+        stats['elapsed'] += time.perf_counter() - start
+
 
 if __name__ == '__main__':
-    client = Client()
-    client.run() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='图片处理客户端')
+    parser.add_argument('--host', default='localhost', help='主节点地址')
+    parser.add_argument('--port', type=int, default=5008, help='主节点端口')
+    parser.add_argument('--algorithms', nargs='+', default=['round_robin'],
+                        help='负载均衡算法，指定多个时依次测试')
+    parser.add_argument('--load', action='store_true',
+                        help='开环负载测试模式（默认将image文件夹作为一个批量任务提交）')
+    parser.add_argument('--rate', type=float, default=20, help='负载测试的平均到达速率（任务/秒）')
+    parser.add_argument('--duration', type=float, default=30, help='负载测试时长（秒）')
+    parser.add_argument('--arrival', choices=ARRIVAL_PROCESSES, default='poisson', help='到达过程')
+    parser.add_argument('--burst-size', type=int, default=10, help='burst到达过程每次突发的任务数')
+    parser.add_argument('--concurrency', type=int, default=16, help='负载测试的并发连接数')
+    parser.add_argument('--mix', type=parse_mix, help="操作比例，如 'crop=2,noise=1,grayscale=1'")
+    parser.add_argument('--seed', type=int, help='随机种子')
+    parser.add_argument('--trace', metavar='FILE', default=None,
+                        help='为任务分配追踪ID，并以Chrome trace-event JSON将客户端的span写入该文件')
+    parser.add_argument('--trace-sample', type=float, default=1.0, help='追踪的任务比例（0-1）')
+    args = parser.parse_args()
+
+    client = Client(args.host, args.port, Tracer(args.trace, 'client', args.trace_sample))
+    ok = True
+    for algorithm in args.algorithms:
+        if args.load:
+            client.run_load(algorithm, args.rate, args.duration, args.arrival, args.concurrency,
+                            args.mix, args.burst_size, args.seed)
+        elif not client.run(algorithm):
+            ok = False
+    client.print_report()
+    client._save_summary_logs()
+    client.tracer.close()
+    print("\n已生成汇总日志")
+    if not ok:
+        sys.exit(1) # 批量任务被拒绝或有任务失败
@@ -0,0 +1,83 @@
+"""
+集群状态订阅的增量格式。
+
+订阅请求:
+    {'type': 'subscribe', 'interval': 1.0}     # 推送间隔（秒）
+
+推送（均带回订阅请求的ID，直到连接关闭）:
+    第一帧为完整状态:
+        {'type': 'state_update', 'full': True, 'slaves': {'host:port': 节点信息, ...},
+         'master_status': 'running', 'connection_pool': {...}, 'time': ...}
+    之后每帧只包含变化的部分:
+        {'type': 'state_update', 'full': False,
+         'changed': {'host:port': {变化的字段: 新值, ...}, ...},   # 新节点为完整信息
+         'removed': ['host:port', ...],
+         'master_status': 'running', 'connection_pool': {...}, 'time': ...}
+"""
+
+
+def slave_key(address):
+    return f"{address[0]}:{address[1]}"
+
+
+class StateDiff:
+    """
+    一个订阅者的增量计算。
+
+    记录上次发送给该订阅者的各节点字段，每次只发送值发生变化的字段；
+    节点信息的嵌套字段（负载、缓存统计等）在心跳时整体替换，按值比较即可。
+    """
+
+    def __init__(self):
+        self.sent = None # 节点键 -> 上次发送的节点信息
+
+    def update(self, slaves, **extra):
+        """
+        Args:
+            slaves (list): 当前各节点信息（副本）
+            extra: 每帧都带上的其他字段
+
+        Returns:
+            dict: state_update消息
+        """
+        current = {slave_key(slave['address']): slave for slave in slaves}
+        if self.sent is None:
+            message = {'type': 'state_update', 'full': True, 'slaves': current}
+        else:
+            changed = {}
+            for key, slave in current.items():
+                previous = self.sent.get(key)
+                if previous is None:
+                    changed[key] = slave
+                    continue
+                fields = {name: value for name, value in slave.items() if previous.get(name) != value}
+                if fields:
+                    changed[key] = fields
+            removed = [key for key in self.sent if key not in current]
+            message = {'type': 'state_update', 'full': False, 'changed': changed, 'removed': removed}
+        self.sent = current
+        message.update(extra)
+        return message
+
+
+def apply_update(slaves, message):
+    """
+    将state_update消息应用到订阅方的节点字典上。
+
+    Args:
+        slaves (dict): 节点键 -> 节点信息，原地修改
+        message (dict): state_update消息
+
+    Returns:
+        tuple: (有变化的节点键列表, 被移除的节点键列表)
+    """
+    if message['full']:
+        removed = [key for key in slaves if key not in message['slaves']]
+        slaves.clear()
+        slaves.update(message['slaves'])
+        return list(message['slaves']), removed
+    for key, fields in message['changed'].items():
+        slaves.setdefault(key, {}).update(fields)
+    for key in message['removed']:
+        slaves.pop(key, None)
+    return list(message['changed']), message['removed']
@@ -0,0 +1,276 @@
+import asyncio
+import select
+import socket
+import threading
+import time
+from collections import deque
+from protocol import connect, open_connection
+
+
+class PoolExhausted(Exception):
+    """从节点的并发请求数已达上限，且在等待时间内没有空出名额"""
+
+
+class _SlavePool:
+    """单个从节点的连接池状态"""
+
+    def __init__(self, limit):
+        self.idle = deque() # 空闲连接 (conn, 归还时间)
+        self.limit = limit # 限制并发请求数的信号量
+        self.in_use = 0
+        self.closed = False # 从节点被移除后置为True，归还的连接直接关闭
+
+
+class ConnectionPool:
+    """
+    主节点到从节点的持久连接池。
+
+    每个从节点维护一组空闲连接，任务转发时优先复用，避免每个任务都进行
+    TCP握手并在主节点上留下TIME_WAIT连接。
+
+    属性:
+        max_idle (int): 每个从节点最多保留的空闲连接数
+        max_concurrent (int): 每个从节点同时进行的最大请求数
+        idle_timeout (float): 空闲连接的最长保留时间（秒），超过后不再复用
+        acquire_timeout (float): 等待并发名额的最长时间（秒）
+        connect_timeout (float): 建立新连接的超时时间（秒）
+    """
+
+    def __init__(self, max_idle=4, max_concurrent=8, idle_timeout=60,
+                 acquire_timeout=30, connect_timeout=5):
+        self.max_idle = max_idle
+        self.max_concurrent = max_concurrent
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self.connect_timeout = connect_timeout
+        self._pools = {}
+        self._lock = threading.Lock()
+        self.hits = 0 # 复用空闲连接的次数
+        self.misses = 0 # 新建连接的次数
+        self.discarded = 0 # 校验失败或超时被丢弃的空闲连接数
+
+    def request(self, address, message):
+        """
+        通过池中的连接向从节点发送请求并等待响应。
+
+        复用的连接可能已被对端关闭：如果请求在发送时就失败（请求没有发出），用新连接重试一次。
+        请求发出后才失败时不重试，从节点可能已经执行了任务。
+
+        Args:
+            address (tuple): 从节点地址 (ip, port)
+            message (dict): 请求消息
+
+        Returns:
+            dict: 从节点的响应
+        """
+        address = tuple(address)
+        pool = self._get_pool(address)
+        if not pool.limit.acquire(timeout=self.acquire_timeout):
+            raise PoolExhausted(f"从节点 {address[0]}:{address[1]} 并发请求已达上限")
+        with self._lock:
+            pool.in_use += 1
+        try:
+            conn, reused = self._checkout(address, pool)
+            sent_before = conn.bytes_sent # 请求帧完整发出后bytes_sent才会增加
+            try:
+                response = conn.request(message)
+            except (OSError, ConnectionError):
+                conn.close()
+                if not reused or conn.bytes_sent != sent_before:
+                    raise
+                with self._lock:
+                    self.misses += 1
+                conn = self._new_connection(address) # 复用的连接已失效且请求未发出，新建连接重试
+                try:
+                    response = conn.request(message)
+                except Exception:
+                    conn.close()
+                    raise
+            except Exception:
+                conn.close()
+                raise
+            self._checkin(pool, conn)
+            return response
+        finally:
+            with self._lock:
+                pool.in_use -= 1
+            pool.limit.release()
+
+    def remove(self, address):
+        """移除从节点的连接池，关闭其全部空闲连接"""
+        with self._lock:
+            pool = self._pools.pop(tuple(address), None)
+            if pool is None:
+                return
+            pool.closed = True
+            idle = list(pool.idle)
+            pool.idle.clear()
+        for conn, _ in idle:
+            conn.close()
+
+    def stats(self):
+        """连接池统计信息"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'discarded': self.discarded,
+                'idle': sum(len(p.idle) for p in self._pools.values()),
+                'in_use': sum(p.in_use for p in self._pools.values())
+            }
+
+    def close(self):
+        """关闭所有连接"""
+        with self._lock:
+            addresses = list(self._pools)
+        for address in addresses:
+            self.remove(address)
+
+    def _get_pool(self, address):
+        with self._lock:
+            pool = self._pools.get(address)
+            if pool is None:
+                pool = self._pools[address] = _SlavePool(
+                    threading.BoundedSemaphore(self.max_concurrent))
+            return pool
+
+    def _checkout(self, address, pool):
+        """取出一个可用的空闲连接，没有则新建；返回 (连接, 是否复用)"""
+        now = time.time()
+        while True:
+            with self._lock:
+                if not pool.idle:
+                    self.misses += 1
+                    break
+                conn, returned_at = pool.idle.pop() # 后进先出，优先使用最近用过的连接
+            if now - returned_at < self.idle_timeout and self._is_alive(conn):
+                with self._lock:
+                    self.hits += 1
+                return conn, True
+            conn.close()
+            with self._lock:
+                self.discarded += 1
+        return self._new_connection(address), False
+
+    def _checkin(self, pool, conn):
+        """归还连接，超过空闲上限或从节点已移除时关闭"""
+        with self._lock:
+            if not pool.closed and len(pool.idle) < self.max_idle:
+                pool.idle.append((conn, time.time()))
+                return
+        conn.close()
+
+    def _new_connection(self, address):
+        conn = connect(address, timeout=self.connect_timeout)
+        conn.sock.settimeout(None) # 任务处理时间不固定，建立连接后不设收发超时
+        conn.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        return conn
+
+    @staticmethod
+    def _is_alive(conn):
+        """
+        检查空闲连接是否仍然可用。
+
+        空闲连接上不应有可读数据，可读说明对端已关闭或协议状态异常。
+        """
+        try:
+            readable, _, _ = select.select([conn.sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+
+class AsyncConnectionPool:
+    """
+    ConnectionPool的asyncio版本，供事件循环模式的主节点使用。
+
+    参数和统计信息与ConnectionPool一致，所有方法都必须在事件循环线程中调用。
+    """
+
+    def __init__(self, max_idle=4, max_concurrent=8, idle_timeout=60,
+                 acquire_timeout=30, connect_timeout=5):
+        self.max_idle = max_idle
+        self.max_concurrent = max_concurrent
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self.connect_timeout = connect_timeout
+        self._pools = {}
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+
+    async def request(self, address, message):
+        """
+        通过池中的连接向从节点发送请求并等待响应
+
+        请求帧写入发送缓冲区后无法确定是否已经送达从节点，失败时不重试；
+        已失效的空闲连接在取出时就被丢弃。
+        """
+        address = tuple(address)
+        pool = self._pools.get(address)
+        if pool is None:
+            pool = self._pools[address] = _SlavePool(asyncio.Semaphore(self.max_concurrent))
+        if pool.limit.locked():
+            try:
+                await asyncio.wait_for(pool.limit.acquire(), self.acquire_timeout)
+            except asyncio.TimeoutError:
+                raise PoolExhausted(f"从节点 {address[0]}:{address[1]} 并发请求已达上限")
+        else:
+            await pool.limit.acquire() # 有空闲名额时直接获取，不创建超时任务
+        pool.in_use += 1
+        try:
+            conn = await self._checkout(address, pool)
+            try:
+                response = await conn.request(message)
+            except BaseException:
+                conn.close() # 包括任务被取消的情况，连接状态未知，不再复用
+                raise
+            self._checkin(pool, conn)
+            return response
+        finally:
+            pool.in_use -= 1
+            pool.limit.release()
+
+    def remove(self, address):
+        """移除从节点的连接池，关闭其全部空闲连接"""
+        pool = self._pools.pop(tuple(address), None)
+        if pool is None:
+            return
+        pool.closed = True
+        while pool.idle:
+            conn, _ = pool.idle.pop()
+            conn.close()
+
+    def stats(self):
+        """连接池统计信息"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'discarded': self.discarded,
+            'idle': sum(len(p.idle) for p in self._pools.values()),
+            'in_use': sum(p.in_use for p in self._pools.values())
+        }
+
+    def close(self):
+        """关闭所有连接"""
+        for address in list(self._pools):
+            self.remove(address)
+
+    async def _checkout(self, address, pool):
+        now = time.time()
+        while pool.idle:
+            conn, returned_at = pool.idle.pop()
+            if (now - returned_at < self.idle_timeout
+                    and not conn.reader.at_eof() and not conn.writer.is_closing()):
+                self.hits += 1
+                return conn
+            conn.close()
+            self.discarded += 1
+        self.misses += 1
+        return await open_connection(address, self.connect_timeout)
+
+    def _checkin(self, pool, conn):
+        if not pool.closed and len(pool.idle) < self.max_idle:
+            pool.idle.append((conn, time.time()))
+        else:
+            conn.close()
@@ -0,0 +1,93 @@
+import threading
+
+
+class CostModel:
+    """
+    任务执行代价模型。
+
+    根据已完成任务的执行时间，为每个从节点、每种操作学习单位输入大小的处理耗时
+    （秒/字节，指数加权移动平均），用于预测新任务在各节点上的执行时间。
+
+    预测时依次使用：
+    1. 该节点该操作的统计值
+    2. 所有节点该操作的统计值
+    3. 所有节点所有操作的统计值
+    都没有时预测为0。
+    """
+
+    def __init__(self, alpha=0.2):
+        self.alpha = alpha # EWMA平滑系数
+        # 键为 (从节点地址, 操作)、操作 或 None（全部），分别对应三级统计
+        self._rates = {} # 秒/字节
+        self._task_times = {} # 秒/任务，无法获得输入大小时使用
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def task_size(task):
+        """
+        任务的输入大小（字节），任务没有带input_size时返回None。
+
+        输入大小由客户端在图片所在的机器上读取并写入任务数据，
+        主节点不访问图片文件（图片通常不在主节点上，且在事件循环中读文件会阻塞）。
+        """
+        return task.get('input_size') or None
+
+    def observe(self, address, task, execution_time):
+        """
+        记录一个已完成任务的执行时间。
+
+        Args:
+            address (tuple): 从节点地址
+            task (dict): 任务数据，包含operation和image_path
+            execution_time (float): 从节点上报的执行时间（秒），不含排队时间
+        """
+        key = (tuple(address), task.get('operation'))
+        size = self.task_size(task)
+        with self._lock:
+            self._update(self._task_times, key, execution_time)
+            if size:
+                self._update(self._rates, key, execution_time / size)
+
+    def predict(self, address, task):
+        """
+        预测任务在指定从节点上的执行时间（秒）。
+
+        Args:
+            address (tuple): 从节点地址
+            task (dict): 任务数据
+
+        Returns:
+            float: 预测的执行时间
+        """
+        key = (tuple(address), task.get('operation'))
+        size = self.task_size(task)
+        with self._lock:
+            if size:
+                rate = self._lookup(self._rates, key)
+                if rate is not None:
+                    return rate * size
+            task_time = self._lookup(self._task_times, key)
+        return task_time or 0.0
+
+    def forget(self, address):
+        """清除已移除节点的统计数据"""
+        address = tuple(address)
+        with self._lock:
+            for table in (self._rates, self._task_times):
+                for key in [k for k in table if isinstance(k, tuple) and k[0] == address]:
+                    del table[key]
+
+    def _update(self, table, key, value):
+        """同时更新 节点+操作、操作、全部 三级统计"""
+        for k in (key, key[1], None):
+            current = table.get(k)
+            table[k] = value if current is None else current + self.alpha * (value - current)
+
+    @staticmethod
+    def _lookup(table, key):
+        """按 节点+操作 -> 操作 -> 全部 的顺序查找统计值"""
+        for k in (key, key[1], None):
+            value = table.get(k)
+            if value is not None:
+                return value
+        return None
@@ -1,5 +1,7 @@
 import socket
 import json
+import heapq
+import itertools
 import threading
 from datetime import datetime
 from load_balance import LoadBalancer
@@ -7,7 +9,7 @@ import time
 import argparse
 
 class Master:
-    def __init__(self, host='0.0.0.0', port=5001, lb_algorithm='least_loaded'):
+    def __init__(self, host='0.0.0.0', port=5001, lb_algorithm='least_loaded', credit_window=4):
         self.host = host
         self.port = port
         self.slaves = {}  # 存储所有slave的信息
@@ -15,11 +17,17 @@ class Master:
         self.socket.bind((self.host, self.port))
         self.socket.listen(5)
         self.slave_sockets = {}  # 存储slave的socket连接
-        self.task_queue = []  # 存储待处理的任务
+        self.task_queue = []  # 待处理任务的最小堆: (优先级, 序号, 任务)，优先级数值小的先分发
+        self.task_seq = itertools.count()  # 同一优先级按加入顺序分发
+        self.credit_window = credit_window  # 每个slave最多同时处理的任务数
+        self.credits = {}  # 每个slave剩余可分发的任务数，收到task_complete时归还
+        self.in_flight = {}  # 每个slave已分发未完成的任务: task_id -> 队列条目，断开时放回队列
+        self.condition = threading.Condition()  # 保护以上状态，队列或可用额度变化时唤醒分发线程
         self.lb_algorithm = lb_algorithm  # 负载均衡算法
         self.load_balancer = LoadBalancer()  # 创建负载均衡器实例
         self.start_time = None  # 任务开始时间
         self.completed_tasks = 0  # 已完成的任务数
+        self.failed_tasks = 0  # 处理失败的任务数（计入已完成）
         self.total_tasks = 0  # 总任务数
         self.generate_tasks()  # 生成任务队列
 
@@ -30,20 +38,24 @@ class Master:
         # 可用的图像处理方法
         processing_methods = ['gaussian_blur', 'edge_detection', 'color_quantization']
         
-        self.task_queue = [
-            {
+        for i in range(1000):
+            self.submit_task({
                 'task_id': i,
                 'task_type': 'image_process',
                 'data': {
                     'size': random.randint(100, 1000),
                     'method': random.choice(processing_methods)
                 }
-            }
-            for i in range(1000)
-        ]
-        self.total_tasks = len(self.task_queue)
+            })
         print(f"已生成 {self.total_tasks} 个任务")
 
+    def submit_task(self, task, priority=0):
+        """加入一个任务，priority数值越小越先分发"""
+        with self.condition:
+            heapq.heappush(self.task_queue, (priority, next(self.task_seq), task))
+            self.total_tasks += 1
+            self.condition.notify()
+
     def start(self):
         print(f"Master启动于 {self.host}:{self.port}")
         # 启动任务分发线程
@@ -61,55 +73,82 @@ class Master:
 
     def handle_client(self, client_socket, address):
         print(f"新的slave连接：{address}")
-        self.slave_sockets[address] = client_socket
+        with self.condition:
+            self.slave_sockets[address] = client_socket
+            self.credits[address] = self.credit_window
+            self.in_flight[address] = {}
         
+        buffer = b''
         while True:
             try:
-                data = client_socket.recv(1024).decode('utf-8')
+                data = client_socket.recv(4096)
                 if not data:
                     break
                 
-                message = json.loads(data)
-                if 'task_complete' in message:  # 处理任务完成消息
-                    self.completed_tasks += 1
-                    if self.completed_tasks == self.total_tasks:
-                        end_time = time.time()
-                        total_time = end_time - self.start_time
-                        print(f"\n所有任务已完成！")
-                        print(f"总耗时: {total_time:.2f} 秒")
-                        print(f"平均每个任务耗时: {total_time/self.total_tasks:.2f} 秒")
-                else:  # 处理心跳消息
-                    self.slaves[address] = {
-                        'last_heartbeat': datetime.now(),
-                        'stats': message
-                    }
-                    print(f"从 {address} 收到心跳数据: {message}")
+                # 每条消息一行JSON，一次可能收到多条或半条
+                buffer += data
+                *lines, buffer = buffer.split(b'\n')
+                for line in lines:
+                    if line:
+                        self.handle_message(address, json.loads(line))
                 
             except Exception as e:
                 print(f"处理客户端 {address} 数据时出错: {e}")
                 break
         
         client_socket.close()
-        if address in self.slaves:
-            del self.slaves[address]
-        if address in self.slave_sockets:
-            del self.slave_sockets[address]
+        with self.condition:
+            self.slaves.pop(address, None)
+            self.slave_sockets.pop(address, None)
+            self.credits.pop(address, None)
+            # 已分发但未完成的任务放回队列，按原来的优先级和顺序重新分发
+            for entry in self.in_flight.pop(address, {}).values():
+                heapq.heappush(self.task_queue, entry)
+            self.condition.notify()
         print(f"客户端 {address} 断开连接")
 
-    def assign_task(self, task_data):
-        # 使用指定的算法选择最佳节点
-        best_node = self.load_balancer.select_best_node(self.slaves, self.lb_algorithm)
-        if not best_node:
-            print("没有可用的slave节点")
-            return False
-            
+    def handle_message(self, address, message):
+        """处理slave发来的一条消息"""
+        if 'task_complete' in message:  # 处理任务完成消息，归还该slave的一个额度
+            with self.condition:
+                self.completed_tasks += 1
+                if message.get('error'):
+                    self.failed_tasks += 1
+                self.in_flight[address].pop(message.get('task_id'), None)
+                self.credits[address] += 1
+                self.condition.notify()
+                finished = self.completed_tasks == self.total_tasks
+            if finished:
+                end_time = time.time()
+                total_time = end_time - self.start_time
+                print(f"\n所有任务已完成！")
+                print(f"总耗时: {total_time:.2f} 秒")
+                print(f"平均每个任务耗时: {total_time/self.total_tasks:.2f} 秒")
+                if self.failed_tasks:
+                    print(f"失败任务数: {self.failed_tasks}")
+        else:  # 处理心跳消息
+            with self.condition:
+                is_new = address not in self.slaves
+                self.slaves[address] = {
+                    'last_heartbeat': datetime.now(),
+                    'stats': message
+                }
+                if is_new:  # 收到第一次心跳后才参与负载均衡
+                    self.condition.notify()
+            print(f"从 {address} 收到心跳数据: {message}")
+
+    def available_slaves(self):
+        """还有剩余额度的slave，调用方需持有condition"""
+        return {address: info for address, info in self.slaves.items() if self.credits.get(address, 0) > 0}
+
+    def assign_task(self, best_node, task_data):
         try:
             # 发送任务到选中的slave
             task_message = {
                 'type': 'task',
                 'data': task_data
             }
-            self.slave_sockets[best_node].send(json.dumps(task_message).encode('utf-8'))
+            self.slave_sockets[best_node].sendall((json.dumps(task_message) + '\n').encode('utf-8'))
             print(f"任务已分配给节点 {best_node}")
             return True
         except Exception as e:
@@ -117,35 +156,41 @@ class Master:
             return False
 
     def task_dispatcher(self):
-        """任务分发器"""
+        """
+        任务分发器。
+
+        队列为空或所有slave的额度都已用完时阻塞在condition上，
+        新任务、task_complete归还额度、新slave加入或slave断开时被唤醒，
+        分发速度只受slave处理速度限制。
+        """
         self.start_time = time.time()  # 记录开始时间
         print(f"开始分发任务，时间: {datetime.fromtimestamp(self.start_time)}")
         
         while True:
-            if not self.task_queue:
-                if self.completed_tasks < self.total_tasks:
-                    time.sleep(1)  # 等待所有任务完成
-                    continue
-                else:
-                    time.sleep(5)
+            with self.condition:
+                if not self.condition.wait_for(lambda: self.task_queue and self.available_slaves(), timeout=5):
+                    if self.task_queue and not self.slaves:
+                        print("等待可用的slave节点...")
                     continue
+                
+                # 使用指定的算法在有剩余额度的节点中选择最佳节点
+                best_node = self.load_balancer.select_best_node(self.available_slaves(), self.lb_algorithm)
+                entry = heapq.heappop(self.task_queue)  # 优先级最高的任务
+                task = entry[2]
+                self.credits[best_node] -= 1
+                self.in_flight[best_node][task['task_id']] = entry  # 先登记，slave可能在发送返回前就完成任务
+                dispatched = self.total_tasks - len(self.task_queue)
             
-            if not self.slaves:
-                print("等待可用的slave节点...")
-                time.sleep(5)
+            if not self.assign_task(best_node, task):
+                with self.condition:
+                    # 连接已失效，停止向该节点分发（handle_client会在连接关闭后清理），任务放回队列
+                    if best_node in self.credits:
+                        self.credits[best_node] = 0
+                    if self.in_flight.get(best_node, {}).pop(task['task_id'], None) is not None:
+                        heapq.heappush(self.task_queue, entry)
                 continue
-            
-            task = self.task_queue.pop(0)  # 获取队列中的第一个任务
-            success = self.assign_task(task)
-            
-            if not success:
-                self.task_queue.insert(0, task)  # 如果分配失败，将任务放回队列
-                time.sleep(1)
-            else:
-                print(f"已分发: {self.total_tasks - len(self.task_queue)}/{self.total_tasks} 任务")
-                print(f"已完成: {self.completed_tasks}/{self.total_tasks} 任务")
-            
-            time.sleep(0.1)  # 控制分发速率
+            print(f"已分发: {dispatched}/{self.total_tasks} 任务")
+            print(f"已完成: {self.completed_tasks}/{self.total_tasks} 任务")
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Master节点')
@@ -153,9 +198,11 @@ if __name__ == '__main__':
                       choices=['round_robin', 'weighted_round_robin', 'least_loaded'],
                       default='least_loaded',
                       help='选择负载均衡算法: round_robin, weighted_round_robin 或 least_loaded')
+    parser.add_argument('--credits', type=int, default=4,
+                      help='每个slave最多同时处理的任务数，slave每完成一个任务归还一个额度')
     
     args = parser.parse_args()
     
-    master = Master(lb_algorithm=args.algorithm)
+    master = Master(lb_algorithm=args.algorithm, credit_window=args.credits)
     print(f"使用负载均衡算法: {args.algorithm}")
     master.start() 
\ No newline at end of file
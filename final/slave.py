@@ -14,6 +14,7 @@ class Slave:
         self.retry_interval = 5  # 重试间隔（秒）
         self.completed_tasks = 0  # 添加完成任务计数
         self.start_time = None   # 添加开始时间记录
+        self.send_lock = threading.Lock()  # 心跳线程和各任务线程共用同一个socket发送
 
     def connect(self):
         """尝试连接到master"""
@@ -48,11 +49,16 @@ class Slave:
         }
         return stats
 
+    def send_message(self, message):
+        """向master发送一条消息，每条消息一行JSON"""
+        with self.send_lock:
+            self.socket.sendall((json.dumps(message) + '\n').encode('utf-8'))
+
     def send_heartbeat(self):
         while self.running and self.connected:
             try:
                 stats = self.collect_stats()
-                self.socket.send(json.dumps(stats).encode('utf-8'))
+                self.send_message(stats)
                 time.sleep(1)
             except Exception as e:
                 print(f"发送心跳失败: {e}")
@@ -93,29 +99,48 @@ class Slave:
                             'task_complete': True,
                             'task_id': task_data['task_id']
                         }
-                        self.socket.send(json.dumps(completion_message).encode('utf-8'))
+                        self.send_message(completion_message)
                     else:
                         print(f"任务 {task_data['task_id']} 失败: HTTP状态码 {response.status_code}")
+                        self.report_failure(task_data, f"HTTP状态码 {response.status_code}")
                 
                 except Exception as e:
                     print(f"任务 {task_data['task_id']} 失败: {str(e)}")
+                    self.report_failure(task_data, str(e))
         
         # 创建新线程处理任务
         task_thread = threading.Thread(target=task_worker)
         task_thread.start()
 
+    def report_failure(self, task_data, error):
+        """失败的任务也发送完成通知，master据此归还该节点的分发额度"""
+        try:
+            self.send_message({
+                'task_complete': True,
+                'task_id': task_data['task_id'],
+                'error': error
+            })
+        except Exception as e:
+            print(f"发送失败通知失败: {e}")
+
     def receive_data(self):
-        """接收来自master的数据"""
+        """接收来自master的数据，每条消息一行JSON，一次可能收到多条或半条"""
+        buffer = b''
         while self.running and self.connected:
             try:
-                data = self.socket.recv(1024).decode('utf-8')
+                data = self.socket.recv(4096)
                 if not data:
                     self.connected = False
                     break
                 
-                message = json.loads(data)
-                if message.get('type') == 'task':
-                    self.handle_task(message.get('data'))
+                buffer += data
+                *lines, buffer = buffer.split(b'\n')
+                for line in lines:
+                    if not line:
+                        continue
+                    message = json.loads(line)
+                    if message.get('type') == 'task':
+                        self.handle_task(message.get('data'))
                     
             except Exception as e:
                 print(f"接收数据失败: {e}")
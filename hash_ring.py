@@ -0,0 +1,68 @@
+import bisect
+import hashlib
+
+
+def stable_hash(key):
+    """
+    与进程无关的64位哈希。
+
+    Python内置的hash()对字符串加了随机盐，每个进程的结果都不同，不能用于任务分配。
+    """
+    return int.from_bytes(hashlib.blake2b(str(key).encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """
+    带虚拟节点的一致性哈希环。
+
+    每个节点在环上放置vnodes个虚拟节点，键沿顺时针方向归属于遇到的第一个虚拟节点。
+    增加或移除一个节点时，只有约1/N的键改变归属。
+    """
+
+    def __init__(self, vnodes=160):
+        self.vnodes = vnodes
+        self._hashes = [] # 已排序的虚拟节点哈希
+        self._owners = [] # 与_hashes对应的节点
+        self.nodes = set()
+
+    def add(self, node):
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        for i in range(self.vnodes):
+            h = stable_hash(f"{node}#{i}")
+            index = bisect.bisect(self._hashes, h)
+            self._hashes.insert(index, h)
+            self._owners.insert(index, node)
+
+    def remove(self, node):
+        if node not in self.nodes:
+            return
+        self.nodes.discard(node)
+        keep = [i for i, owner in enumerate(self._owners) if owner != node]
+        self._hashes = [self._hashes[i] for i in keep]
+        self._owners = [self._owners[i] for i in keep]
+
+    def candidates(self, key):
+        """
+        按环上顺时针顺序依次给出不同的节点，第一个为键的归属节点。
+
+        Yields:
+            节点
+        """
+        if not self._hashes:
+            return
+        start = bisect.bisect(self._hashes, stable_hash(key))
+        seen = set()
+        count = len(self._hashes)
+        for i in range(count):
+            owner = self._owners[(start + i) % count]
+            if owner not in seen:
+                seen.add(owner)
+                yield owner
+                if len(seen) == len(self.nodes):
+                    return
+
+    def lookup(self, key):
+        """键的归属节点，环为空时返回None"""
+        return next(self.candidates(key), None)
@@ -1,9 +1,8 @@
-import socket
-import json
 import time
 import logging
 import signal
 import sys
+from protocol import connect
 
 logging.basicConfig(
     level=logging.INFO,
@@ -14,6 +13,7 @@ class HealthChecker:
     def __init__(self, master_host='localhost', master_port=5008):
         self.master_address = (master_host, master_port)
         self.running = True
+        self.connection = None # 与主节点的持久连接
         signal.signal(signal.SIGINT, self._signal_handler)
         
     def _signal_handler(self, signum, frame):
@@ -22,18 +22,17 @@ class HealthChecker:
         sys.exit(0)
         
     def check_node_health(self):
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(5)
         try:
-            sock.connect(self.master_address)
-            sock.send(json.dumps({'type': 'health_check'}).encode())
-            response = json.loads(sock.recv(1024).decode())
+            if self.connection is None:
+                self.connection = connect(self.master_address, timeout=5)
+            response = self.connection.request({'type': 'health_check'})
             return response.get('status') == 'ok'
         except Exception as e:
             logging.error(f"健康检查失败: {e}")
+            if self.connection:
+                self.connection.close()
+            self.connection = None # 下次检查时重新连接
             return False
-        finally:
-            sock.close()
             
     def run(self):
         while self.running:
@@ -0,0 +1,86 @@
+import math
+
+
+class LatencyHistogram:
+    """
+    固定桶的延迟直方图。
+
+    桶边界按几何级数划分：第i个桶覆盖 (min_value * (1+precision)^(i-1), min_value * (1+precision)^i]，
+    因此任意分位数的相对误差不超过precision。记录一个值只需一次对数运算和一次数组自增，
+    内存占用固定，与记录的样本数无关。
+
+    属性:
+        count (int): 样本数
+        total (float): 样本总和
+        min (float): 最小值
+        max (float): 最大值
+    """
+
+    def __init__(self, min_value=1e-5, max_value=3600.0, precision=0.01):
+        self.min_value = min_value
+        self.max_value = max_value
+        self._log_base = math.log1p(precision)
+        self._counts = [0] * (self._index(max_value) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def _index(self, value):
+        if value <= self.min_value:
+            return 0
+        return math.ceil(math.log(value / self.min_value) / self._log_base)
+
+    def _upper_bound(self, index):
+        return self.min_value * math.exp(index * self._log_base)
+
+    def record(self, value):
+        """记录一个样本（秒），超出范围的值计入首尾桶"""
+        self._counts[min(self._index(value), len(self._counts) - 1)] += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """合并另一个相同参数的直方图"""
+        for i, c in enumerate(other._counts):
+            if c:
+                self._counts[i] += c
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q):
+        """
+        第q百分位数。
+
+        Args:
+            q (float): 百分位，0-100
+
+        Returns:
+            float: 所在桶的上界（不超过实际最大值），没有样本时返回0
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q / 100 * self.count))
+        seen = 0
+        for i, c in enumerate(self._counts):
+            seen += c
+            if seen >= rank:
+                return min(self._upper_bound(i), self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self, percentiles=(50, 90, 99, 99.9)):
+        """样本数、均值、最大值和各分位数"""
+        result = {'count': self.count, 'mean': self.mean, 'max': self.max}
+        for q in percentiles:
+            result[f'p{q:g}'] = self.percentile(q)
+        return result
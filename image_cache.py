@@ -0,0 +1,72 @@
+import os
+from collections import OrderedDict
+
+
+class ImageCache:
+    """
+    解码后图像的LRU缓存，键为 (路径, 修改时间, 文件大小)。
+
+    同一图片的不同操作共享一次 imread + resize 的结果；文件被修改后旧数据自动失效。
+    缓存的数组被设为只读，get返回的是只读视图，处理操作必须生成新数组或先复制，
+    不会破坏缓存中的数据。
+
+    缓存在每个工作进程中各有一份（工作进程之间不共享内存），
+    由工作进程初始化时创建，见image_tasks.init_worker。
+
+    属性:
+        max_bytes (int): 缓存数组的总字节数上限
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict() # 路径 -> ((修改时间, 大小), 数组)，按访问顺序排列
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, path, loader):
+        """
+        取出解码后的图像，未命中时调用loader(path)加载并缓存。
+
+        Args:
+            path (str): 图片路径
+            loader (callable): 加载函数，返回numpy数组
+
+        Returns:
+            numpy.ndarray: 只读的图像数组
+        """
+        st = os.stat(path)
+        version = (st.st_mtime_ns, st.st_size)
+        entry = self._entries.get(path)
+        if entry is not None and entry[0] == version:
+            self._entries.move_to_end(path)
+            self.hits += 1
+            return entry[1].view()
+
+        self.misses += 1
+        if entry is not None:
+            self._remove(path) # 文件已修改
+        img = loader(path)
+        img.flags.writeable = False
+        if img.nbytes <= self.max_bytes:
+            self._entries[path] = (version, img)
+            self._bytes += img.nbytes
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return img.view()
+
+    def _remove(self, path):
+        _, img = self._entries.pop(path)
+        self._bytes -= img.nbytes
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes
+        }
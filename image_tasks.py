@@ -0,0 +1,184 @@
+import os
+import time
+import cv2
+import numpy as np
+from image_cache import ImageCache
+from noise import apply_noise, make_rng
+from output_writer import OutputWriter, encode_image, write_atomic
+
+
+# 影响处理结果的参数，修改处理逻辑时同时修改这里，使旧的缓存结果失效
+SCALE = 2 # 处理前放大倍数
+OPERATION_PARAMS = {
+    'crop': {'scale': SCALE, 'blur_passes': 3},
+    'noise': {'scale': SCALE, 'layers': 3},
+    'grayscale': {'scale': SCALE, 'block_size': 11, 'kernel': 5},
+}
+OUTPUT_SUFFIXES = {'crop': 'cropped', 'noise': 'noisy', 'grayscale': 'gray'}
+
+
+DURABILITY = ('written', 'queued') # 写入完成后回复 / 交给写入线程后即回复
+
+
+def output_path_for(image_path, operation, output_dir, output_format=None):
+    """处理结果的输出路径，output_format（如'.png'）为None时沿用输入图片的格式"""
+    base, ext = os.path.splitext(os.path.basename(image_path))
+    return os.path.join(output_dir, f"{base}_{OUTPUT_SUFFIXES[operation]}{output_format or ext}")
+
+
+_image_cache = None # 当前工作进程的解码图像缓存
+_output_writer = None # 当前工作进程的输出写入线程池
+_output_format = None # 输出格式，None表示与输入相同
+
+
+def init_worker(image_cache_bytes=0, output_format=None, quality=95, png_compression=1,
+                writer_threads=2, writer_queue=8, profile_channel=None):
+    """
+    工作进程初始化。
+
+    - 限制OpenCV内部线程数，避免多个进程同时处理时超额占用CPU核心
+    - 创建解码图像缓存，image_cache_bytes为0时不缓存
+    - 创建输出写入线程池，编码格式和质量由output_format、quality、png_compression指定
+    - 等待从节点的剖析请求（profiler.ProfileChannel），为None时不响应剖析
+    """
+    global _image_cache, _output_writer, _output_format
+    cv2.setNumThreads(1)
+    _image_cache = ImageCache(image_cache_bytes) if image_cache_bytes else None
+    _output_writer = OutputWriter(writer_threads, writer_queue, quality, png_compression)
+    _output_format = output_format
+    if profile_channel is not None:
+        profile_channel.listen()
+
+
+def worker_stats():
+    """当前工作进程的缓存和写入队列统计"""
+    return {
+        'pid': os.getpid(),
+        'image_cache': _image_cache.stats() if _image_cache is not None else None,
+        'output_writer': _output_writer.stats() if _output_writer is not None else None
+    }
+
+
+def _save(img, output_path, durability, return_data):
+    """
+    保存处理结果。
+
+    有写入线程池时由写入线程编码并写文件，durability为'queued'时不等待写入完成；
+    需要返回编码数据（结果缓存）时先在当前线程编码，写入线程只负责写文件。
+
+    Returns:
+        bytes: return_data为True时返回编码后的数据，否则为None
+    """
+    ext = os.path.splitext(output_path)[1]
+    data = None
+    if return_data:
+        data = _output_writer.encode(img, ext) if _output_writer else encode_image(img, ext)
+    if _output_writer is None:
+        write_atomic(output_path, data if data is not None else encode_image(img, ext))
+        return data
+    future = _output_writer.submit(output_path, img=None if return_data else img, data=data)
+    if durability != 'queued':
+        future.result() # 等待写入完成
+    return data
+
+
+def load_image(image_path):
+    """读取图片并放大"""
+    img = cv2.imread(image_path)
+    if img is None:
+        raise Exception(f"无法读取图片: {image_path}")
+    # 增加图片尺寸以增加处理时间
+    return cv2.resize(img, (img.shape[1]*SCALE, img.shape[0]*SCALE))
+
+
+def process_image(image_path, operation, output_dir, seed=None, return_data=False, durability='written'):
+    """
+    执行图片处理任务：加载、处理并保存图片。
+
+    定义为模块级函数，以便在工作进程中执行。
+
+    Args:
+        image_path (str): 输入图片路径
+        operation (str): 处理操作，crop / noise / grayscale
+        output_dir (str): 输出目录
+        seed (int, optional): 随机种子，用于复现裁剪位置和噪声结果
+        return_data (bool): 是否同时返回编码后的输出图片数据（用于结果缓存）
+        durability (str): 'written' 写入完成后返回；'queued' 交给写入线程后即返回
+
+    Returns:
+        tuple: (输出图片路径, 各阶段耗时统计)，return_data为True时再附加输出图片数据；
+        耗时统计中还包含当前工作进程的缓存和写入队列统计（worker），由调用方取出
+    """
+    try:
+        # 1. 开始加载图片
+        load_start = time.time()
+        if _image_cache is not None:
+            img = _image_cache.get(image_path, load_image) # 只读视图，各操作均生成新数组
+        else:
+            img = load_image(image_path)
+        load_time = time.time() - load_start
+        
+        # 2. 开始处理图片
+        process_start = time.time()
+        
+        if operation not in OPERATION_PARAMS:
+            raise Exception(f"未知操作: {operation}")
+        params = OPERATION_PARAMS[operation]
+        output_path = output_path_for(image_path, operation, output_dir, _output_format)
+        rng = make_rng(seed)
+        
+        if operation == 'crop':
+            # 增加裁剪前的处理
+            for _ in range(params['blur_passes']):  # 多次处理以增加时间
+                img = cv2.GaussianBlur(img, (5, 5), 0)
+                img = cv2.medianBlur(img, 5)
+            
+            h, w = img.shape[:2]
+            crop_size = min(h, w) // 2
+            x = int(rng.integers(0, w - crop_size + 1))
+            y = int(rng.integers(0, h - crop_size + 1))
+            img = img[y:y+crop_size, x:x+crop_size]
+            
+        elif operation == 'noise':
+            # 添加多层噪声（高斯噪声 + 椒盐噪声），整幅图像向量化处理
+            img = apply_noise(img, rng, layers=params['layers'])
+            
+        elif operation == 'grayscale':
+            # 增加灰度处理的复杂度
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            # 添加直方图均衡化
+            img = cv2.equalizeHist(img)
+            # 添加自适应阈值处理
+            img = cv2.adaptiveThreshold(img, 255, 
+                                      cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                      cv2.THRESH_BINARY, params['block_size'], 2)
+            # 添加形态学操作
+            kernel = np.ones((params['kernel'], params['kernel']), np.uint8)
+            img = cv2.morphologyEx(img, cv2.MORPH_OPEN, kernel)
+            img = cv2.morphologyEx(img, cv2.MORPH_CLOSE, kernel)
+            
+        process_time = time.time() - process_start
+        
+        # 3. 开始保存图片
+        save_start = time.time()
+        data = _save(img, output_path, durability, return_data)
+        save_time = time.time() - save_start
+        
+        # 计算总时间
+        total_time = load_time + process_time + save_time
+        
+        time_stats = {
+            'load_time': load_time,
+            'process_time': process_time,
+            'save_time': save_time,
+            'total_time': total_time,
+            'start': load_start # 开始加载的时间，用于追踪，由调用方取出
+        }
+        time_stats['worker'] = worker_stats() # 由调用方取出，按工作进程汇总
+        if return_data:
+            return output_path, time_stats, data
+        return output_path, time_stats
+        
+    except Exception as e:
+        # 在工作进程中不做输出，由从节点记录错误
+        raise Exception(f"处理图片时出错 {image_path}: {e}") from e
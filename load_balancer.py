@@ -1,23 +1,163 @@
+import itertools
+import math
 import random
+import threading
 import time
-import socket
-import json
+from cost_model import CostModel
+from hash_ring import HashRing
+from protocol import connect
+
+# select_slave支持的算法名称
+ALGORITHMS = (
+    'round_robin',
+    'least_connections',
+    'random',
+    'weighted_response_time',
+    'power_of_two',
+    'expected_completion_time',
+    'consistent_hash',
+)
+
+
+class UnknownAlgorithm(ValueError):
+    """任务指定的负载均衡算法不存在"""
+
+    def __init__(self, algorithm):
+        super().__init__(f"未知的负载均衡算法: {algorithm}，可用: {', '.join(ALGORITHMS)}")
+        self.algorithm = algorithm
+
 
 class LoadBalancer:
-    def __init__(self):
-        self.current_index = 0 
+    def __init__(self, latency_alpha=0.3, load_factor=1.25, vnodes=160):
+        self.round_robin_counter = itertools.count() # next()是原子操作，多线程选择时不会重复或越界
+        self.latency_alpha = latency_alpha # EWMA平滑系数，越大越偏重最近的样本
+        self.latency = {} # 从节点地址 -> 任务延迟的指数加权移动平均（秒）
+        self.last_sample = {} # 从节点地址 -> 最近一次更新延迟的时间
+        self.latency_lock = threading.Lock()
+        self.in_flight = {} # 从节点地址 -> 已转发但尚未收到响应的任务数
+        self.queued_work = {} # 从节点地址 -> 未完成任务的预测执行时间之和（秒）
+        self.in_flight_lock = threading.Lock()
+        self.cost_model = CostModel() # 按节点和操作学习的任务代价
+        self.ring = HashRing(vnodes) # consistent_hash算法的哈希环，节点为从节点地址
+        self.ring_lock = threading.Lock()
+        self.load_factor = load_factor # 每个节点的未完成任务数上限为平均值的load_factor倍
         
     def round_robin(self, slaves):
         if not slaves:
             return None
-        selected = slaves[self.current_index]
-        self.current_index = (self.current_index + 1) % len(slaves)
-        return selected
+        return slaves[next(self.round_robin_counter) % len(slaves)] # 节点数可能在两次选择之间变化
         
     def least_connections(self, slaves):
+        """选择当前未完成任务数最少的节点，数量相同时随机选择"""
+        if not slaves:
+            return None
+        in_flight = self.in_flight
+        return min(slaves, key=lambda x: (in_flight.get(tuple(x['address']), 0), random.random()))
+    
+    def power_of_two(self, slaves):
+        """
+        两次随机选择算法
+        
+        随机抽取两个节点，选择未完成任务数较少的一个。
+        选择代价为O(1)，且不会像least_connections那样让大量并发请求同时涌向同一个节点。
+        """
+        if not slaves:
+            return None
+        if len(slaves) == 1:
+            return slaves[0]
+        first, second = random.sample(slaves, 2)
+        in_flight = self.in_flight
+        if in_flight.get(tuple(second['address']), 0) < in_flight.get(tuple(first['address']), 0):
+            return second
+        return first
+    
+    def expected_completion_time(self, slaves, task):
+        """
+        预期完成时间算法
+        
+        对每个节点计算 预期完成时间 = 已排队工作量 / 并行度 + 本任务的预测执行时间，
+        选择预期完成时间最短的节点。
+        - 预测执行时间由CostModel根据该节点处理同类操作、同等输入大小的历史耗时给出
+        - 已排队工作量为该节点所有未完成任务的预测执行时间之和
+        - 并行度为节点上报的工作进程数
+        """
+        if not slaves:
+            return None
+        if task is None:
+            return self.least_connections(slaves)
+        best, best_time = None, None
+        for slave in slaves:
+            address = tuple(slave['address'])
+            parallelism = (slave.get('load') or {}).get('workers', 1)
+            finish_time = (self.queued_work.get(address, 0.0) / parallelism
+                           + self.cost_model.predict(address, task))
+            if best_time is None or finish_time < best_time:
+                best, best_time = slave, finish_time
+        return best
+    
+    def consistent_hash(self, slaves, task):
+        """
+        有界负载的一致性哈希算法
+        
+        按图片路径在一致性哈希环上选择节点，
+        同一图片的任务总是发往同一节点，从节点的结果缓存和解码图像缓存因此能够命中；
+        节点注册或移除时只有约1/N的图片改变归属。
+        
+        每个节点的未完成任务数不超过 ceil(load_factor * (总未完成任务数 + 1) / 节点数)，
+        归属节点超出上限（或已饱和、不在候选列表中）时沿环顺时针转给下一个节点，
+        热点图片不会压垮单个节点。
+        """
         if not slaves:
             return None
-        return min(slaves, key=lambda x: x['tasks'])
+        if task is None:
+            return self.least_connections(slaves)
+        by_address = {tuple(s['address']): s for s in slaves}
+        in_flight = self.in_flight
+        total = sum(in_flight.get(address, 0) for address in by_address)
+        capacity = math.ceil(self.load_factor * (total + 1) / len(by_address))
+        key = self._hash_key(task)
+        with self.ring_lock:
+            for address in by_address:
+                self.ring.add(address) # 新注册的节点在首次参与选择时加入哈希环
+            for address in self.ring.candidates(key):
+                slave = by_address.get(address)
+                if slave is not None and in_flight.get(address, 0) < capacity:
+                    return slave
+        return self.least_connections(slaves)
+    
+    def _hash_key(self, task):
+        """任务在哈希环上的键：图片路径（主节点不读取图片文件，不按内容哈希）"""
+        return task.get('image_path', '')
+    
+    def task_started(self, address, task=None):
+        """
+        任务转发给从节点时调用，未完成任务数加一并累加预测工作量
+        
+        Returns:
+            float: 本任务的预测执行时间，任务结束时传给task_finished
+        """
+        address = tuple(address)
+        cost = self.cost_model.predict(address, task) if task else 0.0
+        with self.in_flight_lock:
+            self.in_flight[address] = self.in_flight.get(address, 0) + 1
+            self.queued_work[address] = self.queued_work.get(address, 0.0) + cost
+        return cost
+    
+    def task_finished(self, address, cost=0.0):
+        """收到从节点响应或转发失败时调用，未完成任务数减一并扣除预测工作量"""
+        address = tuple(address)
+        with self.in_flight_lock:
+            count = self.in_flight.get(address, 0) - 1
+            if count > 0:
+                self.in_flight[address] = count
+                self.queued_work[address] = max(0.0, self.queued_work.get(address, 0.0) - cost)
+            else:
+                self.in_flight.pop(address, None)
+                self.queued_work.pop(address, None)
+    
+    def record_task_cost(self, address, task, execution_time):
+        """记录已完成任务在从节点上的执行时间，用于学习任务代价"""
+        self.cost_model.observe(address, task, execution_time)
         
     def random_selection(self, slaves):
         if not slaves:
@@ -30,6 +170,8 @@ class LoadBalancer:
         
         工作流程：
         1. 计算每个节点的权重: weight = 1/(response_time + 0.1)
+           - response_time 为该节点任务延迟的指数加权移动平均，由主节点在转发任务时被动更新
+           - 尚无延迟数据的节点使用已知节点的平均值，保证新节点也能分到任务
            - response_time 越小，权重越大
            - +0.1 是为了避免除以零
         
@@ -37,14 +179,22 @@ class LoadBalancer:
            - 使所有权重之和为1
         
         3. 按照归一化后的权重随机选择节点
+        
+        选择过程只读取内存中的统计数据，不进行任何网络请求。
         """
         if not slaves:
             return None
 
+        with self.latency_lock:
+            latencies = [self.latency.get(tuple(slave['address'])) for slave in slaves]
+        known = [l for l in latencies if l is not None and l != float('inf')]
+        default = sum(known) / len(known) if known else 0.0
+        
         # 计算每个节点的权重
         weights = []
-        for slave in slaves:
-            response_time = self._get_response_time(slave['address'])  # 获取响应时间
+        for response_time in latencies:
+            if response_time is None:
+                response_time = default
             weight = 1.0 / (response_time + 0.1)  # 响应时间越短，权重越大
             weights.append(weight)
         
@@ -59,9 +209,63 @@ class LoadBalancer:
         # 根据权重随机选择一个节点,引入随机性，避免负载集中
         return random.choices(slaves, weights=normalized_weights)[0]
     
+    def record_latency(self, address, latency):
+        """
+        更新从节点的延迟估计（指数加权移动平均）
+        
+        Args:
+            address (tuple): 从节点地址 (ip, port)
+            latency (float): 观测到的延迟（秒），无穷大表示节点不可用
+        """
+        address = tuple(address)
+        with self.latency_lock:
+            current = self.latency.get(address)
+            if current is None or current == float('inf') or latency == float('inf'):
+                self.latency[address] = latency
+            else:
+                self.latency[address] = current + self.latency_alpha * (latency - current)
+            self.last_sample[address] = time.time()
+    
+    def forget_slave(self, address):
+        """清除已移除节点的统计数据"""
+        address = tuple(address)
+        with self.latency_lock:
+            self.latency.pop(address, None)
+            self.last_sample.pop(address, None)
+        self.cost_model.forget(address)
+        with self.ring_lock:
+            self.ring.remove(address)
+    
+    def start_prober(self, get_slaves, interval=5, idle_after=10):
+        """
+        启动后台探测线程，定期ping空闲节点以刷新其延迟估计
+        
+        只有在idle_after秒内没有任何延迟样本的节点才会被探测，
+        繁忙节点的延迟完全由任务的实际延迟更新。
+        
+        Args:
+            get_slaves (callable): 返回当前从节点列表的函数
+            interval (float): 探测间隔（秒）
+            idle_after (float): 节点空闲多久后开始探测（秒）
+        """
+        def probe_loop():
+            while True:
+                time.sleep(interval)
+                now = time.time()
+                for slave in get_slaves():
+                    address = tuple(slave['address'])
+                    with self.latency_lock:
+                        last = self.last_sample.get(address, 0)
+                    if now - last >= idle_after:
+                        self.record_latency(address, self._get_response_time(address))
+        
+        thread = threading.Thread(target=probe_loop, daemon=True)
+        thread.start()
+        return thread
+    
     def _get_response_time(self, address):
         """
-        测量从节点的响应时间
+        测量从节点的响应时间，仅供后台探测线程使用
         
         Args:
             address (tuple): 从节点的地址元组 (ip, port)
@@ -73,24 +277,17 @@ class LoadBalancer:
             # 记录开始时间
             start_time = time.time()
             
-            # 创建新的socket连接
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(2)  # 设置2秒超时，避免长时间等待
+            # 创建新的连接，设置2秒超时，避免长时间等待
+            conn = connect(address, timeout=2)
             
-            # 尝试连接到从节点
-            sock.connect(address)
-            
-            # 发送ping消息
-            sock.send(json.dumps({'type': 'ping'}).encode())
-            
-            # 等待从节点响应
-            sock.recv(1024)
+            # 发送ping消息并等待从节点响应
+            conn.request({'type': 'ping'})
             
             # 计算总响应时间
             response_time = time.time() - start_time
             
             # 关闭连接
-            sock.close()
+            conn.close()
             
             return response_time
             
@@ -99,12 +296,26 @@ class LoadBalancer:
             # 返回无穷大，表示该节点当前不可用
             return float('inf')
             
-    def select_slave(self, slaves, algorithm='round_robin'):
+    def select_slave(self, slaves, algorithm='round_robin', task=None):
+        """
+        Args:
+            slaves (list): 候选从节点列表
+            algorithm (str): 负载均衡算法名称
+            task (dict, optional): 任务数据，expected_completion_time和consistent_hash算法需要
+        
+        Raises:
+            UnknownAlgorithm: algorithm不在ALGORITHMS中
+        """
         algorithms = {
             'round_robin': self.round_robin,
             'least_connections': self.least_connections,
             'random': self.random_selection,
-            'weighted_response_time': self.weighted_response_time
+            'weighted_response_time': self.weighted_response_time,
+            'power_of_two': self.power_of_two,
+            'expected_completion_time': lambda s: self.expected_completion_time(s, task),
+            'consistent_hash': lambda s: self.consistent_hash(s, task)
         }
         
-        return algorithms.get(algorithm, self.round_robin)(slaves) 
\ No newline at end of file
+        if algorithm not in algorithms:
+            raise UnknownAlgorithm(algorithm)
+        return algorithms[algorithm](slaves) 
\ No newline at end of file
@@ -1,14 +1,24 @@
 import socket
-import json
 import threading
 import time
-from load_balancer import LoadBalancer
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from batch import REQUIRED_FIELDS, BatchError, BatchSummary, batch_error, batch_result, batch_tasks
+from cluster_state import StateDiff
+from load_balancer import LoadBalancer, UnknownAlgorithm
+from metrics import MasterMetrics, algorithm_label, serve, task_labels
+from protocol import Connection, connect
+from connection_pool import ConnectionPool, PoolExhausted
+from slave_registry import SlaveRegistry
+from tracing import Tracer
 import logging
 import signal
 import sys
 
 logging.basicConfig(filename='master.log', level=logging.INFO)
 
+LOAD_INFO_TTL = 2.0 # 从节点负载信息的有效期（秒），过期后不再据此判断节点是否饱和
+PROFILE_TIMEOUT = 30.0 # 转发剖析请求的超时时间（秒），结束剖析时从节点需要收集各工作进程的结果
+
 class Master:
     """
     分布式系统的主节点类，负责管理从节点、任务分发和负载均衡。
@@ -16,24 +26,41 @@ class Master:
     属性:
         host (str): 主节点监听的IP地址
         port (int): 主节点监听的端口号
-        slaves (list): 存储所有已注册的从节点信息
+        registry (SlaveRegistry): 已注册的从节点，按 (host, port) 索引
+        slaves (tuple): 当前从节点信息的不可变快照
         load_balancer (LoadBalancer): 负载均衡器实例
         heartbeat_timeout (float): 心跳超时时间（秒）
+        connection_pool (ConnectionPool): 到从节点的持久连接池
     """
 
-    def __init__(self, host='0.0.0.0', port=5008):
+    def __init__(self, host='0.0.0.0', port=5008, max_idle_per_slave=4, max_requests_per_slave=8,
+                 backlog=128, probe_interval=0, metrics_port=0, trace_path=None, trace_sample=0.0):
         self.host = host
         self.port = port
-        self.slaves = []
+        self.registry = SlaveRegistry()
         self.load_balancer = LoadBalancer()
+        self.probe_interval = probe_interval # 空闲节点延迟探测间隔（秒），0表示不探测
+        self.metrics = MasterMetrics() # 按操作和算法分类的计数器和延迟直方图
+        self.metrics_port = metrics_port # 指标HTTP端口，0表示不提供
+        # 追踪：记录带追踪ID的任务在主节点的各阶段，trace_sample为没有追踪ID的任务新建追踪的概率
+        self.tracer = Tracer(trace_path, f'master:{port}', trace_sample)
+        self.connection_pool = ConnectionPool(
+            max_idle=max_idle_per_slave, # 每个从节点保留的空闲连接数
+            max_concurrent=max_requests_per_slave # 每个从节点的并发请求上限
+        )
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM) # 创建socket对象
         self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1) # 设置socket选项
         self.socket.bind((self.host, self.port)) # 绑定地址和端口
-        self.socket.listen(5) # 设置监听队列大小
+        self.socket.listen(backlog) # 设置监听队列大小
         self.running = True # 运行标志
         signal.signal(signal.SIGINT, self._signal_handler) # 捕获Ctrl+C信号
         signal.signal(signal.SIGTERM, self._signal_handler) # 捕获kill信号
         
+    @property
+    def slaves(self):
+        """当前从节点的不可变快照，成员变化时整体替换"""
+        return self.registry.snapshot()
+    
     def _signal_handler(self, signum, frame): # 信号处理函数
         print("\n正在关闭主节点...")
         self.running = False
@@ -42,6 +69,7 @@ class Master:
         except:
             pass
         self.socket.close()
+        self.tracer.close() # 写出缓存的span
         logging.info("主节点已关闭")
         sys.exit(0)
         
@@ -58,6 +86,8 @@ class Master:
         logging.info(f"主节点启动于 {self.host}:{self.port}")
         heartbeat_thread = threading.Thread(target=self._heartbeat_check, daemon=True) # 创建心跳检查线程
         heartbeat_thread.start()
+        self._start_prober()
+        self._start_metrics()
         
         try: 
             while self.running:
@@ -65,7 +95,7 @@ class Master:
                     self.socket.settimeout(1.0) # 设置超时时间
                     client_socket, address = self.socket.accept() # 接受连接
                     threading.Thread(target=self._handle_connection, 
-                                  args=(client_socket, address)).start() # 创建线程处理连接
+                                  args=(client_socket, address), daemon=True).start() # 创建线程处理连接，持久连接不阻止进程退出
                 except socket.timeout:
                     continue # 超时继续
                 except Exception as e:
@@ -76,12 +106,26 @@ class Master:
         finally:
             self._cleanup()
     
+    def _start_metrics(self):
+        """按配置启动指标HTTP服务"""
+        if self.metrics_port:
+            serve(self.metrics.registry, self.metrics_port)
+            logging.info(f"指标服务启动于端口 {self.metrics_port}")
+    
+    def _start_prober(self):
+        """按配置启动空闲节点的延迟探测线程"""
+        if self.probe_interval > 0:
+            self.load_balancer.start_prober(lambda: self.slaves, interval=self.probe_interval,
+                                            idle_after=2 * self.probe_interval)
+    
     def _cleanup(self):
         try:
             self.socket.shutdown(socket.SHUT_RDWR)
         except:
             pass
         self.socket.close()
+        self.connection_pool.close()
+        self.tracer.close()
         logging.info("主节点资源已清理")
     
     def _handle_connection(self, client_socket, address):
@@ -92,25 +136,48 @@ class Master:
             client_socket (socket): 新建立的客户端socket连接
             address (tuple): 客户端地址信息
             
-        根据消息类型分发到不同的处理函数：
+        同一连接上可以连续发送多条消息，根据消息类型分发到不同的处理函数：
         - register: 节点注册
         - heartbeat: 心跳更新
         - task: 任务处理
+        - batch: 批量任务处理
+        - health_check: 健康检查
+        - status_request: 状态查询
+        - subscribe: 状态订阅（之后该连接只用于推送状态）
+        - profile_start / profile_stop: 剖析指定的从节点
+        - 其他类型: 返回错误响应
         """
+        conn = Connection(client_socket)
         try:
-            data = client_socket.recv(1024).decode() # 接收数据
-            message = json.loads(data) # 解析JSON数据
-            
-            if message['type'] == 'register':
-                self._handle_register(message, address) # 处理注册请求
-            elif message['type'] == 'task':
-                self._handle_task(message, client_socket) # 处理任务请求
-            elif message['type'] == 'health_check':
-                self._handle_health_check(client_socket) # 处理健康检查请求
-            elif message['type'] == 'status_request':
-                self._handle_status_request(client_socket) # 处理状态请求
-            elif message['type'] == 'heartbeat':
-                self._handle_heartbeat(message, address) # 处理心跳请求
+            while self.running:
+                received_before = conn.bytes_received
+                received = conn.recv() # 接收一条完整消息
+                if received is None:
+                    break # 对端关闭连接
+                request_id, message = received
+                message_type = message.get('type', 'response') # 响应帧没有type字段
+                frame_size = conn.bytes_received - received_before
+                
+                if message_type == 'register':
+                    self._handle_register(message, address) # 处理注册请求
+                elif message_type == 'task':
+                    self._count_bytes(message, frame_size, 0)
+                    self._handle_task(message, conn, request_id) # 处理任务请求
+                elif message_type == 'batch':
+                    self._count_bytes(message, frame_size, 0)
+                    self._handle_batch(message, conn, request_id) # 处理批量任务请求
+                elif message_type == 'health_check':
+                    self._handle_health_check(conn, request_id) # 处理健康检查请求
+                elif message_type == 'status_request':
+                    self._handle_status_request(conn, request_id) # 处理状态请求
+                elif message_type == 'subscribe':
+                    self._handle_subscribe(message, conn, request_id) # 持续推送状态，直到连接关闭
+                elif message_type == 'heartbeat':
+                    self._handle_heartbeat(message, address) # 处理心跳请求
+                elif message_type in ('profile_start', 'profile_stop'):
+                    conn.send(self._relay_profile(message), request_id) # 转发给指定的从节点
+                else:
+                    conn.send(self._unknown_message(message), request_id) # 请求方在等待该请求ID的响应
             
         except Exception as e:
             logging.error(f"处理连接错误: {e}")
@@ -121,6 +188,12 @@ class Master:
                 pass
             client_socket.close()
     
+    def _unknown_message(self, message):
+        """主节点不处理的消息类型的错误响应"""
+        message_type = message.get('type', 'response')
+        logging.warning(f"收到无法处理的消息类型: {message_type}")
+        return {'status': 'error', 'message': f"主节点不处理 {message_type} 消息"}
+    
     def _handle_register(self, message, address): # 处理新节点注册请求
         """
         处理从节点的注册请求。
@@ -135,63 +208,235 @@ class Master:
         - 心跳时间戳
         - 总执行时间
         - 算法统计信息
+        
+        同一地址再次注册（从节点重启）时更新原记录，并关闭到该节点的旧池化连接。
         """
-        slave_info = {
-            'address': (address[0], message['port']), # 节点地址
-            'tasks': 0, # 任务数
-            'last_heartbeat': time.time(), # 最后一次心跳时间
-            'total_execution_time': 0, # 总执行时间
-            'algorithm_stats': {} # 算法统计信息
-        }
-        self.slaves.append(slave_info)
-        logging.info(f"新从节点注册: {address[0]}:{message['port']}")
+        slave_address = (address[0], message['port'])
+        _, is_new = self.registry.register(slave_address)
+        if is_new:
+            logging.info(f"新从节点注册: {address[0]}:{message['port']}")
+        else:
+            self.connection_pool.remove(slave_address) # 重启前的连接已失效
+            logging.info(f"从节点重新注册: {address[0]}:{message['port']}")
     
-    def _handle_task(self, message, client_socket): # 处理任务请求
+    def _handle_task(self, message, conn, request_id): # 处理任务请求
         """
         处理客户端发来的任务请求。
         
         Args:
             message (dict): 任务信息字典, 包含任务详情和算法类型, 详见client.py
-            client_socket (socket): 客户端的socket连接
+            conn (Connection): 客户端的消息连接
+            request_id (int): 请求ID，响应时原样带回
             
         流程：
         1. 通过负载均衡器选择合适的从节点
-        2. 建立与选中从节点的连接
+        2. 从连接池获取与选中从节点的连接
         3. 转发任务并等待响应
         4. 将结果返回给客户端
         """
-        selected_slave = self.load_balancer.select_slave(
-            self.slaves, # 从节点列表
-            algorithm=message['data']['algorithm']
-        ) # load_balancer 选择从节点
+        response = self._dispatch_task(message)
+        sent_before = conn.bytes_sent
+        conn.send(response, request_id) # 发送响应给客户端
+        self._count_bytes(message, 0, conn.bytes_sent - sent_before)
+    
+    def _count_bytes(self, message, received, sent):
+        """记录客户端任务和批量任务的收发字节数，批量任务的operation标签为'batch'"""
+        data = message.get('data')
+        if not isinstance(data, dict):
+            data = {} # 格式错误的请求，由处理函数返回错误
+        labels = (task_labels(data) if message['type'] == 'task'
+                  else ('batch', algorithm_label(data.get('algorithm', 'round_robin'))))
+        if received:
+            self.metrics.bytes_in.labels(*labels).inc(received)
+        if sent:
+            self.metrics.bytes_out.labels(*labels).inc(sent)
+    
+    def _dispatch_task(self, message):
+        """
+        选择从节点并转发一个任务。
         
-        if not selected_slave: 
-            response = {'status': 'error', 'message': '无可用从节点'}
-            client_socket.send(json.dumps(response).encode())
-            return
+        Args:
+            message (dict): 任务消息
             
-        slave_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM) # 创建socket对象将任务转发给选中的从节点
+        Returns:
+            dict: 从节点的响应，失败时为错误响应
+        
+        从节点因等待队列已满拒绝任务时，重新选择一次（不包括拒绝任务的节点）。
+        """
+        invalid = self._invalid_task(message)
+        if invalid:
+            return invalid
+        task_start = time.time()
+        trace_id = self.tracer.continue_trace(message['data']) # 追踪ID随任务转发给从节点
         try:
-            slave_socket.connect(selected_slave['address']) # 连接到选中的从节点
-            slave_socket.send(json.dumps(message).encode()) # 发送任务请求  
-            response = json.loads(slave_socket.recv(1024).decode()) # 接收从节点响应
-            response['slave'] = f"{selected_slave['address'][0]}:{selected_slave['address'][1]}" # 添加从节点信息
-            client_socket.send(json.dumps(response).encode()) # 发送响应给客户端
-            
+            selected_slave = self._select_slave(message, trace_id) # load_balancer 选择从节点
+        except UnknownAlgorithm as e:
+            return self._finish_task(message, self._reject_algorithm(e), trace_id, task_start)
+        
+        if not selected_slave: 
+            return self._finish_task(message, {'status': 'error', 'message': '无可用从节点'}, trace_id, task_start)
+        
+        response = self._forward(selected_slave, message, trace_id)
+        if response.get('status') == 'rejected':
+            retry_slave = self._select_slave(message, trace_id, exclude=selected_slave['address'])
+            if retry_slave:
+                response = self._forward(retry_slave, message, trace_id)
+        return self._finish_task(message, response, trace_id, task_start)
+    
+    def _forward(self, slave, message, trace_id):
+        """通过连接池将任务转发给选中的从节点，返回从节点的响应或错误响应"""
+        cost = self.load_balancer.task_started(slave['address'], message['data']) # 记录未完成任务数和预测工作量
+        forward_start = time.time()
+        try:
+            response = self.connection_pool.request(slave['address'], message) # 通过连接池转发任务并接收从节点响应
+            self._on_task_success(slave, message['data'], response, time.time() - forward_start)
+        except PoolExhausted as e:
+            logging.warning(f"任务分发等待超时: {e}")
+            response = {'status': 'error', 'message': '从节点繁忙'}
         except Exception as e:
-            logging.error(f"任务分发错误: {e}")
-            self.remove_slave(selected_slave['address'])
-            response = {'status': 'error', 'message': '从节点连接失败'}
-            try:
-                client_socket.send(json.dumps(response).encode())
-            except:
-                pass
+            response = self._on_task_failure(slave, e)
         finally:
-            try:
-                slave_socket.shutdown(socket.SHUT_RDWR) 
-            except:
-                pass
-            slave_socket.close()
+            self.load_balancer.task_finished(slave['address'], cost)
+            self.tracer.add(trace_id, 'master.forward', forward_start, time.time() - forward_start,
+                            slave=f"{slave['address'][0]}:{slave['address'][1]}")
+        return response
+    
+    def _invalid_task(self, message):
+        """格式错误的任务请求的错误响应，格式正确时返回None"""
+        data = message.get('data')
+        if isinstance(data, dict) and all(isinstance(data.get(field), str) for field in REQUIRED_FIELDS):
+            return None
+        logging.warning(f"任务格式错误: {message}")
+        return {'status': 'error', 'message': f"任务格式错误: data 必须包含 {', '.join(REQUIRED_FIELDS)}"}
+    
+    def _finish_task(self, message, response, trace_id, task_start):
+        """记录任务数、未成功的任务数和主节点上的任务span，返回response"""
+        labels = task_labels(message['data'])
+        self.metrics.tasks.labels(*labels).inc()
+        if response.get('status') != 'success':
+            self.metrics.errors.labels(*labels).inc()
+        self.tracer.add(trace_id, 'master.task', task_start, time.time() - task_start,
+                        operation=labels[0], algorithm=labels[1], status=response.get('status'))
+        return response
+    
+    def _handle_batch(self, message, conn, request_id):
+        """
+        处理批量任务请求。
+        
+        Args:
+            message (dict): 批量任务消息，格式见batch_tasks
+            conn (Connection): 客户端的消息连接
+            request_id (int): 请求ID，所有结果帧和汇总帧都带回该ID
+            
+        批量任务中的各个任务并发分发到从节点，并发数等于集群的并发请求上限；
+        每个任务完成后立即以batch_result帧返回（ordered为True时按提交顺序返回），
+        全部完成后返回一个batch_summary帧。请求格式错误时不分发任何任务，只返回错误的batch_summary帧。
+        """
+        try:
+            tasks = batch_tasks(message)
+        except BatchError as e:
+            logging.warning(f"批量任务被拒绝: {e}")
+            conn.send(batch_error(message, e), request_id)
+            return
+        ordered = message['data'].get('ordered', False)
+        window = max(1, len(self.slaves) * self.connection_pool.max_concurrent) # 同时在途的任务数
+        summary = BatchSummary(len(tasks))
+        sent_before = conn.bytes_sent # 结果帧都由当前线程发送
+        
+        with ThreadPoolExecutor(max_workers=min(window, len(tasks)) or 1) as executor:
+            pending = {}
+            next_index = 0
+            buffered = {} # ordered模式下提前完成、尚未轮到返回的结果
+            next_to_send = 0
+            while next_index < len(tasks) or pending:
+                # 保持窗口内的任务数
+                while next_index < len(tasks) and len(pending) < window:
+                    future = executor.submit(self._dispatch_task, tasks[next_index])
+                    pending[future] = next_index
+                    next_index += 1
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    response = future.result()
+                    summary.add(response)
+                    if not ordered:
+                        conn.send(batch_result(index, response), request_id)
+                        continue
+                    buffered[index] = response
+                    while next_to_send in buffered:
+                        conn.send(batch_result(next_to_send, buffered.pop(next_to_send)), request_id)
+                        next_to_send += 1
+        conn.send(summary.to_message(), request_id)
+        self._count_bytes(message, 0, conn.bytes_sent - sent_before)
+    
+    def _reject_algorithm(self, error):
+        """任务指定了不存在的算法时的错误响应，列出可用的算法"""
+        logging.warning(f"任务被拒绝: {error}")
+        return {'status': 'error', 'message': str(error)}
+    
+    def _select_slave(self, message, trace_id=None, exclude=None):
+        """
+        根据任务指定的算法选择从节点，跳过任务队列已满的节点，并记录选择耗时。
+        
+        Args:
+            exclude (tuple, optional): 不参与选择的从节点地址（已拒绝该任务的节点）
+        
+        Raises:
+            UnknownAlgorithm: 任务指定的算法不存在
+        """
+        select_start = time.time()
+        exclude = tuple(exclude) if exclude else None
+        candidates = [s for s in self.slaves
+                      if not self._is_saturated(s) and tuple(s['address']) != exclude]
+        selected = self.load_balancer.select_slave(
+            candidates, # 可接收任务的从节点列表
+            algorithm=message['data']['algorithm'],
+            task=message['data']
+        )
+        select_time = time.time() - select_start
+        self.metrics.select.labels(*task_labels(message['data'])).observe(select_time)
+        self.tracer.add(trace_id, 'master.select', select_start, select_time, candidates=len(candidates))
+        return selected
+    
+    def _is_saturated(self, slave):
+        """根据最近上报的负载信息判断从节点的等待队列是否已满"""
+        load = slave.get('load')
+        if not load or time.time() - slave.get('load_updated', 0) > LOAD_INFO_TTL: # 两个字段可能正被心跳更新
+            return False
+        return load['queue_depth'] >= load['max_pending']
+    
+    def _update_load(self, slave, load):
+        """记录从节点上报的负载信息"""
+        if load:
+            slave['load'] = load
+            slave['load_updated'] = time.time()
+    
+    def _on_task_success(self, slave, task, response, forward_time):
+        """
+        任务转发成功后的处理
+        
+        Args:
+            slave (dict): 处理任务的从节点
+            task (dict): 任务数据
+            response (dict): 从节点的响应
+            forward_time (float): 从转发到收到响应的时间（秒）
+        
+        记录从节点负载、观测到的任务延迟和执行代价，并在响应中添加从节点信息。
+        """
+        self._update_load(slave, response.get('load'))
+        self.metrics.forward.labels(*task_labels(task)).observe(forward_time)
+        if response.get('status') == 'success':
+            self.load_balancer.record_latency(slave['address'], forward_time) # 被动更新延迟估计
+            if not response.get('cached'): # 缓存命中的执行时间不反映处理代价
+                self.load_balancer.record_task_cost(slave['address'], task,
+                                                    response.get('execution_time', forward_time))
+        response['slave'] = f"{slave['address'][0]}:{slave['address'][1]}"
+    
+    def _on_task_failure(self, slave, error):
+        """任务转发失败后的处理：移除从节点并返回错误响应"""
+        logging.error(f"任务分发错误: {error}")
+        self.remove_slave(slave['address'])
+        return {'status': 'error', 'message': '从节点连接失败'}
     
     def _heartbeat_check(self): 
         """
@@ -203,33 +448,76 @@ class Master:
         - 每隔一定时间执行一次
         """
         while self.running:
-            current_time = time.time()
-            offline_slaves = []
-            for slave in self.slaves:
-                if current_time - slave['last_heartbeat'] > 30:  # 30秒超时
-                    offline_slaves.append(slave['address'])
-            
-            # 移除超时的从节点
-            for address in offline_slaves:
-                self.remove_slave(address)
-                logging.info(f"从节点心跳超时，已移除: {address[0]}:{address[1]}")
-            
+            self._remove_offline_slaves()
             time.sleep(10)
     
-    def _handle_health_check(self, client_socket): 
+    def _remove_offline_slaves(self):
+        """移除心跳超时的从节点"""
+        for address in self.registry.expired(30):  # 30秒超时
+            self.remove_slave(address)
+            logging.info(f"从节点心跳超时，已移除: {address[0]}:{address[1]}")
+    
+    def _handle_health_check(self, conn, request_id): 
         response = {
             'status': 'ok',
             'time': time.time()
         }
-        client_socket.send(json.dumps(response).encode())
+        conn.send(response, request_id)
     
-    def _handle_status_request(self, client_socket):
+    def _handle_status_request(self, conn, request_id):
         status = {
             'master_status': 'running',
-            'slaves': self.slaves,
+            'slaves': self.registry.status(),
+            'connection_pool': self.connection_pool.stats(), # 连接池命中/未命中统计
             'time': time.time()
         }
-        client_socket.send(json.dumps(status).encode()) # 发送状态响应给monitor
+        conn.send(status, request_id) # 发送状态响应给monitor
+    
+    def _handle_subscribe(self, message, conn, request_id):
+        """
+        处理监控的状态订阅，消息格式见cluster_state。
+        
+        先推送一次完整状态，之后每隔interval秒推送一次增量（只含变化的字段），
+        每次推送的代价只与节点数有关。订阅占用该连接，直到连接关闭。
+        """
+        interval = max(0.1, float(message.get('interval', 1.0)))
+        diff = StateDiff() # 记录已推送给该订阅者的状态
+        while self.running:
+            conn.send(self._state_update(diff), request_id)
+            time.sleep(interval)
+    
+    def _state_update(self, diff):
+        """生成一帧state_update消息"""
+        return diff.update(self.registry.status(),
+                           master_status='running',
+                           connection_pool=self.connection_pool.stats(),
+                           time=time.time())
+    
+    def _relay_profile(self, message):
+        """
+        将剖析控制消息转发给message['slave']（'host:port'）指定的从节点，返回从节点的响应。
+        
+        使用单独的连接而不是连接池：剖析请求很少，结束剖析可能需要数秒，
+        不应占用任务转发的并发名额。
+        """
+        try:
+            host, port = message['slave'].rsplit(':', 1)
+            address = (host, int(port))
+        except (KeyError, AttributeError, ValueError):
+            return {'status': 'error', 'message': "需要指定从节点 'slave': 'host:port'"}
+        if self.registry.get(address) is None:
+            return {'status': 'error', 'message': f"未注册的从节点: {message['slave']}"}
+        forward = {key: value for key, value in message.items() if key != 'slave'}
+        conn = None
+        try:
+            conn = connect(address, timeout=PROFILE_TIMEOUT)
+            return conn.request(forward)
+        except Exception as e:
+            logging.error(f"转发剖析请求失败 {message['slave']}: {e}")
+            return {'status': 'error', 'message': f"转发剖析请求失败: {e}"}
+        finally:
+            if conn:
+                conn.close()
     
     def _handle_heartbeat(self, message, address):
         """
@@ -244,20 +532,59 @@ class Master:
         - 当前任务数
         - 总执行时间
         - 算法统计信息
+        - 负载信息（队列深度、活跃工作进程数）
+        - 结果缓存、解码图像缓存和输出写入队列统计
+        
+        节点按 (发送方IP, message['port']) 查找，message['port'] 是从节点在心跳消息中带上的自己的端口号。
+        已被移除（如心跳超时）但仍在发送心跳的节点重新加入。
         """
-        for slave in self.slaves:
-            if slave['address'][1] == message['port']: # message['port'] 是从节点在发送心跳消息时带上的自己的端口号
-                slave['last_heartbeat'] = time.time() 
-                slave['tasks'] = message.get('tasks', 0) 
-                slave['total_execution_time'] = message.get('total_execution_time', 0)
-                slave['algorithm_stats'] = message.get('algorithm_stats', {})
-                break
+        slave_address = (address[0], message['port'])
+        fields = {
+            'tasks': message.get('tasks', 0),
+            'total_execution_time': message.get('total_execution_time', 0),
+            'algorithm_stats': message.get('algorithm_stats', {}),
+            'result_cache': message.get('result_cache'),
+            'image_cache': message.get('image_cache'),
+            'output_writer': message.get('output_writer')
+        }
+        if message.get('load'):
+            fields.update(load=message['load'], load_updated=time.time())
+        if self.registry.heartbeat(slave_address, **fields) is None:
+            self.registry.register(slave_address)
+            self.registry.heartbeat(slave_address, **fields)
+            logging.info(f"未注册的从节点发送心跳，重新加入: {address[0]}:{message['port']}")
     
     def remove_slave(self, address):
         """移除指定地址的从节点"""
-        self.slaves = [s for s in self.slaves if s['address'] != address]
+        if self.registry.remove(address) is None:
+            return # 已被其他线程移除
+        self.connection_pool.remove(address) # 关闭到该节点的池化连接
+        self.load_balancer.forget_slave(address)
         logging.info(f"从节点已移除: {address[0]}:{address[1]}")
 
 if __name__ == '__main__':
-    master = Master()
-    master.start() 
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description='主节点')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5008)
+    parser.add_argument('--backlog', type=int, default=128, help='监听队列大小')
+    parser.add_argument('--mode', choices=['threaded', 'async'], default='threaded',
+                        help='threaded: 每个连接一个线程; async: asyncio事件循环')
+    parser.add_argument('--probe-interval', type=float, default=0,
+                        help='空闲从节点延迟探测间隔（秒），0表示不探测')
+    parser.add_argument('--metrics-port', type=int, default=0,
+                        help='Prometheus指标HTTP端口（GET /metrics），0表示不提供')
+    parser.add_argument('--trace', metavar='FILE', default=None,
+                        help='记录带追踪ID的任务，以Chrome trace-event JSON写入该文件')
+    parser.add_argument('--trace-sample', type=float, default=0.0,
+                        help='为没有追踪ID的任务新建追踪的概率（0-1），默认只记录客户端发起的追踪')
+    args = parser.parse_args()
+    
+    options = dict(backlog=args.backlog, probe_interval=args.probe_interval, metrics_port=args.metrics_port,
+                   trace_path=args.trace, trace_sample=args.trace_sample)
+    if args.mode == 'async':
+        from async_master import AsyncMaster
+        master = AsyncMaster(args.host, args.port, **options)
+    else:
+        master = Master(args.host, args.port, **options)
+    master.start()
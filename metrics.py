@@ -0,0 +1,271 @@
+"""
+Prometheus文本格式的指标：计数器和固定分桶的直方图。
+
+记录一个指标只需一次字典查找（按标签值取子指标）、一次二分查找和一次加锁的加法，
+可以在任务处理路径上常开。指标通过HTTP的 /metrics 提供，格式为 Prometheus text format 0.0.4。
+
+用法:
+    registry = Registry()
+    forward = registry.histogram('master_forward_seconds', '转发耗时', ('operation', 'algorithm'))
+    forward.labels('noise', 'round_robin').observe(0.12)
+    serve(registry, 9100)
+"""
+import abc
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from load_balancer import ALGORITHMS
+
+# 默认分桶上界（秒），覆盖从亚毫秒的选择时间到数秒的图片处理
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TASK_LABELS = ('operation', 'algorithm')
+# 标签值来自客户端输入，不在已知集合中的操作或算法名称统一记为OTHER，标签取值数量有上限
+OPERATIONS = ('crop', 'noise', 'grayscale', 'batch') # 与image_tasks.OUTPUT_SUFFIXES一致，另加批量任务
+OTHER = 'other'
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _CounterChild:
+    __slots__ = ('value', 'lock')
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ('bounds', 'counts', 'sum', 'lock')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1) # 最后一个为 +Inf 桶
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.bounds, value) # 第一个上界 >= value 的桶
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class _Metric(abc.ABC):
+    """带标签的指标，按标签值缓存子指标"""
+
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    @abc.abstractmethod
+    def _new_child(self):
+        """创建一组标签值对应的子指标"""
+
+    @abc.abstractmethod
+    def _render_child(self, values, child):
+        """子指标的文本格式行"""
+
+    def labels(self, *values):
+        """按标签值（与labelnames顺序一致）取子指标，不存在时创建"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} 需要标签 {self.labelnames}，收到 {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _samples(self):
+        with self._lock:
+            return list(self._children.items())
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        for values, child in self._samples():
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        """无标签时直接计数"""
+        self.labels().inc(amount)
+
+    def _render_child(self, values, child):
+        with child.lock:
+            value = child.value
+        return [f'{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}']
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        """无标签时直接记录"""
+        self.labels().observe(value)
+
+    def _render_child(self, values, child):
+        with child.lock:
+            counts = list(child.counts)
+            total = child.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = f'le="{_format_value(float(bound))}"'
+            lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}')
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+        lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Registry:
+    """一个进程（主节点或从节点）的全部指标"""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def render(self):
+        """生成 Prometheus 文本格式的全部指标"""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def serve(registry, port, host='0.0.0.0'):
+    """
+    在后台线程中启动HTTP服务，GET /metrics 返回全部指标。
+
+    Returns:
+        ThreadingHTTPServer: HTTP服务，调用shutdown()停止
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass # 抓取请求不写日志
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+
+def operation_label(operation):
+    """操作标签值，未知的操作记为'other'"""
+    return operation if operation in OPERATIONS else OTHER
+
+
+def algorithm_label(algorithm):
+    """算法标签值，未知的算法名称记为'other'"""
+    return algorithm if algorithm in ALGORITHMS else OTHER
+
+
+def task_labels(task):
+    """任务的标签值 (operation, algorithm)"""
+    return operation_label(task.get('operation', '')), algorithm_label(task.get('algorithm', ''))
+
+
+class MasterMetrics:
+    """主节点的指标"""
+
+    def __init__(self):
+        self.registry = Registry()
+        r = self.registry
+        self.tasks = r.counter('master_tasks_total', '主节点分发的任务数', TASK_LABELS)
+        self.errors = r.counter('master_task_errors_total', '未成功的任务数（无可用节点、节点繁忙、转发失败或从节点报错）',
+                                TASK_LABELS)
+        self.select = r.histogram('master_select_seconds', '负载均衡选择从节点的耗时（秒）', TASK_LABELS)
+        self.forward = r.histogram('master_forward_seconds', '从转发任务到收到从节点响应的耗时（秒）', TASK_LABELS)
+        self.bytes_in = r.counter('master_received_bytes_total', '从客户端接收的任务帧字节数', TASK_LABELS)
+        self.bytes_out = r.counter('master_sent_bytes_total', '发送给客户端的响应帧字节数', TASK_LABELS)
+
+
+class SlaveMetrics:
+    """从节点的指标"""
+
+    def __init__(self):
+        self.registry = Registry()
+        r = self.registry
+        self.tasks = r.counter('slave_tasks_total', '从节点收到的任务数', TASK_LABELS)
+        self.errors = r.counter('slave_task_errors_total', '处理失败的任务数', TASK_LABELS)
+        self.rejected = r.counter('slave_tasks_rejected_total', '因等待队列已满被拒绝的任务数', TASK_LABELS)
+        self.cache_hits = r.counter('slave_result_cache_hits_total', '由结果缓存直接返回的任务数', TASK_LABELS)
+        self.queue_wait = r.histogram('slave_queue_wait_seconds', '任务在工作进程池中的等待时间（秒，含进程间传输）',
+                                      TASK_LABELS)
+        self.load = r.histogram('slave_load_seconds', '图片加载耗时（秒）', TASK_LABELS)
+        self.process = r.histogram('slave_process_seconds', '图片处理耗时（秒）', TASK_LABELS)
+        self.save = r.histogram('slave_save_seconds', '图片保存耗时（秒）', TASK_LABELS)
+        self.total = r.histogram('slave_task_seconds', '任务总耗时（秒，加载 + 处理 + 保存）', TASK_LABELS)
+        self.bytes_in = r.counter('slave_received_bytes_total', '接收的任务帧字节数', TASK_LABELS)
+        self.bytes_out = r.counter('slave_sent_bytes_total', '发送的响应帧字节数', TASK_LABELS)
+
+    def observe_stages(self, labels, time_stats):
+        """记录一个任务各阶段的耗时"""
+        self.load.labels(*labels).observe(time_stats['load_time'])
+        self.process.labels(*labels).observe(time_stats['process_time'])
+        self.save.labels(*labels).observe(time_stats['save_time'])
+        self.total.labels(*labels).observe(time_stats['total_time'])
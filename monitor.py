@@ -1,57 +1,213 @@
-import socket
 import json
 import threading
 import time
-from flask import Flask, render_template
+from collections import deque
+from flask import Flask, Response, jsonify, render_template, stream_with_context
 import signal
 import sys
+from cluster_state import apply_update
+from protocol import connect
 
 app = Flask(__name__)
 
+SERIES_LENGTH = 300 # 每个从节点保留的采样点数
+SSE_KEEPALIVE = 15 # 没有更新时发送SSE注释的间隔（秒），防止代理断开空闲连接
+
+class SlaveSeries:
+    """
+    一个从节点的指标时间序列（吞吐量、平均延迟、队列深度）。
+
+    采样点保存在固定长度的环形缓冲区中，追加一个点的代价与历史长度无关。
+    吞吐量和平均延迟由相邻两次心跳之间的任务数和执行时间之差计算；
+    队列深度随任务响应更新。每次状态推送都为每个已知节点记录一个点（没有变化的节点沿用上一次的值），
+    各节点的序列因此在时间上对齐，空闲节点也没有空档。
+    """
+
+    def __init__(self, length=SERIES_LENGTH):
+        self.points = deque(maxlen=length)
+        self.last_heartbeat = None # (心跳时间, 任务数, 总执行时间)
+        self.throughput = 0.0
+        self.latency = 0.0
+
+    def sample(self, now, slave):
+        heartbeat = (slave.get('last_heartbeat', now), slave.get('tasks', 0),
+                     slave.get('total_execution_time', 0))
+        if self.last_heartbeat is None or heartbeat[0] != self.last_heartbeat[0]: # 收到新的心跳
+            if self.last_heartbeat is not None:
+                elapsed = heartbeat[0] - self.last_heartbeat[0]
+                tasks = heartbeat[1] - self.last_heartbeat[1]
+                if elapsed > 0 and tasks >= 0: # 从节点重启后计数会归零
+                    self.throughput = tasks / elapsed
+                    self.latency = (heartbeat[2] - self.last_heartbeat[2]) / tasks if tasks else 0.0
+            self.last_heartbeat = heartbeat
+        load = slave.get('load') or {}
+        point = {
+            'time': now,
+            'throughput': self.throughput, # 任务/秒
+            'latency': self.latency, # 秒
+            'queue_depth': load.get('queue_depth', 0)
+        }
+        self.points.append(point)
+        return point
+
 class Monitor:
-    def __init__(self, master_host='localhost', master_port=5008):
+    def __init__(self, master_host='localhost', master_port=5008, interval=1.0, series_length=SERIES_LENGTH):
         self.master_address = (master_host, master_port)
+        self.interval = interval # 主节点推送状态的间隔（秒）
+        self.series_length = series_length
         self.cluster_status = {'master_status': 'unknown', 'slaves': []}
+        self.slaves = {} # 'host:port' -> 节点信息，按主节点推送的增量更新
+        self.series = {} # 'host:port' -> SlaveSeries
+        self.version = 0 # 每应用一次推送加1
+        self.latest = None # 最近一次推送对应的SSE事件
+        self.changed = threading.Condition() # 保护以上状态，并通知SSE连接
         self.running = True
         self.status_thread = None
+        self.connection = None # 与主节点的订阅连接
         signal.signal(signal.SIGINT, self._signal_handler)
-        
+
     def _signal_handler(self, signum, frame):
         print("\n正在关闭监控系统...")
         self.running = False
         sys.exit(0)
-        
-    def get_cluster_status(self):
-        monitor_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        try:
-            monitor_socket.connect(self.master_address)
-            message = {
-                'type': 'status_request'
+
+    def subscribe_loop(self):
+        """订阅主节点的状态推送，连接断开后重新订阅（重新订阅时先收到完整状态）"""
+        while self.running:
+            try:
+                self.connection = connect(self.master_address, timeout=max(10, 5 * self.interval))
+                message = {
+                    'type': 'subscribe',
+                    'interval': self.interval
+                }
+                for update in self.connection.stream(message, end_type=None):
+                    self._apply(update)
+            except Exception as e:
+                print(f"状态订阅中断: {e}")
+                self._master_unknown()
+            finally:
+                if self.connection:
+                    self.connection.close()
+                self.connection = None
+            time.sleep(1)
+
+    def _apply(self, update):
+        """应用一次状态推送，为每个节点记录采样点，并通知SSE连接（字段只发送变化的节点）"""
+        with self.changed:
+            changed, removed = apply_update(self.slaves, update)
+            for key in removed:
+                self.series.pop(key, None)
+            points = {}
+            for key, slave in self.slaves.items():
+                series = self.series.get(key)
+                if series is None:
+                    series = self.series[key] = SlaveSeries(self.series_length)
+                points[key] = series.sample(update['time'], slave)
+            self.cluster_status = {
+                'master_status': update['master_status'],
+                'slaves': list(self.slaves.values()),
+                'connection_pool': update.get('connection_pool'),
+                'time': update['time']
+            }
+            self.version += 1
+            self.latest = {
+                'version': self.version,
+                'master_status': update['master_status'],
+                'time': update['time'],
+                'changed': {key: self._summary(key) for key in changed},
+                'removed': removed,
+                'points': points
             }
-            monitor_socket.send(json.dumps(message).encode())
-            status = json.loads(monitor_socket.recv(4096).decode())
-            self.cluster_status = status
-        except Exception as e:
-            print(f"获取状态失败: {e}")
-        finally:
-            monitor_socket.close()
-            
-    def update_status_loop(self):
+            self.changed.notify_all()
+
+    def _master_unknown(self):
+        """订阅中断：将主节点状态置为unknown并通知SSE连接（重连成功后由下一次推送恢复）"""
+        with self.changed:
+            if self.cluster_status['master_status'] == 'unknown':
+                return # 重连失败时不重复通知
+            now = time.time()
+            self.cluster_status = dict(self.cluster_status, master_status='unknown', time=now)
+            self.version += 1
+            self.latest = {
+                'version': self.version,
+                'master_status': 'unknown',
+                'time': now,
+                'changed': {},
+                'removed': [],
+                'points': {}
+            }
+            self.changed.notify_all()
+
+    def _summary(self, key):
+        """页面实时更新的节点字段，调用方需持有changed"""
+        slave = self.slaves[key]
+        return {
+            'tasks': slave.get('tasks', 0),
+            'total_execution_time': slave.get('total_execution_time', 0),
+            'last_heartbeat': slave.get('last_heartbeat', 0),
+            'load': slave.get('load')
+        }
+
+    def snapshot(self):
+        """全部节点的当前字段和时间序列，用于页面初次加载和SSE连接落后时重新同步"""
+        with self.changed:
+            return {
+                'version': self.version,
+                'master_status': self.cluster_status['master_status'],
+                'time': self.cluster_status.get('time', time.time()),
+                'slaves': {key: dict(self._summary(key), points=list(self.series[key].points))
+                           for key in self.slaves if key in self.series}
+            }
+
+    def events(self):
+        """
+        SSE事件流：每次状态推送发送一个增量事件（只含变化节点的新采样点）。
+
+        连接落后一个以上版本（事件被合并）时发送完整快照，页面据此重新同步。
+        """
+        with self.changed:
+            version = self.version
         while self.running:
-            self.get_cluster_status()
-            time.sleep(5)
+            with self.changed:
+                self.changed.wait_for(lambda: self.version != version, timeout=SSE_KEEPALIVE)
+                if self.version == version:
+                    event = None
+                elif self.version == version + 1:
+                    event = ('update', self.latest)
+                else:
+                    event = ('full', None)
+                version = self.version
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            name, data = event
+            if name == 'full':
+                data = self.snapshot()
+                version = data['version']
+            yield f"event: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
 
 monitor = Monitor()
 
 @app.route('/')
 def show_status():
-    return render_template('monitor.html', status=monitor.cluster_status, time=time)
+    with monitor.changed:
+        status = monitor.cluster_status
+    return render_template('monitor.html', status=status, time=time, series_length=monitor.series_length)
+
+@app.route('/series')
+def show_series():
+    return jsonify(monitor.snapshot())
+
+@app.route('/events')
+def stream_events():
+    return Response(stream_with_context(monitor.events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache'})
 
 def start_monitor():
-    monitor.status_thread = threading.Thread(target=monitor.update_status_loop)
+    monitor.status_thread = threading.Thread(target=monitor.subscribe_loop)
     monitor.status_thread.daemon = True
     monitor.status_thread.start()
-    app.run(host='0.0.0.0', port=5005)
+    app.run(host='0.0.0.0', port=5005, threaded=True) # 每个SSE连接占用一个线程
 
 if __name__ == '__main__':
-    start_monitor() 
\ No newline at end of file
+    start_monitor()
@@ -0,0 +1,75 @@
+import numpy as np
+import cv2
+
+
+def make_rng(seed=None):
+    """
+    创建噪声使用的随机数生成器。
+
+    Args:
+        seed (int, optional): 随机种子，相同的种子产生相同的噪声结果；为None时使用系统熵
+
+    Returns:
+        numpy.random.Generator: 随机数生成器
+    """
+    return np.random.default_rng(seed)
+
+
+def add_gaussian_noise(img, rng, sigma=25.0):
+    """
+    原地叠加高斯噪声（饱和加法）。
+
+    与原实现保持一致：噪声先截断为整数再按uint8回绕，
+    因此负噪声会表现为较大的正值，再通过cv2.add饱和到255。
+
+    Args:
+        img (numpy.ndarray): uint8图像，会被原地修改
+        rng (numpy.random.Generator): 随机数生成器
+        sigma (float): 高斯噪声标准差
+    """
+    noise = rng.standard_normal(img.shape, dtype=np.float32)
+    noise *= sigma
+    noise = noise.astype(np.int16).astype(np.uint8) # 截断并回绕到uint8
+    cv2.add(img, noise, dst=img) # 饱和加法，结果直接写回img
+    return img
+
+
+def add_salt_pepper_noise(img, rng, prob=0.05):
+    """
+    原地添加椒盐噪声，一次性生成整幅图像的掩码。
+
+    每个像素(所有通道)以prob的概率置0，以prob的概率置255。
+
+    Args:
+        img (numpy.ndarray): uint8图像，会被原地修改
+        rng (numpy.random.Generator): 随机数生成器
+        prob (float): 椒、盐各自的概率
+    """
+    rdn = rng.random(img.shape[:2], dtype=np.float32)
+    img[rdn < prob] = 0
+    img[rdn > 1 - prob] = 255
+    return img
+
+
+def apply_noise(img, rng=None, layers=3, sigma=25.0, prob=0.05):
+    """
+    多层噪声处理：每一层先叠加高斯噪声，再添加椒盐噪声。
+
+    Args:
+        img (numpy.ndarray): uint8图像
+        rng (numpy.random.Generator, optional): 随机数生成器，为None时新建
+        layers (int): 噪声层数
+        sigma (float): 高斯噪声标准差
+        prob (float): 椒盐噪声概率
+
+    Returns:
+        numpy.ndarray: 添加噪声后的图像（可写且连续时与输入为同一数组）
+    """
+    if rng is None:
+        rng = make_rng()
+    if not img.flags.writeable or not img.flags.c_contiguous:
+        img = np.array(img, order='C') # 只读或非连续时复制一份
+    for _ in range(layers):
+        add_gaussian_noise(img, rng, sigma)
+        add_salt_pepper_noise(img, rng, prob)
+    return img
@@ -0,0 +1,119 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+
+def encode_params(ext, quality=95, png_compression=1):
+    """cv2.imencode的编码参数，默认值与cv2.imwrite相同"""
+    ext = ext.lower()
+    if ext in ('.jpg', '.jpeg'):
+        return [cv2.IMWRITE_JPEG_QUALITY, quality]
+    if ext == '.webp':
+        return [cv2.IMWRITE_WEBP_QUALITY, quality]
+    if ext == '.png':
+        return [cv2.IMWRITE_PNG_COMPRESSION, png_compression]
+    return []
+
+
+def encode_image(img, ext, quality=95, png_compression=1):
+    """将图像编码为指定格式的字节"""
+    ok, encoded = cv2.imencode(ext, img, encode_params(ext, quality, png_compression))
+    if not ok:
+        raise Exception(f"无法编码图片: {ext}")
+    return encoded.tobytes()
+
+
+def write_atomic(path, data):
+    """先写临时文件再改名，读取方不会看到写了一半的文件"""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class OutputWriter:
+    """
+    输出图片的后台写入线程池（编码 + 写文件）。
+
+    处理线程把结果交给写入线程后即可继续处理下一个任务；
+    排队中的写入数达到max_queue时submit阻塞，磁盘变慢时形成反压，
+    而不是让待写入的图像在内存中无限堆积。
+
+    cv2.imencode和文件写入都会释放GIL，写入线程与处理线程可以并行。
+    """
+
+    def __init__(self, threads=2, max_queue=8, quality=95, png_compression=1):
+        self.max_queue = max_queue
+        self.quality = quality
+        self.png_compression = png_compression
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='output-writer')
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._lock = threading.Lock()
+        self.pending = 0 # 已提交但未写完的数量
+        self.written = 0
+        self.failed = 0
+        self.blocked_time = 0.0 # submit因队列已满而等待的累计时间（秒）
+
+    def encode(self, img, ext):
+        return encode_image(img, ext, self.quality, self.png_compression)
+
+    def submit(self, output_path, img=None, data=None):
+        """
+        提交一个写入任务，队列已满时阻塞等待。
+
+        Args:
+            output_path (str): 输出路径，扩展名决定编码格式
+            img (numpy.ndarray): 待编码的图像，data为None时使用
+            data (bytes): 已编码的数据
+
+        Returns:
+            concurrent.futures.Future: 写入完成时结果为编码后的数据
+        """
+        wait_start = time.time()
+        self._slots.acquire()
+        waited = time.time() - wait_start
+        with self._lock:
+            self.pending += 1
+            self.blocked_time += waited
+        try:
+            return self._executor.submit(self._write, output_path, img, data)
+        except Exception:
+            self._done(False)
+            raise
+
+    def _write(self, output_path, img, data):
+        ok = False
+        try:
+            if data is None:
+                data = self.encode(img, os.path.splitext(output_path)[1])
+            write_atomic(output_path, data)
+            ok = True
+            return data
+        except Exception as e:
+            logging.error(f"写入输出图片失败 {output_path}: {e}")
+            raise
+        finally:
+            self._done(ok)
+
+    def _done(self, ok):
+        with self._lock:
+            self.pending -= 1
+            if ok:
+                self.written += 1
+            else:
+                self.failed += 1
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queue_depth': self.pending,
+                'max_queue': self.max_queue,
+                'written': self.written,
+                'failed': self.failed,
+                'blocked_time': self.blocked_time
+            }
@@ -0,0 +1,366 @@
+"""
+运行中从节点的按需剖析：采样式CPU剖析和tracemalloc内存快照。
+
+剖析只在有界的时间窗口内进行，由profile_start/profile_stop消息控制（见protocol.py）:
+- CPU: 后台线程每隔interval秒通过sys._current_frames()采集全部线程的调用栈（墙钟采样，
+  阻塞等待中的线程也会被采到），输出折叠栈格式，每行 "栈帧;栈帧;... 次数"，
+  可直接用 flamegraph.pl 或 https://www.speedscope.app 查看
+- 内存: 窗口开始时启动tracemalloc，结束时取快照，输出分配内存最多的代码行
+
+从节点的图片处理在工作进程中执行，剖析请求通过ProfileChannel广播到每个工作进程，
+各进程的结果合并后返回。未剖析时不运行采样线程、不启动tracemalloc，
+工作进程中只有一个阻塞在共享条件变量上的等待线程，对任务处理没有额外开销。
+
+用法（直接连接从节点，或经主节点转发给指定从节点）:
+    python profiler.py localhost 5009 --duration 10 --memory -o slave_5009.folded
+    python profiler.py localhost 5008 --slave 127.0.0.1:5009 --duration 10
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+MAX_DURATION = 300.0 # 剖析窗口的最长时间（秒）
+MIN_INTERVAL = 0.001 # 最小采样间隔（秒）
+COLLECT_GRACE = 5.0 # 停止后等待工作进程返回结果的最长时间（秒）
+THREAD_PREFIX = 'profile-' # 剖析自身的线程，采样时跳过
+
+
+class ProfileError(Exception):
+    """剖析请求无效，或没有可返回的剖析结果"""
+
+
+def profile_settings(data):
+    """
+    从profile_start消息中取剖析设置，超出范围的值截断到允许范围。
+
+    Returns:
+        dict: duration、interval、cpu、memory、top
+    """
+    settings = {
+        'duration': min(max(float(data.get('duration', 10.0)), 0.0), MAX_DURATION),
+        'interval': max(float(data.get('interval', 0.01)), MIN_INTERVAL),
+        'cpu': bool(data.get('cpu', True)),
+        'memory': bool(data.get('memory', False)),
+        'top': max(int(data.get('top', 20)), 1)
+    }
+    if not settings['cpu'] and not settings['memory']:
+        raise ProfileError("cpu和memory至少启用一项")
+    return settings
+
+
+def collapsed(stacks):
+    """将 {折叠栈: 次数} 格式化为折叠栈文本，按次数从多到少排列"""
+    return '\n'.join(f"{stack} {count}" for stack, count in
+                     sorted(stacks.items(), key=lambda item: item[1], reverse=True))
+
+
+class ProfileWindow:
+    """
+    当前进程的一个剖析窗口。
+
+    start()后由一个后台线程采样，到达duration或调用stop()时结束，
+    结束时取内存快照并停止tracemalloc（窗口开始前已在跟踪时保持跟踪）。
+
+    Args:
+        duration (float): 窗口时长（秒）
+        cpu (bool): 是否采样调用栈
+        memory (bool): 是否记录内存分配
+        interval (float): 采样间隔（秒）
+        top (int): 返回分配内存最多的代码行数
+        process_name (str): 折叠栈的根帧，用于区分合并后的各进程
+    """
+
+    def __init__(self, duration, cpu=True, memory=False, interval=0.01, top=20, process_name=''):
+        self.duration = duration
+        self.cpu = cpu
+        self.memory = memory
+        self.interval = interval
+        self.top = top
+        self.process_name = process_name or f'pid-{os.getpid()}'
+        self.result = None
+        self._stacks = Counter()
+        self._samples = 0
+        self._labels = {} # 代码对象 -> 栈帧名称
+        self._threads = {} # 线程ID -> 线程名称，出现新线程时刷新
+        self._stop = threading.Event()
+        self._done = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, name=f'{THREAD_PREFIX}window', daemon=True).start()
+        return self
+
+    def stop(self, timeout=None):
+        """结束窗口并返回结果，窗口已结束时直接返回结果"""
+        self._stop.set()
+        self._done.wait(timeout)
+        return self.result
+
+    def _run(self):
+        start = time.time()
+        deadline = time.perf_counter() + self.duration
+        traced_before = tracemalloc.is_tracing()
+        if self.memory and not traced_before:
+            tracemalloc.start()
+        try:
+            if self.cpu:
+                # 用sleep而不是Event.wait，采样循环本身不分配内存，不影响内存统计
+                while not self._stop.is_set() and time.perf_counter() < deadline:
+                    time.sleep(self.interval)
+                    self._sample()
+            else:
+                self._stop.wait(self.duration)
+            self.result = {
+                'process': self.process_name,
+                'start': start,
+                'duration': time.time() - start,
+                'cpu': {'samples': self._samples, 'stacks': dict(self._stacks)} if self.cpu else None,
+                'memory': self._memory_top() if self.memory else None
+            }
+        finally:
+            if self.memory and not traced_before:
+                tracemalloc.stop()
+            self._done.set()
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)})"
+        return label
+
+    def _sample(self):
+        """采集一次全部线程的调用栈（跳过剖析自身的线程）"""
+        frames = sys._current_frames()
+        if not frames.keys() <= self._threads.keys():
+            self._threads = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in frames.items():
+            name = self._threads.get(ident, str(ident))
+            if name.startswith(THREAD_PREFIX):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.extend((name, self.process_name)) # 根帧：进程、线程
+            self._stacks[';'.join(reversed(stack))] += 1
+        self._samples += 1
+
+    def _memory_top(self):
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+        top = [{
+            'location': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            'size': stat.size,
+            'count': stat.count
+        } for stat in snapshot.statistics('lineno')[:self.top]]
+        return {'process': self.process_name, 'current': current, 'peak': peak, 'top': top}
+
+
+class ProfileChannel:
+    """
+    主进程向工作进程广播剖析请求并收集结果。
+
+    在创建进程池之前创建，作为初始化参数传给每个工作进程（必须与进程池使用同一种启动方式）；
+    工作进程调用listen()启动等待线程。每次请求有一个递增的编号，
+    工作进程只响应启动之后发出的请求，过期的结果在收集时丢弃。
+    """
+
+    SETTINGS = ('duration', 'interval', 'cpu', 'memory', 'top')
+
+    def __init__(self, context=None):
+        context = context or multiprocessing.get_context('spawn')
+        self._cond = context.Condition()
+        self._generation = context.Value('i', 0, lock=False) # 以下共享值均由_cond保护
+        self._stopped = context.Value('i', 0, lock=False)
+        self._accepted = context.Value('i', 0, lock=False) # 接受了当前请求的工作进程数
+        self._settings = context.Array('d', len(self.SETTINGS), lock=False)
+        self._results = context.Queue()
+
+    def listen(self):
+        """在工作进程中启动等待线程"""
+        threading.Thread(target=self._listen, name=f'{THREAD_PREFIX}listener', daemon=True).start()
+
+    def _listen(self):
+        seen = self._generation.value
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._generation.value != seen)
+                seen = self._generation.value
+                settings = dict(zip(self.SETTINGS, self._settings[:]))
+                self._accepted.value += 1
+            window = ProfileWindow(settings['duration'], bool(settings['cpu']), bool(settings['memory']),
+                                   settings['interval'], int(settings['top']), f'worker-{os.getpid()}').start()
+            with self._cond:
+                self._cond.wait_for(lambda: self._stopped.value == seen, timeout=settings['duration'])
+            self._results.put((seen, window.stop()))
+
+    def start(self, settings):
+        """广播剖析请求，返回请求编号"""
+        with self._cond:
+            self._settings[:] = [float(settings[name]) for name in self.SETTINGS]
+            self._accepted.value = 0
+            self._generation.value += 1
+            self._cond.notify_all()
+            return self._generation.value
+
+    def stop(self, generation):
+        """
+        提前结束请求generation的窗口并收集各工作进程的结果。
+
+        Returns:
+            list: 各工作进程的剖析结果
+        """
+        with self._cond:
+            self._stopped.value = generation
+            self._cond.notify_all()
+            expected = self._accepted.value
+        results = []
+        deadline = time.monotonic() + COLLECT_GRACE
+        while len(results) < expected:
+            try:
+                result_generation, result = self._results.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if result_generation == generation and result is not None:
+                results.append(result)
+        return results
+
+
+class Profiler:
+    """
+    从节点的剖析控制：同一时间只有一个剖析窗口，覆盖主进程和全部工作进程。
+
+    Args:
+        channel (ProfileChannel): 工作进程的剖析通道，为None时只剖析主进程
+        process_name (str): 主进程在折叠栈中的根帧
+    """
+
+    def __init__(self, channel=None, process_name='main'):
+        self.channel = channel
+        self.process_name = process_name
+        self._lock = threading.Lock()
+        self._window = None
+        self._generation = 0
+        self._settings = None
+        self._deadline = 0.0
+        self._result = None # 最近一次已结束窗口的结果
+
+    def start(self, data):
+        """
+        开始剖析窗口。
+
+        Raises:
+            ProfileError: 设置无效，或已有剖析窗口在进行中
+        """
+        settings = profile_settings(data)
+        with self._lock:
+            if self._window is not None and time.monotonic() < self._deadline:
+                raise ProfileError("已有剖析窗口在进行中")
+            self._settings = settings
+            self._deadline = time.monotonic() + settings['duration']
+            self._window = ProfileWindow(process_name=self.process_name, **settings).start()
+            if self.channel is not None:
+                self._generation = self.channel.start(settings)
+            self._result = None
+        return {'status': 'ok', **settings}
+
+    def stop(self):
+        """
+        结束剖析窗口（已到时间的窗口直接收集）并返回合并后的结果。
+        没有进行中的窗口时返回上一次的结果。
+
+        Raises:
+            ProfileError: 从未开始过剖析
+        """
+        with self._lock:
+            if self._window is None:
+                if self._result is None:
+                    raise ProfileError("没有进行中的剖析")
+                return self._result
+            results = [self._window.stop()]
+            if self.channel is not None:
+                results.extend(self.channel.stop(self._generation))
+            self._window = None
+            self._result = self._merge(results)
+            return self._result
+
+    def _merge(self, results):
+        """合并各进程的结果：折叠栈相加（根帧区分进程），内存按进程列出"""
+        settings = self._settings
+        response = {
+            'status': 'ok',
+            'processes': len(results),
+            'duration': max(result['duration'] for result in results),
+            'cpu': None,
+            'memory': None
+        }
+        if settings['cpu']:
+            stacks = Counter()
+            for result in results:
+                stacks.update(result['cpu']['stacks'])
+            response['cpu'] = {
+                'interval': settings['interval'],
+                'samples': sum(result['cpu']['samples'] for result in results),
+                'collapsed': collapsed(stacks)
+            }
+        if settings['memory']:
+            response['memory'] = [result['memory'] for result in results]
+        return response
+
+
+def _format_size(size):
+    for unit in ('B', 'KB', 'MB'):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+if __name__ == '__main__':
+    from protocol import connect
+
+    parser = argparse.ArgumentParser(description='剖析运行中的从节点')
+    parser.add_argument('host', help='从节点地址，使用--slave时为主节点地址')
+    parser.add_argument('port', type=int)
+    parser.add_argument('--slave', metavar='HOST:PORT', default=None, help='经主节点转发给该从节点')
+    parser.add_argument('--duration', type=float, default=10.0, help=f'剖析窗口时长（秒，最长{MAX_DURATION:.0f}）')
+    parser.add_argument('--interval', type=float, default=0.01, help='调用栈采样间隔（秒）')
+    parser.add_argument('--no-cpu', action='store_true', help='不采样调用栈')
+    parser.add_argument('--memory', action='store_true', help='记录内存分配（tracemalloc）')
+    parser.add_argument('--top', type=int, default=20, help='列出分配内存最多的代码行数')
+    parser.add_argument('-o', '--output', default='profile.folded', help='折叠栈输出文件')
+    args = parser.parse_args()
+
+    conn = connect((args.host, args.port), timeout=30)
+    target = {'slave': args.slave} if args.slave else {}
+    response = conn.request({'type': 'profile_start', 'duration': args.duration, 'interval': args.interval,
+                             'cpu': not args.no_cpu, 'memory': args.memory, 'top': args.top, **target})
+    if response.get('status') != 'ok':
+        sys.exit(f"开始剖析失败: {response.get('message')}")
+    print(f"剖析中，{response['duration']:.0f} 秒后结束（Ctrl+C 提前结束）...")
+    try:
+        time.sleep(response['duration'])
+    except KeyboardInterrupt:
+        pass
+    response = conn.request({'type': 'profile_stop', **target})
+    conn.close()
+    if response.get('status') != 'ok':
+        sys.exit(f"结束剖析失败: {response.get('message')}")
+
+    print(f"剖析了 {response['processes']} 个进程，{response['duration']:.1f} 秒")
+    if response['cpu']:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(response['cpu']['collapsed'] + '\n')
+        print(f"{response['cpu']['samples']} 次采样，折叠栈已写入 {args.output}")
+    for memory in response['memory'] or []:
+        print(f"\n{memory['process']}: 当前 {_format_size(memory['current'])}, 峰值 {_format_size(memory['peak'])}")
+        for stat in memory['top']:
+            print(f"  {_format_size(stat['size']):>10}  {stat['count']:>7}  {stat['location']}")
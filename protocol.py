@@ -0,0 +1,429 @@
+"""
+节点间通信协议：带长度前缀的二进制帧。
+
+帧格式:
+    | 长度 (4字节) | 消息类型 (1字节) | 请求ID (4字节) | 消息体 (长度字节) |
+
+消息体使用紧凑的二进制编码（带类型标记），支持 None、bool、int、float、
+str、bytes、list/tuple 和 dict。消息中的'type'字段编码在帧头中，
+没有'type'字段的消息视为响应('response')。
+
+同一连接上可以连续收发多条消息，请求ID用于匹配请求与响应。
+"""
+import asyncio
+import socket
+import struct
+
+# 消息类型编号，顺序即编号，只能在末尾追加
+MESSAGE_TYPES = (
+    'response',
+    'register',
+    'task',
+    'heartbeat',
+    'health_check',
+    'status_request',
+    'ping',
+    'batch',
+    'batch_result',
+    'batch_summary',
+    'subscribe',
+    'state_update',
+    'profile_start',
+    'profile_stop',
+)
+_TYPE_CODES = {name: code for code, name in enumerate(MESSAGE_TYPES)}
+
+HEADER = struct.Struct('>IBI') # 长度、消息类型、请求ID
+MAX_FRAME_SIZE = 64 * 1024 * 1024 # 单帧最大64MB
+RECV_SIZE = 65536
+
+_U8 = struct.Struct('>B')
+_U32 = struct.Struct('>I')
+_I8 = struct.Struct('>b')
+_I64 = struct.Struct('>q')
+_F64 = struct.Struct('>d')
+
+# 类型标记
+_NONE = ord('N')
+_TRUE = ord('T')
+_FALSE = ord('F')
+_INT8 = ord('c')
+_INT64 = ord('i')
+_FLOAT = ord('d')
+_STR8 = ord('S')
+_STR = ord('s')
+_BYTES = ord('b')
+_LIST = ord('l')
+_DICT = ord('m')
+
+
+class ProtocolError(Exception):
+    """协议错误：帧格式不合法或包含无法编码的数据"""
+
+
+def _encode(value, out):
+    if value is None:
+        out.append(_NONE)
+    elif value is True:
+        out.append(_TRUE)
+    elif value is False:
+        out.append(_FALSE)
+    elif isinstance(value, int):
+        if -128 <= value <= 127:
+            out.append(_INT8)
+            out += _I8.pack(value)
+        elif -2**63 <= value < 2**63:
+            out.append(_INT64)
+            out += _I64.pack(value)
+        else:
+            raise ProtocolError(f"整数超出范围: {value}")
+    elif isinstance(value, float):
+        out.append(_FLOAT)
+        out += _F64.pack(value)
+    elif isinstance(value, str):
+        data = value.encode('utf-8')
+        if len(data) < 256:
+            out.append(_STR8)
+            out += _U8.pack(len(data))
+        else:
+            out.append(_STR)
+            out += _U32.pack(len(data))
+        out += data
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        out.append(_BYTES)
+        out += _U32.pack(len(value))
+        out += value
+    elif isinstance(value, (list, tuple)):
+        out.append(_LIST)
+        out += _U32.pack(len(value))
+        for item in value:
+            _encode(item, out)
+    elif isinstance(value, dict):
+        out.append(_DICT)
+        out += _U32.pack(len(value))
+        for key, item in value.items():
+            _encode(key, out)
+            _encode(item, out)
+    else:
+        raise ProtocolError(f"无法编码的类型: {type(value).__name__}")
+
+
+def _decode(buf, pos):
+    tag = buf[pos]
+    pos += 1
+    if tag == _NONE:
+        return None, pos
+    if tag == _TRUE:
+        return True, pos
+    if tag == _FALSE:
+        return False, pos
+    if tag == _INT8:
+        return _I8.unpack_from(buf, pos)[0], pos + 1
+    if tag == _INT64:
+        return _I64.unpack_from(buf, pos)[0], pos + 8
+    if tag == _FLOAT:
+        return _F64.unpack_from(buf, pos)[0], pos + 8
+    if tag == _STR8 or tag == _STR:
+        if tag == _STR8:
+            size = buf[pos]
+            pos += 1
+        else:
+            size = _U32.unpack_from(buf, pos)[0]
+            pos += 4
+        return str(buf[pos:pos + size], 'utf-8'), pos + size
+    if tag == _BYTES:
+        size = _U32.unpack_from(buf, pos)[0]
+        pos += 4
+        return bytes(buf[pos:pos + size]), pos + size
+    if tag == _LIST:
+        count = _U32.unpack_from(buf, pos)[0]
+        pos += 4
+        items = []
+        for _ in range(count):
+            item, pos = _decode(buf, pos)
+            items.append(item)
+        return items, pos
+    if tag == _DICT:
+        count = _U32.unpack_from(buf, pos)[0]
+        pos += 4
+        result = {}
+        for _ in range(count):
+            key, pos = _decode(buf, pos)
+            result[key], pos = _decode(buf, pos)
+        return result, pos
+    raise ProtocolError(f"未知的类型标记: {tag}")
+
+
+def encode_message(message, request_id=0):
+    """
+    将消息编码为完整的帧。
+
+    Args:
+        message (dict): 消息字典，'type'字段写入帧头
+        request_id (int): 请求ID
+
+    Returns:
+        bytearray: 帧数据
+    """
+    msg_type = message.get('type', 'response')
+    if msg_type not in _TYPE_CODES:
+        raise ProtocolError(f"未知的消息类型: {msg_type}")
+    body = {k: v for k, v in message.items() if k != 'type'}
+    out = bytearray(HEADER.size)
+    _encode(body, out)
+    length = len(out) - HEADER.size
+    if length > MAX_FRAME_SIZE:
+        raise ProtocolError(f"消息过大: {length} 字节")
+    HEADER.pack_into(out, 0, length, _TYPE_CODES[msg_type], request_id)
+    return out
+
+
+def decode_message(type_code, body):
+    """
+    解码消息体，并将帧头中的消息类型还原为'type'字段。
+
+    Args:
+        type_code (int): 帧头中的消息类型编号
+        body (bytes): 消息体
+
+    Returns:
+        dict: 消息字典
+    """
+    if type_code >= len(MESSAGE_TYPES):
+        raise ProtocolError(f"未知的消息类型编号: {type_code}")
+    message, pos = _decode(memoryview(body), 0)
+    if pos != len(body) or not isinstance(message, dict):
+        raise ProtocolError("消息体格式错误")
+    if type_code != _TYPE_CODES['response']:
+        message['type'] = MESSAGE_TYPES[type_code]
+    return message
+
+
+class Connection:
+    """
+    基于socket的消息连接，负责分帧收发。
+
+    接收时处理半包（一条消息分多次到达）和粘包（一次读到多条消息），
+    同一连接可以连续收发多条消息。
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self._buffer = bytearray()
+        self._next_request_id = 1
+        self.bytes_sent = 0 # 已发送和已接收的帧字节数（含帧头），用于流量指标
+        self.bytes_received = 0
+
+    def send(self, message, request_id=0):
+        """发送一条消息"""
+        frame = encode_message(message, request_id)
+        self.sock.sendall(frame)
+        self.bytes_sent += len(frame)
+
+    def recv(self):
+        """
+        接收一条消息。
+
+        Returns:
+            tuple: (请求ID, 消息字典)，对端关闭连接时返回None
+        """
+        if not self._fill(HEADER.size):
+            if self._buffer:
+                raise ProtocolError("连接在消息中途关闭")
+            return None
+        length, type_code, request_id = HEADER.unpack_from(self._buffer, 0)
+        if length > MAX_FRAME_SIZE:
+            raise ProtocolError(f"消息过大: {length} 字节")
+        end = HEADER.size + length
+        if not self._fill(end):
+            raise ProtocolError("连接在消息中途关闭")
+        body = bytes(self._buffer[HEADER.size:end])
+        del self._buffer[:end]
+        self.bytes_received += end
+        return request_id, decode_message(type_code, body)
+
+    def request(self, message):
+        """
+        发送请求并等待对应的响应。
+
+        Args:
+            message (dict): 请求消息
+
+        Returns:
+            dict: 响应消息
+        """
+        request_id = self._next_request_id
+        self._next_request_id = (self._next_request_id + 1) & 0xFFFFFFFF or 1
+        self.send(message, request_id)
+        while True:
+            received = self.recv()
+            if received is None:
+                raise ConnectionError("连接已被对端关闭")
+            response_id, response = received
+            if response_id == request_id:
+                return response
+
+    def stream(self, message, end_type='batch_summary'):
+        """
+        发送请求并逐条返回对应的响应，用于一个请求有多个响应帧的情况（如批量任务）。
+
+        Args:
+            message (dict): 请求消息
+            end_type (str): 结束帧的消息类型，收到后停止
+
+        Yields:
+            dict: 响应消息，最后一条为结束帧
+        """
+        request_id = self._next_request_id
+        self._next_request_id = (self._next_request_id + 1) & 0xFFFFFFFF or 1
+        self.send(message, request_id)
+        while True:
+            received = self.recv()
+            if received is None:
+                raise ConnectionError("连接已被对端关闭")
+            response_id, response = received
+            if response_id != request_id:
+                continue
+            yield response
+            if response.get('type') == end_type:
+                return
+
+    def _fill(self, size):
+        """读取数据直到缓冲区至少有size字节，对端关闭时返回False"""
+        while len(self._buffer) < size:
+            chunk = self.sock.recv(max(RECV_SIZE, size - len(self._buffer)))
+            if not chunk:
+                return False
+            self._buffer += chunk
+        return True
+
+    def close(self):
+        try:
+            self.sock.close()
+        except Exception:
+            pass
+
+
+def connect(address, timeout=None):
+    """
+    建立到指定地址的消息连接。
+
+    Args:
+        address (tuple): (ip, port)
+        timeout (float, optional): 连接及收发超时时间（秒）
+
+    Returns:
+        Connection: 消息连接
+    """
+    sock = socket.create_connection(address, timeout=timeout)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1) # 小消息不等待合并，降低延迟
+    return Connection(sock)
+
+
+async def read_message(reader):
+    """
+    从asyncio流中读取一条消息。
+
+    Args:
+        reader (asyncio.StreamReader): 输入流
+
+    Returns:
+        tuple: (请求ID, 消息字典)，对端关闭连接时返回None
+    """
+    frame = await read_frame(reader)
+    if frame is None:
+        return None
+    request_id, type_code, body = frame
+    return request_id, decode_message(type_code, body)
+
+
+async def read_frame(reader):
+    """
+    从asyncio流中读取一帧，不解码消息体。
+
+    Returns:
+        tuple: (请求ID, 消息类型编号, 消息体)，对端关闭连接时返回None
+    """
+    try:
+        header = await reader.readexactly(HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise ProtocolError("连接在消息中途关闭")
+        return None
+    length, type_code, request_id = HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise ProtocolError(f"消息过大: {length} 字节")
+    try:
+        body = await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        raise ProtocolError("连接在消息中途关闭")
+    return request_id, type_code, body
+
+
+class StreamConnection:
+    """
+    asyncio流的消息连接，发送接口与Connection一致。
+
+    send只把帧写入发送缓冲区而不等待，可在事件循环中被同步的处理函数直接调用。
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self._next_request_id = 1
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def send(self, message, request_id=0):
+        """发送一条消息"""
+        frame = encode_message(message, request_id)
+        self.writer.write(frame)
+        self.bytes_sent += len(frame)
+
+    async def recv(self):
+        """接收一条消息，对端关闭连接时返回None"""
+        frame = await read_frame(self.reader)
+        if frame is None:
+            return None
+        request_id, type_code, body = frame
+        self.bytes_received += HEADER.size + len(body)
+        return request_id, decode_message(type_code, body)
+
+    async def request(self, message):
+        """发送请求并等待对应的响应"""
+        request_id = self._next_request_id
+        self._next_request_id = (self._next_request_id + 1) & 0xFFFFFFFF or 1
+        self.send(message, request_id)
+        await self.writer.drain()
+        while True:
+            received = await self.recv()
+            if received is None:
+                raise ConnectionError("连接已被对端关闭")
+            response_id, response = received
+            if response_id == request_id:
+                return response
+
+    def close(self):
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+
+async def open_connection(address, timeout=None):
+    """
+    建立到指定地址的asyncio消息连接。
+
+    Args:
+        address (tuple): (ip, port)
+        timeout (float, optional): 连接超时时间（秒）
+
+    Returns:
+        StreamConnection: 消息连接
+    """
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(address[0], address[1]), timeout)
+    sock = writer.get_extra_info('socket')
+    if sock is not None:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return StreamConnection(reader, writer)
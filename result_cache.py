@@ -0,0 +1,194 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+
+def result_key(content_hash, operation, params):
+    """
+    计算处理结果的缓存键。
+
+    Args:
+        content_hash (str): 输入图片内容的哈希
+        operation (str): 处理操作
+        params (dict): 影响结果的全部参数（操作参数、随机种子、输出格式等）
+
+    Returns:
+        str: 十六进制的SHA-256
+    """
+    payload = json.dumps([content_hash, operation, params], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def seed_from_key(key):
+    """由缓存键导出随机种子，相同输入和参数的任务使用相同的随机数，结果可以复用"""
+    return int(key[:16], 16)
+
+
+class ContentHasher:
+    """
+    文件内容哈希，按 (路径, 修改时间, 大小) 记忆结果。
+
+    同一文件反复提交时只在首次（或文件被修改后）读取文件内容。
+    """
+
+    def __init__(self):
+        self._digests = {} # 路径 -> ((修改时间, 大小), 哈希)
+        self._lock = threading.Lock()
+
+    def digest(self, path):
+        st = os.stat(path)
+        version = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._digests.get(path)
+        if cached and cached[0] == version:
+            return cached[1]
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with self._lock:
+            self._digests[path] = (version, digest)
+        return digest
+
+
+class ResultCache:
+    """
+    内容寻址的处理结果缓存，分内存和磁盘两级。
+
+    - 内存层：LRU，总字节数不超过memory_bytes
+    - 磁盘层：每个结果一个文件（文件名为缓存键），总字节数超过disk_bytes时按最近访问顺序淘汰；
+      启动时扫描缓存目录恢复索引，重启后仍可命中
+
+    写入时同时写入两层，磁盘命中的结果会提升到内存层。
+    任一层的容量为0时禁用该层。
+    """
+
+    def __init__(self, memory_bytes=256 * 1024 * 1024, disk_dir=None, disk_bytes=1024 * 1024 * 1024):
+        self.memory_limit = memory_bytes
+        self.disk_limit = disk_bytes if disk_dir else 0
+        self.disk_dir = disk_dir
+        self._memory = OrderedDict() # 键 -> 结果数据，按访问顺序排列
+        self._memory_bytes = 0
+        self._disk = OrderedDict() # 键 -> 文件大小，按访问顺序排列
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.memory_evictions = 0
+        self.disk_evictions = 0
+        if self.disk_limit:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._load_disk_index()
+
+    def _load_disk_index(self):
+        """按修改时间恢复磁盘层的访问顺序"""
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            path = os.path.join(self.disk_dir, name)
+            if name.endswith('.tmp'):
+                os.remove(path) # 上次写入未完成的临时文件
+                continue
+            st = os.stat(path)
+            entries.append((st.st_mtime, name, st.st_size))
+        for _, name, size in sorted(entries):
+            self._disk[name] = size
+            self._disk_bytes += size
+        self._evict_disk()
+
+    def get(self, key):
+        """
+        查找缓存的结果。
+
+        Returns:
+            bytes: 结果数据，未命中时返回None
+        """
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return data
+            on_disk = key in self._disk
+            if on_disk:
+                self._disk.move_to_end(key)
+
+        if on_disk:
+            path = os.path.join(self.disk_dir, key)
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                os.utime(path) # 记录访问时间，重启后按此恢复顺序
+            except OSError:
+                data = None # 文件已被淘汰或删除
+            if data is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._put_memory(key, data)
+                return data
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, data):
+        """缓存一个结果"""
+        with self._lock:
+            self._put_memory(key, data)
+        if not self.disk_limit or len(data) > self.disk_limit:
+            return
+        path = os.path.join(self.disk_dir, key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path) # 原子替换，读取方不会看到写了一半的文件
+        except OSError as e:
+            logging.error(f"写入结果缓存失败: {e}")
+            return
+        with self._lock:
+            self._disk_bytes += len(data) - self._disk.pop(key, 0)
+            self._disk[key] = len(data)
+            self._evict_disk()
+
+    def _put_memory(self, key, data):
+        if len(data) > self.memory_limit:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.memory_limit:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self.memory_evictions += 1
+
+    def _evict_disk(self):
+        while self._disk_bytes > self.disk_limit:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self.disk_evictions += 1
+            try:
+                os.remove(os.path.join(self.disk_dir, key))
+            except OSError:
+                pass
+
+    def stats(self):
+        """命中、未命中、淘汰次数及各层占用"""
+        with self._lock:
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'memory_evictions': self.memory_evictions,
+                'disk_evictions': self.disk_evictions,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'disk_entries': len(self._disk),
+                'disk_bytes': self._disk_bytes
+            }
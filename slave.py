@@ -1,29 +1,76 @@
 import socket
-import json
 import threading
 import time
 import logging
-import cv2
-import numpy as np
 import os
-import random
 import signal
+import sys
+from image_tasks import DURABILITY, OPERATION_PARAMS, init_worker, output_path_for, process_image
+from metrics import SlaveMetrics, serve, task_labels
+from output_writer import write_atomic
+from profiler import ProfileChannel, ProfileError, Profiler
+from protocol import Connection, connect
+from tracing import Tracer
+from structured_log import LEVELS, StructuredLog, parse_sample_rates
+from result_cache import ContentHasher, ResultCache, result_key, seed_from_key
+from worker_pool import QueueFull, WorkerPool
 
 logging.basicConfig(filename='slave.log', level=logging.INFO)
 
 class Slave:
-    def __init__(self, master_host, master_port, slave_port):
+    def __init__(self, master_host, master_port, slave_port, workers=None, max_pending=None,
+                 cache_memory=256 * 1024 * 1024, cache_disk=1024 * 1024 * 1024, cache_dir=None,
+                 image_cache=512 * 1024 * 1024, output_format=None, quality=95, png_compression=1,
+                 writer_threads=2, writer_queue=8, durability='written', log_level='info',
+                 log_sample=None, metrics_port=0, trace_path=None, trace_sample=0.0):
         self.master_address = (master_host, master_port)
         self.port = slave_port
         self.tasks_completed = 0
         self.total_execution_time = 0
         self.algorithm_stats = {}  # 每次启动时重新开始统计
+        self.stats_lock = threading.Lock()  # 多个连接线程同时更新统计信息
         self.running = True
+        self.master_conn = None  # 与主节点的持久连接，用于注册和心跳
+        
+        # 任务执行引擎：固定数量的工作进程和有界等待队列
+        # 解码图像缓存在每个工作进程中各有一份，总容量平均分配给各工作进程
+        # 每个工作进程还有自己的输出写入线程池，编码和写文件不占用处理时间
+        # 剖析通道随初始化参数传给工作进程，profile_start/profile_stop消息同时剖析主进程和全部工作进程
+        workers = workers or os.cpu_count() or 1
+        profile_channel = ProfileChannel()
+        self.worker_pool = WorkerPool(workers, max_pending, initializer=init_worker,
+                                      initargs=(image_cache // workers, output_format, quality,
+                                                png_compression, writer_threads, writer_queue, profile_channel))
+        self.profiler = Profiler(profile_channel, f'slave-{self.port}')
+        self.worker_stats = {} # 工作进程ID -> 该进程最近一次上报的缓存和写入队列统计
+        
+        # 输出设置：格式为None时与输入图片相同；durability为任务未指定时的默认值
+        if durability not in DURABILITY:
+            raise ValueError(f"未知的durability: {durability}")
+        self.output_format = output_format
+        self.output_options = {'quality': quality, 'png_compression': png_compression}
+        self.durability = durability
+        
+        # 指标：按操作和算法分类的计数器和各阶段耗时直方图，metrics_port为0时不提供HTTP服务
+        self.metrics = SlaveMetrics()
+        self.metrics_port = metrics_port
+        
+        # 追踪：记录带追踪ID的任务在从节点的各阶段
+        self.tracer = Tracer(trace_path, f'slave:{self.port}', trace_sample)
+        
+        # 任务日志：后台线程批量写入 slave_<端口>.jsonl，每行一条JSON记录
+        self.task_log = StructuredLog(f'slave_{self.port}.jsonl', log_level, log_sample)
         
         # 创建输出目录
         self.output_dir = f'output_slave_{self.port}'
         os.makedirs(self.output_dir, exist_ok=True)
         
+        # 处理结果缓存：按输入内容、操作和参数寻址，容量均为0时不启用
+        self.result_cache = None
+        if cache_memory or cache_disk:
+            self.result_cache = ResultCache(cache_memory, cache_dir or f'cache_slave_{self.port}', cache_disk)
+        self.content_hasher = ContentHasher()
+        
         # 创建socket并添加重用选项
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1) # 设置socket重用选项
@@ -34,104 +81,17 @@ class Slave:
         signal.signal(signal.SIGINT, self._signal_handler) # 捕获Ctrl+C信号
         signal.signal(signal.SIGTERM, self._signal_handler) # 捕获终止信号
     
-    def process_image(self, image_path, operation):
-        try:
-            # 1. 开始加载图片
-            load_start = time.time()
-            print(f"开始加载图片: {image_path}")
-            img = cv2.imread(image_path)
-            # 增加图片尺寸以增加处理时间
-            img = cv2.resize(img, (img.shape[1]*2, img.shape[0]*2))
-            load_time = time.time() - load_start
-            print(f"图片加载耗时: {load_time:.2f}秒")
-            
-            if img is None:
-                raise Exception(f"无法读取图片: {image_path}")
-            
-            # 2. 开始处理图片
-            process_start = time.time()
-            print(f"开始处理图片, 操作: {operation}")
-            
-            filename = os.path.basename(image_path)
-            base, ext = os.path.splitext(filename)
-            
-            if operation == 'crop':
-                # 增加裁剪前的处理
-                for _ in range(3):  # 多次处理以增加时间
-                    img = cv2.GaussianBlur(img, (5, 5), 0)
-                    img = cv2.medianBlur(img, 5)
-                
-                h, w = img.shape[:2]
-                crop_size = min(h, w) // 2
-                x = random.randint(0, w - crop_size)
-                y = random.randint(0, h - crop_size)
-                img = img[y:y+crop_size, x:x+crop_size]
-                output_path = os.path.join(self.output_dir, f"{base}_cropped{ext}")
-                
-            elif operation == 'noise':
-                # 增加多层次噪声
-                for _ in range(3):  # 添加多层噪声
-                    noise = np.random.normal(0, 25, img.shape).astype(np.uint8)
-                    img = cv2.add(img, noise)
-                    # 添加椒盐噪声
-                    prob = 0.05
-                    thresh = 1 - prob 
-                    for i in range(img.shape[0]):
-                        for j in range(img.shape[1]):
-                            rdn = random.random()
-                            if rdn < prob:
-                                img[i][j] = 0
-                            elif rdn > thresh:
-                                img[i][j] = 255
-                
-                output_path = os.path.join(self.output_dir, f"{base}_noisy{ext}")
-                
-            elif operation == 'grayscale':
-                # 增加灰度处理的复杂度
-                img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-                # 添加直方图均衡化
-                img = cv2.equalizeHist(img)
-                # 添加自适应阈值处理
-                img = cv2.adaptiveThreshold(img, 255, 
-                                          cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                          cv2.THRESH_BINARY, 11, 2)
-                # 添加形态学操作
-                kernel = np.ones((5,5), np.uint8)
-                img = cv2.morphologyEx(img, cv2.MORPH_OPEN, kernel)
-                img = cv2.morphologyEx(img, cv2.MORPH_CLOSE, kernel)
-                
-                output_path = os.path.join(self.output_dir, f"{base}_gray{ext}")
-                
-            process_time = time.time() - process_start
-            print(f"图片处理耗时: {process_time:.2f}秒")
-            
-            # 3. 开始保存图片
-            save_start = time.time()
-            print(f"开始保存图片: {output_path}")
-            cv2.imwrite(output_path, img)
-            save_time = time.time() - save_start
-            print(f"图片保存耗时: {save_time:.2f}秒")
-            
-            # 计算总时间
-            total_time = load_time + process_time + save_time
-            print(f"总耗时: {total_time:.2f}秒")
-            
-            return output_path, {
-                'load_time': load_time,
-                'process_time': process_time,
-                'save_time': save_time,
-                'total_time': total_time
-            }
-            
-        except Exception as e:
-            print(f"处理图片时出错: {e}")
-            raise
+    def process_image(self, image_path, operation, seed=None):
+        """在当前进程中处理图片，详见image_tasks.process_image"""
+        return process_image(image_path, operation, self.output_dir, seed)
     
     def start(self):
         self._register_with_master()
         # 启动心跳线程
         heartbeat_thread = threading.Thread(target=self._send_heartbeat, daemon=True) # 设置为守护线程
         heartbeat_thread.start()
+        if self.metrics_port:
+            serve(self.metrics.registry, self.metrics_port)
         
         logging.info(f"从节点启动于端口 {self.port}")
         try:
@@ -140,8 +100,8 @@ class Slave:
                     # 设置accept超时，这样可以定期检查running状态
                     self.socket.settimeout(1.0)
                     client_socket, address = self.socket.accept() 
-                    threading.Thread(target=self._handle_task, 
-                                     args=(client_socket,)).start() # 启动线程处理任务
+                    threading.Thread(target=self._handle_connection, 
+                                     args=(client_socket,), daemon=True).start() # 启动线程处理连接
                 except socket.timeout:
                     continue
                 except Exception as e:
@@ -153,88 +113,254 @@ class Slave:
             self._cleanup()
     
     def _register_with_master(self): # 注册到主节点
-        master_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM) 
+        """建立与主节点的持久连接并发送注册消息，后续心跳复用该连接"""
+        self.master_conn = connect(self.master_address)
+        register_msg = {
+            'type': 'register',
+            'port': self.port
+        }
+        self.master_conn.send(register_msg)
+    
+    def _handle_connection(self, client_socket): # 处理连接，同一连接上可以连续发送多个任务
+        conn = Connection(client_socket)
         try:
-            master_socket.connect(self.master_address)
-            register_msg = {
-                'type': 'register',
-                'port': self.port
-            }
-            master_socket.send(json.dumps(register_msg).encode())
+            while self.running:
+                received_before = conn.bytes_received
+                received = conn.recv()
+                if received is None:
+                    break # 对端关闭连接
+                request_id, message = received
+                message_type = message.get('type', 'response') # 响应帧没有type字段
+                if message_type == 'ping':
+                    conn.send({'status': 'ok'}, request_id) # 延迟探测，直接响应
+                elif message_type in ('profile_start', 'profile_stop'):
+                    conn.send(self._handle_profile(message), request_id)
+                elif message_type != 'task':
+                    logging.warning(f"收到无法处理的消息类型: {message_type}")
+                    conn.send({'status': 'error', 'message': f"从节点不处理 {message_type} 消息"}, request_id)
+                else:
+                    labels = task_labels(message.get('data') or {})
+                    self.metrics.bytes_in.labels(*labels).inc(conn.bytes_received - received_before)
+                    response = self._handle_task(message)
+                    sent_before = conn.bytes_sent
+                    conn.send(response, request_id)
+                    self.metrics.bytes_out.labels(*labels).inc(conn.bytes_sent - sent_before)
+        except Exception as e:
+            logging.error(f"处理连接错误: {e}")
         finally:
-            master_socket.close()
+            conn.close()
     
-    def _handle_task(self, client_socket): # 处理任务
+    def _handle_profile(self, message):
+        """开始或结束剖析窗口，结束时返回折叠栈和内存分配统计，格式见profiler.py"""
         try:
-            data = client_socket.recv(1024).decode()
-            message = json.loads(data)
+            if message['type'] == 'profile_start':
+                response = self.profiler.start(message)
+                logging.info(f"开始剖析: {response}")
+                return response
+            return self.profiler.stop()
+        except (ProfileError, ValueError, TypeError) as e:
+            return {'status': 'error', 'message': str(e)}
+    
+    def _handle_task(self, message): # 处理任务，返回响应消息
+        labels = task_labels(message.get('data') or {})
+        self.metrics.tasks.labels(*labels).inc()
+        task_start = time.time()
+        trace_id = None
+        try:
+            if message['type'] != 'task':
+                raise Exception(f"未知消息类型: {message['type']}")
             task_data = message['data']
+            trace_id = self.tracer.continue_trace(task_data)
             
             if task_data['type'] == 'image':
-                print(f"接收到图片处理任务: {task_data['image_path']}")
-                output_path, time_stats = self.process_image(
-                    task_data['image_path'],
-                    task_data['operation']
-                )
-                
-                self.tasks_completed += 1
-                self.total_execution_time += time_stats['total_time']
+                self.task_log.debug('received', image_path=task_data['image_path'],
+                                    operation=task_data['operation'])
+                cache_key, seed = self._result_key(task_data)
+                output_path, time_stats = self._cached_result(cache_key, task_data)
+                cached = output_path is not None
+                if not cached:
+                    durability = task_data.get('durability') or self.durability
+                    if durability not in DURABILITY:
+                        raise Exception(f"未知的durability: {durability}")
+                    try:
+                        submit_time = time.time()
+                        future = self.worker_pool.submit(
+                            process_image,
+                            task_data['image_path'],
+                            task_data['operation'],
+                            self.output_dir,
+                            seed, # 随机种子：任务指定的种子，或由缓存键导出
+                            cache_key is not None, # 需要缓存时同时返回输出图片数据
+                            durability # 'queued'时结果交给写入线程后即回复
+                        )
+                    except QueueFull as e:
+                        # 队列已满时明确拒绝，主节点将任务重新发往另一个未饱和的节点（只重试一次）
+                        self.metrics.rejected.labels(*labels).inc()
+                        return {
+                            'status': 'rejected',
+                            'message': str(e),
+                            'load': self.worker_pool.stats()
+                        }
+                    result = future.result() # 等待工作进程完成
+                    elapsed = time.time() - submit_time
+                    if cache_key is not None:
+                        output_path, time_stats, data = result
+                        self.result_cache.put(cache_key, data)
+                    else:
+                        output_path, time_stats = result
+                    worker = time_stats.pop('worker')
+                    with self.stats_lock:
+                        self.worker_stats[worker.pop('pid')] = worker
+                    self.metrics.queue_wait.labels(*labels).observe(max(0.0, elapsed - time_stats['total_time']))
+                    self._trace_stages(trace_id, submit_time, time_stats.pop('start'), time_stats)
+                else:
+                    self.metrics.cache_hits.labels(*labels).inc()
+                self.metrics.observe_stages(labels, time_stats)
                 
-                # 更新算法统计
                 algorithm = task_data['algorithm']
-                self._update_algorithm_stats(algorithm, time_stats['total_time'])
+                with self.stats_lock:
+                    self.tasks_completed += 1
+                    self.total_execution_time += time_stats['total_time']
+                    
+                    # 更新算法统计（汇总统计不受日志采样影响）
+                    self._update_algorithm_stats(algorithm, time_stats['total_time'])
+                    tasks_completed = self.tasks_completed
+                    total_execution_time = self.total_execution_time
                 
-                # 写入日志
-                log_filename = f"slave_{self.port}_{algorithm}.log"
-                with open(log_filename, 'a') as f:
-                    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-                    f.write(f"[{timestamp}] 操作: {task_data['operation']}\n")
-                    f.write(f"[{timestamp}] 输入图片: {task_data['image_path']}\n")
-                    f.write(f"[{timestamp}] 输出图片: {output_path}\n")
-                    f.write(f"[{timestamp}] 图片加载时间: {time_stats['load_time']:.2f}秒\n")
-                    f.write(f"[{timestamp}] 图片处理时间: {time_stats['process_time']:.2f}秒\n")
-                    f.write(f"[{timestamp}] 图片保存时间: {time_stats['save_time']:.2f}秒\n")
-                    f.write(f"[{timestamp}] 总执行时间: {time_stats['total_time']:.2f}秒\n")
-                    f.write(f"[{timestamp}] 总任务数: {self.tasks_completed}\n")
-                    f.write(f"[{timestamp}] 累计执行时间: {self.total_execution_time:.2f}秒\n")
-                    f.write("-" * 50 + "\n")
+                # 写入任务日志：只入队，格式化和写文件由后台线程完成
+                if self.task_log.enabled('info'):
+                    self.task_log.emit('info', 'task',
+                                       algorithm=algorithm,
+                                       operation=task_data['operation'],
+                                       image_path=task_data['image_path'],
+                                       output_path=output_path,
+                                       cached=cached,
+                                       load_time=time_stats['load_time'],
+                                       process_time=time_stats['process_time'],
+                                       save_time=time_stats['save_time'],
+                                       total_time=time_stats['total_time'],
+                                       tasks=tasks_completed,
+                                       total_execution_time=total_execution_time)
                 
                 response = {
                     'status': 'success',
                     'execution_time': time_stats['total_time'],
                     'time_stats': time_stats,
-                    'output_path': output_path
+                    'output_path': output_path,
+                    'cached': cached,
+                    'load': self.worker_pool.stats() # 当前负载，主节点据此判断节点是否饱和
                 }
-                
-            client_socket.send(json.dumps(response).encode())
+            else:
+                raise Exception(f"未知任务类型: {task_data['type']}")
+            
+            self.tracer.add(trace_id, 'slave.task', task_start, time.time() - task_start,
+                            operation=labels[0], cached=cached)
+            return response
             
         except Exception as e:
             logging.error(f"处理任务错误: {e}")
-            response = {
+            self.task_log.error('task_failed', message=str(e))
+            self.metrics.errors.labels(*labels).inc()
+            self.tracer.add(trace_id, 'slave.task', task_start, time.time() - task_start,
+                            operation=labels[0], error=str(e))
+            return {
                 'status': 'error',
                 'message': str(e)
             }
-            client_socket.send(json.dumps(response).encode())
-        finally:
-            client_socket.close()
+    
+    def _trace_stages(self, trace_id, submit_time, start, time_stats):
+        """记录工作进程池中的等待和加载、处理、保存各阶段的span"""
+        if trace_id is None:
+            return
+        self.tracer.add(trace_id, 'slave.queue_wait', submit_time, start - submit_time)
+        for name in ('load', 'process', 'save'):
+            duration = time_stats[f'{name}_time']
+            self.tracer.add(trace_id, f'slave.{name}', start, duration)
+            start += duration
+    
+    def _result_key(self, task_data):
+        """
+        计算任务的缓存键和随机种子。
+        
+        任务没有指定种子时，种子由缓存键导出，相同输入和参数的任务得到相同的结果。
+        
+        Returns:
+            tuple: (缓存键, 随机种子)，未启用缓存或无法读取输入时缓存键为None
+        """
+        seed = task_data.get('seed')
+        operation = task_data['operation']
+        if self.result_cache is None or operation not in OPERATION_PARAMS:
+            return None, seed
+        try:
+            content_hash = self.content_hasher.digest(task_data['image_path'])
+        except OSError:
+            return None, seed # 由工作进程报告读取错误
+        ext = self.output_format or os.path.splitext(task_data['image_path'])[1]
+        params = dict(OPERATION_PARAMS[operation], self.output_options, seed=seed, ext=ext.lower())
+        key = result_key(content_hash, operation, params)
+        return key, seed if seed is not None else seed_from_key(key)
+    
+    def _cached_result(self, cache_key, task_data):
+        """
+        从结果缓存中取出结果并写入输出文件。
+        
+        Returns:
+            tuple: (输出图片路径, 各阶段耗时统计)，未命中时均为None
+        """
+        if cache_key is None:
+            return None, None
+        load_start = time.time()
+        data = self.result_cache.get(cache_key)
+        if data is None:
+            return None, None
+        load_time = time.time() - load_start
+        
+        save_start = time.time()
+        output_path = output_path_for(task_data['image_path'], task_data['operation'], self.output_dir,
+                                      self.output_format)
+        write_atomic(output_path, data)
+        save_time = time.time() - save_start
+        return output_path, {
+            'load_time': load_time,
+            'process_time': 0.0,
+            'save_time': save_time,
+            'total_time': load_time + save_time
+        }
+    
+    def _worker_summary(self, name):
+        """汇总各工作进程的某项统计（image_cache或output_writer），调用方需持有stats_lock"""
+        reports = [stats[name] for stats in self.worker_stats.values() if stats.get(name)]
+        if not reports:
+            return None
+        summary = {'workers': len(reports)}
+        for stats in reports:
+            for key, value in stats.items():
+                summary[key] = summary.get(key, 0) + value
+        return summary
     
     def _send_heartbeat(self):
         while True:
             try:
-                socket_hb = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                socket_hb.connect(self.master_address)
-                heartbeat_msg = {
-                    'type': 'heartbeat',
-                    'port': self.port,
-                    'tasks': self.tasks_completed,
-                    'total_execution_time': self.total_execution_time,
-                    'algorithm_stats': self.algorithm_stats
-                }
-                socket_hb.send(json.dumps(heartbeat_msg).encode())
+                if self.master_conn is None:
+                    self._register_with_master() # 连接断开后重新连接并注册
+                with self.stats_lock:
+                    heartbeat_msg = {
+                        'type': 'heartbeat',
+                        'port': self.port,
+                        'tasks': self.tasks_completed,
+                        'total_execution_time': self.total_execution_time,
+                        'algorithm_stats': self.algorithm_stats,
+                        'load': self.worker_pool.stats(), # 队列深度和活跃工作进程数
+                        'result_cache': self.result_cache.stats() if self.result_cache else None,
+                        'image_cache': self._worker_summary('image_cache'),
+                        'output_writer': self._worker_summary('output_writer') # 写入队列深度
+                    }
+                self.master_conn.send(heartbeat_msg)
             except Exception as e:
                 logging.error(f"心跳发送失败: {e}")
-            finally:
-                socket_hb.close()
+                if self.master_conn:
+                    self.master_conn.close()
+                self.master_conn = None
             time.sleep(10)
     
     def _signal_handler(self, signum, frame): 
@@ -245,6 +371,8 @@ class Slave:
         except:
             pass
         self.socket.close()
+        self.task_log.close() # 写完队列中剩余的日志
+        self.tracer.close()
         logging.info(f"从节点 {self.port} 已关闭")
         sys.exit(0)
     
@@ -255,6 +383,9 @@ class Slave:
         except:
             pass
         self.socket.close()
+        self.worker_pool.shutdown()
+        self.task_log.close()
+        self.tracer.close()
         logging.info(f"从节点 {self.port} 资源已清理")
     
     def _update_algorithm_stats(self, algorithm, execution_time):
@@ -270,14 +401,56 @@ class Slave:
         stats['count'] += 1
         stats['total_time'] += execution_time
         stats['avg_time'] = stats['total_time'] / stats['count']
-        
-        print(f"更新算法 {algorithm} 统计: 总任务数 {stats['count']}, 平均时间 {stats['avg_time']:.2f}秒")
 
 if __name__ == '__main__':
-    import sys
-    master_host = sys.argv[1] if len(sys.argv) > 1 else 'localhost'
-    master_port = int(sys.argv[2]) if len(sys.argv) > 2 else 5008
-    slave_port = int(sys.argv[3]) if len(sys.argv) > 3 else 5009
+    import argparse
+    parser = argparse.ArgumentParser(description='从节点')
+    parser.add_argument('master_host', nargs='?', default='localhost')
+    parser.add_argument('master_port', nargs='?', type=int, default=5008)
+    parser.add_argument('slave_port', nargs='?', type=int, default=5009)
+    parser.add_argument('--workers', type=int, default=None, help='工作进程数，默认等于CPU核心数')
+    parser.add_argument('--max-pending', type=int, default=None, help='等待队列长度，默认为工作进程数的2倍')
+    parser.add_argument('--cache-memory', type=int, default=256, help='结果缓存内存层容量（MB），0表示不使用')
+    parser.add_argument('--cache-disk', type=int, default=1024, help='结果缓存磁盘层容量（MB），0表示不使用')
+    parser.add_argument('--cache-dir', default=None, help='结果缓存目录，默认为cache_slave_<端口>')
+    parser.add_argument('--image-cache', type=int, default=512,
+                        help='解码图像缓存容量（MB，所有工作进程合计），0表示不使用')
+    parser.add_argument('--output-format', default=None, choices=['.jpg', '.png', '.webp'],
+                        help='输出图片格式，默认与输入图片相同')
+    parser.add_argument('--quality', type=int, default=95, help='JPEG/WebP编码质量（0-100）')
+    parser.add_argument('--png-compression', type=int, default=1, help='PNG压缩级别（0-9）')
+    parser.add_argument('--writer-threads', type=int, default=2, help='每个工作进程的输出写入线程数')
+    parser.add_argument('--writer-queue', type=int, default=8,
+                        help='每个工作进程排队等待写入的最大结果数，超过时处理阻塞（反压）')
+    parser.add_argument('--durability', default='written', choices=DURABILITY,
+                        help='任务未指定时的默认值: written 写入完成后回复; queued 交给写入线程后即回复')
+    parser.add_argument('--log-level', default='info', choices=list(LEVELS),
+                        help='任务日志的最低记录级别（debug 记录每个任务的接收）')
+    parser.add_argument('--log-sample', action='append', metavar='LEVEL=RATE',
+                        help='按级别采样任务日志，如 --log-sample info=0.01，可重复指定')
+    parser.add_argument('--metrics-port', type=int, default=0,
+                        help='Prometheus指标HTTP端口（GET /metrics），0表示不提供')
+    parser.add_argument('--trace', metavar='FILE', default=None,
+                        help='记录带追踪ID的任务，以Chrome trace-event JSON写入该文件')
+    parser.add_argument('--trace-sample', type=float, default=0.0,
+                        help='为没有追踪ID的任务新建追踪的概率（0-1），默认只记录上游发起的追踪')
+    args = parser.parse_args()
     
-    slave = Slave(master_host, master_port, slave_port)
-    slave.start() 
\ No newline at end of file
+    slave = Slave(args.master_host, args.master_port, args.slave_port,
+                  workers=args.workers, max_pending=args.max_pending,
+                  cache_memory=args.cache_memory * 1024 * 1024,
+                  cache_disk=args.cache_disk * 1024 * 1024,
+                  cache_dir=args.cache_dir,
+                  image_cache=args.image_cache * 1024 * 1024,
+                  output_format=args.output_format,
+                  quality=args.quality,
+                  png_compression=args.png_compression,
+                  writer_threads=args.writer_threads,
+                  writer_queue=args.writer_queue,
+                  durability=args.durability,
+                  log_level=args.log_level,
+                  log_sample=parse_sample_rates(args.log_sample),
+                  metrics_port=args.metrics_port,
+                  trace_path=args.trace,
+                  trace_sample=args.trace_sample)
+    slave.start()
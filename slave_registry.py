@@ -0,0 +1,100 @@
+import threading
+import time
+
+
+class SlaveRegistry:
+    """
+    主节点的从节点注册表。
+
+    从节点按 (host, port) 索引，注册、心跳和移除都是O(1)查找；
+    同一地址重复注册时更新已有记录，不会产生重复节点。
+
+    负载均衡器通过snapshot()取得节点列表：成员变化时生成新的元组并整体替换，
+    读取方拿到的元组不会再被修改，无需加锁，也不会看到更新了一半的列表。
+    心跳只更新节点记录中的字段，不改变成员，因此不重建快照。
+    """
+
+    def __init__(self):
+        self._slaves = {} # (host, port) -> 节点信息
+        self._lock = threading.Lock()
+        self._snapshot = ()
+
+    def _new_slave(self, address):
+        return {
+            'address': address, # 节点地址
+            'tasks': 0, # 任务数
+            'last_heartbeat': time.time(), # 最后一次心跳时间
+            'total_execution_time': 0, # 总执行时间
+            'algorithm_stats': {} # 算法统计信息
+        }
+
+    def _rebuild(self):
+        """成员变化后重建快照，调用方需持有_lock"""
+        self._snapshot = tuple(self._slaves.values())
+
+    def register(self, address):
+        """
+        注册从节点。
+
+        已注册的地址视为从节点重启后重新注册：保留原记录（其他线程可能正持有），
+        重置统计信息和心跳时间。
+
+        Returns:
+            tuple: (节点信息, 是否为新节点)
+        """
+        address = (address[0], int(address[1]))
+        with self._lock:
+            slave = self._slaves.get(address)
+            if slave is None:
+                slave = self._slaves[address] = self._new_slave(address)
+                self._rebuild()
+                return slave, True
+            slave.update(self._new_slave(address))
+            for key in ('load', 'load_updated'): # 重启前的负载信息已失效
+                slave.pop(key, None)
+            return slave, False
+
+    def heartbeat(self, address, **fields):
+        """
+        更新从节点的心跳时间和上报的状态。
+
+        Returns:
+            dict: 节点信息，未注册的节点返回None
+        """
+        address = (address[0], int(address[1]))
+        with self._lock:
+            slave = self._slaves.get(address)
+            if slave is None:
+                return None
+            slave.update(fields)
+            slave['last_heartbeat'] = time.time()
+            return slave
+
+    def remove(self, address):
+        """移除从节点，返回被移除的节点信息，不存在时返回None"""
+        address = (address[0], int(address[1]))
+        with self._lock:
+            slave = self._slaves.pop(address, None)
+            if slave is not None:
+                self._rebuild()
+            return slave
+
+    def get(self, address):
+        return self._slaves.get((address[0], int(address[1])))
+
+    def snapshot(self):
+        """当前从节点的不可变元组"""
+        return self._snapshot
+
+    def expired(self, timeout):
+        """心跳超过timeout秒的从节点地址列表"""
+        deadline = time.time() - timeout
+        return [slave['address'] for slave in self._snapshot if slave['last_heartbeat'] < deadline]
+
+    def status(self):
+        """各节点信息的副本，用于序列化（心跳线程可能同时在更新节点记录）"""
+        with self._lock:
+            return [dict(slave) for slave in self._slaves.values()]
+
+    def __len__(self):
+        return len(self._snapshot)
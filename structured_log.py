@@ -0,0 +1,167 @@
+"""
+结构化日志：记录放入内存队列，由后台线程批量写入文件。
+
+每条记录一行紧凑的JSON，例如:
+    {"ts":1700000000.123,"level":"info","event":"task","algorithm":"round_robin","total_time":0.21}
+
+调用方只做采样判断和入队，格式化和文件写入都在后台线程中完成。
+每个级别可以设置采样率（0-1），生产环境中可以调低逐任务的明细日志，
+汇总统计由调用方自己维护，不受采样影响。
+"""
+import json
+import logging
+import queue
+import random
+import threading
+import time
+
+LEVELS = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40}
+
+
+def parse_sample_rates(specs):
+    """
+    解析采样率设置，如 ['debug=0.01', 'info=0.1']。
+
+    Returns:
+        dict: 级别 -> 采样率
+    """
+    rates = {}
+    for spec in specs or ():
+        level, _, rate = spec.partition('=')
+        level = level.strip().lower()
+        if level not in LEVELS or not rate:
+            raise ValueError(f"无效的采样率设置: {spec}")
+        rate = float(rate)
+        if not 0 <= rate <= 1:
+            raise ValueError(f"采样率必须在0到1之间: {spec}")
+        rates[level] = rate
+    return rates
+
+
+class StructuredLog:
+    """
+    后台批量写入的结构化日志。
+
+    Args:
+        path (str): 日志文件路径（追加写入）
+        level (str): 最低记录级别
+        sample_rates (dict): 级别 -> 采样率，未设置的级别全部记录
+        max_queue (int): 队列容量，写入跟不上时丢弃新记录而不是阻塞调用方
+        batch_size (int): 每次写入的最大记录数
+        flush_interval (float): 队列不满一批时最长等待多少秒写入一次
+    """
+
+    def __init__(self, path, level='info', sample_rates=None, max_queue=10000, batch_size=256,
+                 flush_interval=1.0):
+        self.path = path
+        self.min_level = LEVELS[level]
+        self.sample_rates = dict(sample_rates or {})
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0 # 队列已满而丢弃的记录数
+        self.sampled_out = 0 # 因采样未记录的记录数
+        self._file = open(path, 'a', encoding='utf-8')
+        self._thread = threading.Thread(target=self._run, name='structured-log', daemon=True)
+        self._thread.start()
+
+    def enabled(self, level):
+        """
+        该级别的记录是否会被记录（级别过滤 + 采样），调用方可以据此跳过准备字段的开销。
+
+        每次调用都是一次独立的采样，返回True后应调用emit()而不是log()，否则会再采样一次。
+        """
+        if LEVELS[level] < self.min_level:
+            return False
+        rate = self.sample_rates.get(level, 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            with self._lock:
+                self.sampled_out += 1
+            return False
+        return True
+
+    def log(self, level, event, **fields):
+        """按级别过滤和采样后记录"""
+        if not self.enabled(level):
+            return
+        self.emit(level, event, **fields)
+
+    def emit(self, level, event, **fields):
+        """记录已经通过enabled()判断的记录，不再过滤和采样"""
+        self._put((time.time(), level, event, fields))
+
+    def debug(self, event, **fields):
+        self.log('debug', event, **fields)
+
+    def info(self, event, **fields):
+        self.log('info', event, **fields)
+
+    def warning(self, event, **fields):
+        self.log('warning', event, **fields)
+
+    def error(self, event, **fields):
+        self.log('error', event, **fields)
+
+    def _put(self, record):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _next_batch(self):
+        """等待第一条记录，再取出队列中已有的记录，最多batch_size条"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            closing = None in batch
+            records = [record for record in batch if record is not None]
+            if records:
+                self._write(records)
+            if closing:
+                return
+
+    def _write(self, records):
+        lines = []
+        for ts, level, event, fields in records:
+            entry = {'ts': round(ts, 3), 'level': level, 'event': event}
+            entry.update(fields)
+            lines.append(json.dumps(entry, ensure_ascii=False, separators=(',', ':'), default=str))
+        try:
+            self._file.write('\n'.join(lines) + '\n')
+            self._file.flush()
+        except Exception as e:
+            logging.error(f"写入结构化日志失败 {self.path}: {e}")
+            return
+        with self._lock:
+            self.written += len(records)
+
+    def close(self):
+        """写完队列中剩余的记录后关闭文件"""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(None) # 结束标记，排在已有记录之后
+        self._thread.join()
+        self._file.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'written': self.written,
+                'dropped': self.dropped,
+                'sampled_out': self.sampled_out
+            }
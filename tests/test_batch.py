@@ -0,0 +1,68 @@
+import pytest
+
+from batch import BatchError, batch_error, batch_tasks
+
+
+def batch(*items):
+    return {'type': 'batch', 'data': {'algorithm': 'least_connections', 'tasks': list(items)}}
+
+
+class FakeConnection:
+    def __init__(self):
+        self.sent = []
+        self.bytes_sent = 0
+
+    def send(self, message, request_id=0):
+        self.sent.append((request_id, message))
+
+
+def test_batch_tasks_expands_items():
+    tasks = batch_tasks(batch({'operation': 'noise', 'image_path': 'a.jpg', 'seed': 7},
+                              {'operation': 'crop', 'image_path': 'b.jpg', 'algorithm': 'random'}))
+    assert [task['data']['algorithm'] for task in tasks] == ['least_connections', 'random']
+    assert tasks[0]['data']['seed'] == 7
+    assert 'seed' not in tasks[1]['data']
+
+
+@pytest.mark.parametrize('item', [
+    {'image_path': 'a.jpg'},
+    {'operation': 'noise'},
+    {'operation': 'noise', 'image_path': None},
+    'a.jpg',
+])
+def test_malformed_item_rejects_whole_batch(item):
+    message = batch({'operation': 'noise', 'image_path': 'a.jpg'}, item)
+    with pytest.raises(BatchError, match='#1'):
+        batch_tasks(message)
+
+
+def test_malformed_tasks_field():
+    with pytest.raises(BatchError):
+        batch_tasks({'type': 'batch', 'data': {'tasks': 'a.jpg'}})
+    with pytest.raises(BatchError):
+        batch_tasks({'type': 'batch'})
+
+
+def test_batch_error_summary():
+    message = batch({'operation': 'noise', 'image_path': 'a.jpg'}, {'operation': 'noise'})
+    summary = batch_error(message, BatchError('bad'))
+    assert summary['type'] == 'batch_summary'
+    assert summary['status'] == 'error'
+    assert (summary['total'], summary['succeeded'], summary['failed']) == (2, 0, 2)
+
+
+def test_master_answers_malformed_batch_with_error_summary(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path) # master在导入时创建master.log
+    from master import Master
+    master = Master(host='127.0.0.1', port=0)
+    try:
+        conn = FakeConnection()
+        master._handle_batch(batch({'operation': 'noise', 'image_path': 'a.jpg'}, {'image_path': 'b.jpg'}),
+                             conn, 5)
+    finally:
+        master.socket.close()
+    assert len(conn.sent) == 1
+    request_id, summary = conn.sent[0]
+    assert request_id == 5
+    assert summary['type'] == 'batch_summary' and summary['status'] == 'error'
+    assert 'operation' in summary['message']
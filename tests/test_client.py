@@ -0,0 +1,61 @@
+from batch import batch_error, BatchError
+from client import Client
+
+IMAGES = ['image/a.jpg', 'image/b.jpg']
+
+
+class FakeConnection:
+    """按预设的帧序列响应stream请求"""
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.sent = []
+
+    def stream(self, message):
+        self.sent.append(message)
+        yield from self.frames
+
+    def close(self):
+        pass
+
+
+def run(frames):
+    client = Client()
+    client.connection = FakeConnection(frames)
+    return client, client.run('round_robin', IMAGES)
+
+
+def result(index, status='success'):
+    return {'type': 'batch_result', 'index': index, 'result': {'status': status}}
+
+
+def summary(succeeded, failed):
+    return {'type': 'batch_summary', 'total': succeeded + failed, 'succeeded': succeeded,
+            'failed': failed, 'elapsed': 0.1}
+
+
+def test_run_succeeds_when_all_tasks_succeed(capsys):
+    client, ok = run([result(0), result(1), summary(2, 0)])
+    assert ok
+    assert '成功2个' in capsys.readouterr().out
+    assert client.algorithm_report('round_robin')['errors'] == 0
+
+
+def test_run_fails_when_a_task_fails():
+    client, ok = run([result(0), result(1, 'error'), summary(1, 1)])
+    assert not ok
+
+
+def test_run_fails_when_batch_is_rejected(capsys):
+    rejected = batch_error({'data': {'tasks': [{}, {}]}}, BatchError('未知的负载均衡算法'))
+    client, ok = run([rejected])
+    assert not ok
+    assert '批量任务被拒绝' in capsys.readouterr().out
+    report = client.algorithm_report('round_robin')
+    assert report['sent'] == report['completed'] == report['errors'] == 2
+
+
+def test_run_fails_without_summary(capsys):
+    client, ok = run([result(0), result(1)])
+    assert not ok
+    assert '未收到批量任务汇总' in capsys.readouterr().out
@@ -0,0 +1,133 @@
+import socket
+import threading
+
+import pytest
+
+from connection_pool import ConnectionPool, PoolExhausted
+from protocol import Connection
+
+
+class FakeSlave:
+    """应答每个请求的从节点，记录接受的连接数和收到的请求数"""
+
+    def __init__(self):
+        self.sock = socket.create_server(('127.0.0.1', 0))
+        self.address = self.sock.getsockname()
+        self.connections = 0
+        self.requests = 0
+        self.release = threading.Event() # 清除后收到的请求等待set()再应答
+        self.release.set()
+        self.drop = False # 为True时收到请求后不应答，直接关闭连接
+        self.stopped = threading.Event()
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                sock, _ = self.sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self._handle, args=(Connection(sock),), daemon=True).start()
+
+    def _handle(self, conn):
+        try:
+            while True:
+                received = conn.recv()
+                if received is None:
+                    self.stopped.wait(5) # 对端关闭写方向后保持连接，直到从节点停止
+                    break
+                request_id, _ = received
+                self.requests += 1
+                if self.drop:
+                    break
+                self.release.wait(5)
+                conn.send({'status': 'success'}, request_id)
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    def close(self):
+        self.stopped.set()
+        self.release.set()
+        self.sock.close()
+
+
+@pytest.fixture
+def slave():
+    slave = FakeSlave()
+    yield slave
+    slave.close()
+
+
+def idle_connections(pool, address):
+    return [conn for conn, _ in pool._pools[tuple(address)].idle]
+
+
+def test_connection_is_reused(slave):
+    pool = ConnectionPool()
+    for _ in range(3):
+        assert pool.request(slave.address, {'type': 'ping'}) == {'status': 'success'}
+    stats = pool.stats()
+    assert (stats['hits'], stats['misses'], stats['idle']) == (2, 1, 1)
+    assert slave.connections == 1
+    pool.close()
+
+
+def test_idle_connections_capped_at_max_idle(slave):
+    pool = ConnectionPool(max_idle=1)
+    slave.release.clear()
+    threads = [threading.Thread(target=pool.request, args=(slave.address, {'type': 'ping'}))
+               for _ in range(3)]
+    for t in threads:
+        t.start()
+    while slave.requests < 3: # 三个请求同时在途，各占一个连接
+        threading.Event().wait(0.01)
+    slave.release.set()
+    for t in threads:
+        t.join(5)
+    stats = pool.stats()
+    assert (stats['misses'], stats['idle'], stats['in_use']) == (3, 1, 0)
+    pool.close()
+
+
+def test_pool_exhausted_when_concurrency_limit_reached(slave):
+    pool = ConnectionPool(max_concurrent=1, acquire_timeout=0.1)
+    slave.release.clear()
+    thread = threading.Thread(target=pool.request, args=(slave.address, {'type': 'ping'}))
+    thread.start()
+    while slave.requests < 1:
+        threading.Event().wait(0.01)
+    with pytest.raises(PoolExhausted):
+        pool.request(slave.address, {'type': 'ping'})
+    slave.release.set()
+    thread.join(5)
+    assert pool.request(slave.address, {'type': 'ping'}) == {'status': 'success'} # 名额已归还
+    pool.close()
+
+
+def test_stale_connection_retried_when_send_fails(slave):
+    pool = ConnectionPool()
+    pool.request(slave.address, {'type': 'ping'})
+    stale, = idle_connections(pool, slave.address)
+    stale.sock.shutdown(socket.SHUT_WR) # 从节点不关闭连接，连接仍通过存活检查，但发送会失败
+
+    assert pool.request(slave.address, {'type': 'ping'}) == {'status': 'success'}
+    stats = pool.stats()
+    assert (stats['hits'], stats['misses']) == (1, 2) # 重试新建的连接计为未命中
+    assert slave.requests == 2 # 失效连接上的请求没有发出
+    assert idle_connections(pool, slave.address) != [stale]
+    pool.close()
+
+
+def test_request_not_resent_after_it_was_sent(slave):
+    pool = ConnectionPool()
+    pool.request(slave.address, {'type': 'ping'})
+    slave.drop = True # 从节点收到请求后断开连接，不应答
+
+    with pytest.raises(ConnectionError):
+        pool.request(slave.address, {'type': 'task'})
+    assert slave.requests == 2 # 请求只发送了一次
+    assert pool.stats()['misses'] == 1
+    pool.close()
@@ -0,0 +1,27 @@
+from batch import batch_tasks
+from cost_model import CostModel
+
+SLAVE = ('127.0.0.1', 5009)
+
+
+def test_task_size_uses_input_size_only():
+    assert CostModel.task_size({'image_path': __file__, 'input_size': 1000}) == 1000
+    # 主节点不读取图片文件，即使路径存在
+    assert CostModel.task_size({'image_path': __file__}) is None
+
+
+def test_predict_scales_with_input_size():
+    model = CostModel()
+    model.observe(SLAVE, {'operation': 'noise', 'input_size': 1000}, 2.0)
+    assert model.predict(SLAVE, {'operation': 'noise', 'input_size': 3000}) == 6.0
+    # 没有输入大小时使用每任务平均耗时
+    assert model.predict(SLAVE, {'operation': 'noise'}) == 2.0
+
+
+def test_batch_items_keep_input_size():
+    tasks = batch_tasks({'type': 'batch', 'data': {'tasks': [
+        {'operation': 'noise', 'image_path': 'a.jpg', 'input_size': 4096},
+        {'operation': 'crop', 'image_path': 'b.jpg'},
+    ]}})
+    assert tasks[0]['data']['input_size'] == 4096
+    assert 'input_size' not in tasks[1]['data']
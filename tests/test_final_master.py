@@ -0,0 +1,118 @@
+import importlib.util
+import json
+import pathlib
+import socket
+import threading
+import time
+
+import pytest
+
+FINAL = pathlib.Path(__file__).resolve().parent.parent / 'final'
+
+
+@pytest.fixture
+def make_master(monkeypatch):
+    """创建final/master.py的Master，清空自动生成的任务并启动分发线程"""
+    monkeypatch.syspath_prepend(str(FINAL)) # final/master.py 导入同目录的 load_balance
+    spec = importlib.util.spec_from_file_location('final_master', FINAL / 'master.py') # 与顶层的master模块同名
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    masters = []
+
+    def make(credit_window, tasks):
+        master = module.Master(host='127.0.0.1', port=0, lb_algorithm='round_robin',
+                               credit_window=credit_window)
+        with master.condition:
+            master.task_queue.clear()
+            master.total_tasks = 0
+        for task_id, priority in tasks:
+            master.submit_task({'task_id': task_id, 'task_type': 'image_process', 'data': {}}, priority)
+        threading.Thread(target=master.task_dispatcher, daemon=True).start()
+        masters.append(master)
+        return master
+
+    yield make
+    for master in masters:
+        master.socket.close()
+
+
+class FakeSlave:
+    """通过socketpair连接到Master.handle_client的slave"""
+
+    def __init__(self, master, port):
+        self.address = ('127.0.0.1', port)
+        self.sock, master_end = socket.socketpair()
+        self.sock.settimeout(5)
+        self.reader = self.sock.makefile('r')
+        self.thread = threading.Thread(target=master.handle_client, args=(master_end, self.address), daemon=True)
+        self.thread.start()
+        self.send({'idle_cpu_threads': 4}) # 收到第一次心跳后才参与分发
+
+    def send(self, message):
+        self.sock.sendall((json.dumps(message) + '\n').encode('utf-8'))
+
+    def receive(self, count):
+        """读取count个任务的task_id"""
+        return [json.loads(self.reader.readline())['data']['task_id'] for _ in range(count)]
+
+    def complete(self, task_id, error=None):
+        message = {'task_complete': True, 'task_id': task_id}
+        if error:
+            message['error'] = error
+        self.send(message)
+
+    def disconnect(self):
+        self.reader.close()
+        self.sock.close()
+        self.thread.join(5)
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline, '等待超时'
+        time.sleep(0.01)
+
+
+def test_tasks_dispatched_in_priority_order(make_master):
+    master = make_master(10, [(0, 5), (1, 1), (2, 3), (3, 1), (4, 0)])
+    slave = FakeSlave(master, 6001)
+    assert slave.receive(5) == [4, 1, 3, 2, 0] # 优先级数值小的先分发，同一优先级按加入顺序
+    slave.disconnect()
+
+
+def test_credits_returned_on_completion_and_failure(make_master):
+    master = make_master(2, [(0, 0), (1, 0), (2, 0)])
+    slave = FakeSlave(master, 6001)
+    assert slave.receive(2) == [0, 1]
+    wait_until(lambda: master.credits[slave.address] == 0)
+    assert len(master.task_queue) == 1 # 额度用完后不再分发
+    assert set(master.in_flight[slave.address]) == {0, 1}
+
+    slave.complete(0)
+    assert slave.receive(1) == [2] # 归还的额度立即用于下一个任务
+    slave.complete(1, error='无法读取图片') # 失败的任务同样归还额度
+    slave.complete(2)
+    wait_until(lambda: master.completed_tasks == 3)
+    with master.condition:
+        assert master.credits[slave.address] == 2
+        assert master.in_flight[slave.address] == {}
+        assert master.failed_tasks == 1
+    slave.disconnect()
+
+
+def test_disconnect_requeues_in_flight_tasks(make_master):
+    master = make_master(2, [(0, 0), (1, 1), (2, 2)])
+    first = FakeSlave(master, 6001)
+    assert first.receive(2) == [0, 1]
+    first.disconnect()
+    with master.condition:
+        assert first.address not in master.credits
+        assert first.address not in master.in_flight
+        assert sorted(entry[2]['task_id'] for entry in master.task_queue) == [0, 1, 2]
+
+    second = FakeSlave(master, 6002)
+    assert second.receive(2) == [0, 1] # 放回的任务保持原来的优先级
+    second.complete(0)
+    assert second.receive(1) == [2]
+    second.disconnect()
@@ -0,0 +1,74 @@
+from hash_ring import HashRing
+from load_balancer import LoadBalancer
+
+NODES = [('127.0.0.1', 5000 + i) for i in range(5)]
+KEYS = [f"images/{i}.jpg" for i in range(10000)]
+
+
+def owners(ring):
+    return {key: ring.lookup(key) for key in KEYS}
+
+
+def test_adding_node_moves_about_one_nth_of_keys():
+    ring = HashRing()
+    for node in NODES[:4]:
+        ring.add(node)
+    before = owners(ring)
+    ring.add(NODES[4])
+    after = owners(ring)
+
+    moved = [key for key in KEYS if before[key] != after[key]]
+    assert all(after[key] == NODES[4] for key in moved) # 只有归属新节点的键移动
+    assert 0.1 < len(moved) / len(KEYS) < 0.3 # 约1/5
+
+
+def test_removing_node_moves_only_its_keys():
+    ring = HashRing()
+    for node in NODES:
+        ring.add(node)
+    before = owners(ring)
+    ring.remove(NODES[0])
+    after = owners(ring)
+
+    moved = [key for key in KEYS if before[key] != after[key]]
+    assert all(before[key] == NODES[0] for key in moved)
+    assert NODES[0] not in after.values()
+    assert 0.1 < len(moved) / len(KEYS) < 0.3
+
+
+def test_candidates_are_distinct_and_start_with_owner():
+    ring = HashRing()
+    for node in NODES:
+        ring.add(node)
+    for key in KEYS[:100]:
+        candidates = list(ring.candidates(key))
+        assert sorted(candidates) == sorted(NODES)
+        assert candidates[0] == ring.lookup(key)
+
+
+def test_bounded_load_overflows_to_next_node():
+    balancer = LoadBalancer(load_factor=1.0)
+    slaves = [{'address': node} for node in NODES[:2]]
+    task = {'image_path': 'images/hot.jpg'}
+    owner = balancer.select_slave(slaves, 'consistent_hash', task)
+    other = next(s for s in slaves if s is not owner)
+    assert balancer.select_slave(slaves, 'consistent_hash', task) is owner # 同一图片总是发往同一节点
+
+    # 上限为 ceil(1.0 * (2 + 1) / 2) = 2，归属节点已有2个未完成任务
+    balancer.task_started(owner['address'])
+    balancer.task_started(owner['address'])
+    assert balancer.select_slave(slaves, 'consistent_hash', task) is other
+
+    balancer.task_finished(owner['address'])
+    balancer.task_finished(owner['address'])
+    assert balancer.select_slave(slaves, 'consistent_hash', task) is owner
+
+
+def test_owner_missing_from_candidates_passes_to_next_node():
+    balancer = LoadBalancer()
+    slaves = [{'address': node} for node in NODES[:3]]
+    task = {'image_path': 'images/hot.jpg'}
+    owner = balancer.select_slave(slaves, 'consistent_hash', task)
+    expected = list(balancer.ring.candidates(task['image_path']))[1]
+    remaining = [s for s in slaves if s is not owner]
+    assert tuple(balancer.select_slave(remaining, 'consistent_hash', task)['address']) == expected
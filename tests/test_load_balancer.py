@@ -0,0 +1,43 @@
+import pytest
+
+from batch import BatchError, batch_tasks
+from load_balancer import ALGORITHMS, LoadBalancer, UnknownAlgorithm
+
+SLAVES = [{'address': ('127.0.0.1', 5009)}, {'address': ('127.0.0.1', 5010)}]
+
+
+@pytest.mark.parametrize('algorithm', [a for a in ALGORITHMS if a not in ('expected_completion_time',
+                                                                          'consistent_hash')])
+def test_known_algorithms_select_a_slave(algorithm):
+    assert LoadBalancer().select_slave(SLAVES, algorithm) in SLAVES
+
+
+def test_unknown_algorithm_is_rejected():
+    with pytest.raises(UnknownAlgorithm) as error:
+        LoadBalancer().select_slave(SLAVES, 'round_robn')
+    assert 'round_robn' in str(error.value)
+    assert all(name in str(error.value) for name in ALGORITHMS)
+
+
+def test_batch_with_unknown_algorithm_is_rejected():
+    with pytest.raises(BatchError, match='round_robn'):
+        batch_tasks({'type': 'batch', 'data': {'algorithm': 'round_robn', 'tasks': [
+            {'operation': 'noise', 'image_path': 'a.jpg'}]}})
+    with pytest.raises(BatchError, match='#0'):
+        batch_tasks({'type': 'batch', 'data': {'tasks': [
+            {'operation': 'noise', 'image_path': 'a.jpg', 'algorithm': 'fastest'}]}})
+
+
+def test_master_rejects_unknown_algorithm(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path) # master在导入时创建master.log
+    from master import Master
+    master = Master(host='127.0.0.1', port=0)
+    try:
+        master.registry.register(('127.0.0.1', 5009))
+        response = master._dispatch_task({'type': 'task', 'data': {
+            'type': 'image', 'operation': 'noise', 'image_path': 'a.jpg', 'algorithm': 'round_robn'}})
+    finally:
+        master.socket.close()
+    assert response['status'] == 'error'
+    assert 'least_connections' in response['message']
+    assert master.load_balancer.in_flight.get(('127.0.0.1', 5009), 0) == 0
@@ -0,0 +1,145 @@
+import asyncio
+import socket
+import threading
+
+import pytest
+
+from protocol import Connection
+
+
+@pytest.fixture
+def master_modules(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path) # master在导入时创建master.log
+    import async_master
+    import master
+    return master, async_master
+
+
+@pytest.mark.parametrize('message_type', ['batch_result', 'state_update', 'response'])
+def test_threaded_master_answers_unhandled_type(master_modules, message_type):
+    master = master_modules[0].Master(host='127.0.0.1', port=0)
+    server_sock, client_sock = socket.socketpair()
+    thread = threading.Thread(target=master._handle_connection, args=(server_sock, ('127.0.0.1', 0)))
+    thread.start()
+    client = Connection(client_sock)
+    client_sock.settimeout(5)
+    try:
+        response = client.request({'type': message_type} if message_type != 'response' else {})
+        assert response['status'] == 'error'
+        assert client.request({'type': 'health_check'})['status'] == 'ok' # 连接仍可继续使用
+    finally:
+        client.close()
+        thread.join(5)
+        master.socket.close()
+
+
+def async_request(master, message):
+    """通过socketpair向AsyncMaster发送一个请求并返回响应"""
+    async def run():
+        server_sock, client_sock = socket.socketpair()
+        reader, writer = await asyncio.open_connection(sock=server_sock)
+        handler = asyncio.create_task(master._handle_client(reader, writer))
+        client = Connection(client_sock)
+        client_sock.settimeout(5)
+        try:
+            return await asyncio.to_thread(client.request, message)
+        finally:
+            client.close()
+            await asyncio.wait_for(handler, 5)
+
+    try:
+        return asyncio.run(run())
+    finally:
+        master.socket.close()
+
+
+def test_async_master_answers_unhandled_type(master_modules):
+    response = async_request(master_modules[1].AsyncMaster(host='127.0.0.1', port=0), {'type': 'batch_summary'})
+    assert response['status'] == 'error'
+
+
+@pytest.mark.parametrize('message', [
+    {'type': 'task'},
+    {'type': 'task', 'data': 'a.jpg'},
+    {'type': 'task', 'data': {'operation': 'noise'}},
+])
+def test_async_master_answers_malformed_task(master_modules, message):
+    response = async_request(master_modules[1].AsyncMaster(host='127.0.0.1', port=0), message)
+    assert response['status'] == 'error'
+    assert 'image_path' in response['message']
+
+
+def test_threaded_master_rejects_malformed_task(master_modules):
+    master = master_modules[0].Master(host='127.0.0.1', port=0)
+    try:
+        response = master._dispatch_task({'type': 'task', 'data': None})
+    finally:
+        master.socket.close()
+    assert response['status'] == 'error'
+
+
+def test_async_master_answers_when_dispatch_raises(master_modules):
+    master = master_modules[1].AsyncMaster(host='127.0.0.1', port=0)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('选择失败')
+
+    master._select_slave = fail
+    response = async_request(master, {'type': 'task', 'data': {
+        'type': 'image', 'operation': 'noise', 'image_path': 'a.jpg', 'algorithm': 'random'}})
+    assert response == {'status': 'error', 'message': '处理任务错误: 选择失败'}
+
+
+class RejectingPool:
+    """按从节点端口给出响应的连接池，记录转发的地址"""
+
+    max_concurrent = 8
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.forwarded = []
+
+    def request(self, address, message):
+        self.forwarded.append(tuple(address))
+        return dict(self.responses[address[1]])
+
+
+REJECTED = {'status': 'rejected', 'message': '任务队列已满 (2)',
+            'load': {'workers': 1, 'queue_depth': 2, 'max_pending': 2}}
+TASK = {'type': 'task', 'data': {'type': 'image', 'operation': 'noise', 'image_path': 'a.jpg',
+                                 'algorithm': 'round_robin'}}
+
+
+@pytest.mark.parametrize('second', [{'status': 'success'}, REJECTED])
+def test_rejected_task_redispatched_once(master_modules, second):
+    master = master_modules[0].Master(host='127.0.0.1', port=0)
+    master.registry.register(('127.0.0.1', 5009))
+    master.registry.register(('127.0.0.1', 5010))
+    master.connection_pool = RejectingPool({5009: REJECTED, 5010: second})
+    master.load_balancer.round_robin_counter = iter([0, 0]) # 两次都选候选列表中的第一个
+    try:
+        response = master._dispatch_task(TASK)
+    finally:
+        master.socket.close()
+    assert master.connection_pool.forwarded == [('127.0.0.1', 5009), ('127.0.0.1', 5010)]
+    assert response['status'] == second['status']
+    assert response['slave'] == '127.0.0.1:5010'
+
+
+def test_async_rejected_task_redispatched(master_modules):
+    master = master_modules[1].AsyncMaster(host='127.0.0.1', port=0)
+    master.registry.register(('127.0.0.1', 5009))
+    master.registry.register(('127.0.0.1', 5010))
+    pool = RejectingPool({5009: REJECTED, 5010: {'status': 'success'}})
+
+    async def request(address, message):
+        return pool.request(address, message)
+
+    master.connection_pool.request = request
+    master.load_balancer.round_robin_counter = iter([0, 0])
+    try:
+        response = asyncio.run(master._dispatch_task_async(TASK))
+    finally:
+        master.socket.close()
+    assert pool.forwarded == [('127.0.0.1', 5009), ('127.0.0.1', 5010)]
+    assert response == {'status': 'success', 'slave': '127.0.0.1:5010'}
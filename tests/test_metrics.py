@@ -0,0 +1,53 @@
+import pytest
+
+from metrics import Counter, Histogram, Registry, _Metric, task_labels
+
+
+def test_metric_base_is_abstract():
+    with pytest.raises(TypeError):
+        _Metric('m', 'help')
+
+    class Incomplete(_Metric):
+        kind = 'counter'
+
+        def _new_child(self):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete('m', 'help')
+
+
+def test_unknown_algorithm_label_is_other():
+    assert task_labels({'operation': 'noise', 'algorithm': 'round_robin'}) == ('noise', 'round_robin')
+    assert task_labels({'operation': 'noise', 'algorithm': 'round_robn'}) == ('noise', 'other')
+    assert task_labels({'operation': 'noise'}) == ('noise', 'other')
+
+
+@pytest.mark.parametrize('operation', ['crop', 'noise', 'grayscale', 'batch'])
+def test_known_operation_labels_kept(operation):
+    assert task_labels({'operation': operation, 'algorithm': 'random'}) == (operation, 'random')
+
+
+def test_unknown_operation_label_is_other():
+    assert task_labels({'operation': 'sharpen', 'algorithm': 'random'}) == ('other', 'random')
+    assert task_labels({'algorithm': 'random'}) == ('other', 'random')
+    registry = Registry()
+    tasks = registry.counter('tasks_total', '任务数', ('operation', 'algorithm'))
+    for i in range(100):
+        tasks.labels(*task_labels({'operation': f'op{i}', 'algorithm': f'alg{i}'})).inc()
+    assert registry.render().count('tasks_total{') == 1
+
+
+def test_render():
+    registry = Registry()
+    tasks = registry.counter('tasks_total', '任务数', ('operation', 'algorithm'))
+    latency = registry.histogram('task_seconds', '耗时', buckets=(0.1, 1.0))
+    assert isinstance(tasks, Counter) and isinstance(latency, Histogram)
+    tasks.labels('noise', 'random').inc(2)
+    latency.observe(0.5)
+    text = registry.render()
+    assert 'tasks_total{operation="noise",algorithm="random"} 2' in text
+    assert 'task_seconds_bucket{le="0.1"} 0' in text
+    assert 'task_seconds_bucket{le="1.0"} 1' in text
+    assert 'task_seconds_bucket{le="+Inf"} 1' in text
+    assert 'task_seconds_count 1' in text
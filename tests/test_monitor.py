@@ -0,0 +1,34 @@
+import pytest
+
+pytest.importorskip('flask')
+
+from cluster_state import StateDiff
+from monitor import Monitor
+
+
+def slave(port, tasks=0, heartbeat=0.0):
+    return {'address': ('127.0.0.1', port), 'tasks': tasks, 'total_execution_time': tasks * 0.5,
+            'last_heartbeat': heartbeat, 'load': {'queue_depth': 0}}
+
+
+def test_every_slave_sampled_on_each_push():
+    monitor = Monitor()
+    diff = StateDiff()
+    monitor._apply(diff.update([slave(5009), slave(5010)], master_status='running', time=1.0))
+    # 只有5009变化，5010空闲
+    monitor._apply(diff.update([slave(5009, 4, 1.0), slave(5010)], master_status='running', time=2.0))
+    assert list(monitor.latest['changed']) == ['127.0.0.1:5009']
+    assert set(monitor.latest['points']) == {'127.0.0.1:5009', '127.0.0.1:5010'}
+    assert [len(series.points) for series in monitor.series.values()] == [2, 2]
+
+
+def test_subscription_loss_notifies_sse_clients():
+    monitor = Monitor()
+    monitor._apply(StateDiff().update([slave(5009)], master_status='running', time=1.0))
+    version = monitor.version
+    monitor._master_unknown()
+    assert monitor.version == version + 1
+    assert monitor.latest['master_status'] == 'unknown'
+    assert monitor.latest['changed'] == {} and monitor.latest['points'] == {}
+    monitor._master_unknown() # 重连失败不重复通知
+    assert monitor.version == version + 1
@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('cv2')
+
+from noise import add_gaussian_noise, add_salt_pepper_noise, apply_noise, make_rng
+
+
+def histogram(img):
+    """归一化的256档像素值直方图"""
+    hist = np.bincount(img.ravel(), minlength=256).astype(np.float64)
+    return hist / hist.sum()
+
+
+def random_image(height=240, width=320, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+
+def test_same_seed_reproduces_output():
+    img = random_image(60, 80)
+    first = apply_noise(img.copy(), make_rng(42))
+    assert np.array_equal(first, apply_noise(img.copy(), make_rng(42)))
+    assert not np.array_equal(first, apply_noise(img.copy(), make_rng(43)))
+
+
+def test_read_only_input_is_copied():
+    img = random_image(60, 80)
+    img.flags.writeable = False
+    original = img.copy()
+    result = apply_noise(img, make_rng(1))
+    assert result is not img
+    assert np.array_equal(img, original)
+
+
+@pytest.mark.parametrize('base', [0, 128, 200, 250, 255])
+def test_gaussian_noise_saturates_without_wraparound(base):
+    img = np.full((120, 160, 3), base, dtype=np.uint8)
+    # 用相同种子重新生成add_gaussian_noise使用的噪声（截断后按uint8回绕）
+    noise = make_rng(7).standard_normal(img.shape, dtype=np.float32)
+    noise *= 25.0
+    noise = noise.astype(np.int16).astype(np.uint8)
+
+    result = add_gaussian_noise(img.copy(), make_rng(7))
+
+    expected = np.minimum(img.astype(np.int32) + noise.astype(np.int32), 255)
+    assert np.array_equal(result, expected.astype(np.uint8)) # 饱和加法，超过255的取255
+    assert (result >= img).all() # 没有任何像素因溢出回绕变小
+    if base >= 200:
+        assert (result == 255).any()
+
+
+def test_salt_pepper_fractions():
+    img = np.full((400, 500, 3), 128, dtype=np.uint8)
+    prob = 0.05
+    result = add_salt_pepper_noise(img, make_rng(3), prob)
+    pixels = result.reshape(-1, 3)
+    # 每个像素的所有通道一起置0或255
+    assert ((pixels == pixels[:, :1]).all(axis=1)).all()
+    values = pixels[:, 0]
+    assert abs(np.mean(values == 0) - prob) < 0.005
+    assert abs(np.mean(values == 255) - prob) < 0.005
+    assert np.mean(values == 128) == pytest.approx(1 - 2 * prob, abs=0.01)
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning') # 原实现把负的浮点数直接转为uint8
+def test_histogram_matches_legacy_implementation():
+    from benchmarks.bench_noise import legacy_noise
+
+    img = random_image()
+    random.seed(0)
+    np.random.seed(0)
+    legacy = legacy_noise(img.copy())
+    vectorized = apply_noise(img.copy(), make_rng(0))
+
+    tvd = 0.5 * np.abs(histogram(legacy) - histogram(vectorized)).sum() # 总变差距离
+    assert tvd < 0.04
+    assert np.mean(vectorized == 0) == pytest.approx(np.mean(legacy == 0), abs=0.01)
+    assert np.mean(vectorized == 255) == pytest.approx(np.mean(legacy == 255), abs=0.01)
@@ -0,0 +1,103 @@
+import threading
+import time
+
+from slave_registry import SlaveRegistry
+
+A = ('127.0.0.1', 5009)
+B = ('127.0.0.1', 5010)
+
+
+def test_register_update_remove():
+    registry = SlaveRegistry()
+    slave, is_new = registry.register(A)
+    assert is_new and slave['address'] == A
+    assert registry.register(['127.0.0.1', '5009']) == (slave, False) # 地址格式不同也是同一节点
+    assert len(registry) == 1
+
+    assert registry.heartbeat(A, load={'queue_depth': 1}, tasks=3) is slave
+    assert slave['tasks'] == 3 and slave['load'] == {'queue_depth': 1}
+    assert registry.heartbeat(B, tasks=1) is None # 未注册的节点
+
+    slave['load_updated'] = time.time()
+    again, is_new = registry.register(A) # 从节点重启后重新注册
+    assert again is slave and not is_new
+    assert slave['tasks'] == 0 and 'load' not in slave and 'load_updated' not in slave
+
+    assert registry.remove(A) is slave
+    assert registry.remove(A) is None
+    assert registry.get(A) is None
+    assert len(registry) == 0 and registry.snapshot() == ()
+
+
+def test_snapshot_replaced_only_on_membership_change():
+    registry = SlaveRegistry()
+    registry.register(A)
+    before = registry.snapshot()
+    registry.register(B)
+    after = registry.snapshot()
+    assert [s['address'] for s in before] == [A] # 已取得的快照不被修改
+    assert [s['address'] for s in after] == [A, B]
+
+    registry.heartbeat(A, tasks=1)
+    registry.register(B)
+    assert registry.snapshot() is after # 心跳和重新注册不重建快照
+
+    registry.remove(A)
+    assert [s['address'] for s in after] == [A, B]
+    assert [s['address'] for s in registry.snapshot()] == [B]
+
+
+def test_snapshot_consistent_during_concurrent_updates():
+    registry = SlaveRegistry()
+    stop = threading.Event()
+    errors = []
+
+    def churn(port):
+        address = ('127.0.0.1', port)
+        while not stop.is_set():
+            registry.register(address)
+            registry.heartbeat(address, tasks=1)
+            registry.remove(address)
+
+    def read():
+        while not stop.is_set():
+            addresses = [s['address'] for s in registry.snapshot()]
+            if len(set(addresses)) != len(addresses) or len(addresses) > 4: # 没有重复或多余的节点
+                errors.append(addresses)
+
+    threads = [threading.Thread(target=churn, args=(port,)) for port in range(6000, 6004)]
+    threads.append(threading.Thread(target=read))
+    for t in threads:
+        t.start()
+    time.sleep(0.3)
+    stop.set()
+    for t in threads:
+        t.join(5)
+    assert errors == []
+    assert len(registry) == 0
+
+
+def test_expired_lists_slaves_past_timeout():
+    registry = SlaveRegistry()
+    stale, _ = registry.register(A)
+    registry.register(B)
+    stale['last_heartbeat'] = time.time() - 60
+    assert registry.expired(30) == [A]
+
+    registry.heartbeat(A)
+    assert registry.expired(30) == []
+
+
+def test_master_evicts_slaves_past_heartbeat_timeout(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path) # master在导入时创建master.log
+    from master import Master
+    master = Master(host='127.0.0.1', port=0)
+    try:
+        stale, _ = master.registry.register(A)
+        master.registry.register(B)
+        stale['last_heartbeat'] = time.time() - 60
+        master._remove_offline_slaves()
+        assert [s['address'] for s in master.slaves] == [B]
+        assert master.registry.get(A) is None
+    finally:
+        master.socket.close()
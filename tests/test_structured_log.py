@@ -0,0 +1,42 @@
+import json
+import random
+
+from structured_log import StructuredLog
+
+
+def read_records(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_enabled_then_emit_samples_once(tmp_path):
+    random.seed(1)
+    path = tmp_path / 'slave.jsonl'
+    log = StructuredLog(str(path), 'info', {'info': 0.5}, max_queue=20000)
+    total = 10000
+    for i in range(total):
+        if log.enabled('info'): # 与slave.py中的用法相同
+            log.emit('info', 'task', index=i)
+    log.close()
+    stats = log.stats()
+    written = len(read_records(path))
+    assert stats['written'] == written
+    assert stats['written'] + stats['sampled_out'] == total # 每条记录只采样一次
+    assert abs(written / total - 0.5) < 0.03
+
+
+def test_log_samples_and_filters_levels(tmp_path):
+    random.seed(2)
+    path = tmp_path / 'slave.jsonl'
+    log = StructuredLog(str(path), 'info', {'info': 0.25}, max_queue=20000)
+    for i in range(8000):
+        log.info('task', index=i)
+        log.debug('received', index=i) # 低于最低级别，不计入采样
+    log.error('task_failed', message='x')
+    log.close()
+    stats = log.stats()
+    records = read_records(path)
+    assert stats['sampled_out'] + stats['written'] == 8001
+    assert sum(record['level'] == 'error' for record in records) == 1
+    assert not any(record['level'] == 'debug' for record in records)
+    assert abs((len(records) - 1) / 8000 - 0.25) < 0.03
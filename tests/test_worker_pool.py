@@ -0,0 +1,28 @@
+import time
+
+import pytest
+
+from worker_pool import QueueFull, WorkerPool
+
+
+@pytest.fixture
+def pool():
+    pool = WorkerPool(workers=1, max_pending=1)
+    yield pool
+    pool.shutdown()
+
+
+def test_submit_rejected_when_queue_full(pool):
+    running = pool.submit(time.sleep, 1)
+    queued = pool.submit(time.sleep, 0)
+    stats = pool.stats()
+    assert (stats['active_workers'], stats['queue_depth']) == (1, 1)
+
+    with pytest.raises(QueueFull):
+        pool.submit(time.sleep, 0)
+    assert pool.stats()['rejected'] == 1
+
+    running.result(30)
+    queued.result(30)
+    assert pool.submit(time.sleep, 0).result(30) is None # 队列空出后可以再次提交
+    assert pool.completed >= 2
@@ -0,0 +1,149 @@
+"""
+任务的端到端追踪，输出 Chrome trace-event JSON（可用 chrome://tracing 或 https://ui.perfetto.dev 打开）。
+
+追踪ID由发起方（通常是客户端）按采样率分配，放在任务数据的'trace_id'字段中，
+随任务经主节点转发到从节点；各进程只为带追踪ID的任务记录各阶段的耗时（span）。
+未采样的任务不带追踪ID，各进程不记录任何内容。
+
+span先缓存在内存中（有上限，超出时丢弃最旧的），由后台线程定期整体写入本进程的文件。
+各进程的文件可以合并成一个，在同一时间轴上查看:
+    python tracing.py merge -o trace.json client_trace.json master_trace.json slave_5009_trace.json
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+
+
+def new_trace_id():
+    return os.urandom(8).hex()
+
+
+class Tracer:
+    """
+    一个进程的span缓冲区和导出。
+
+    Args:
+        path (str): 输出文件路径，为None时不记录（所有方法立即返回）
+        process_name (str): 在追踪查看器中显示的进程名
+        sample_rate (float): 为没有追踪ID的任务新建追踪的概率（0-1）
+        max_events (int): 内存中最多缓存的span数
+        flush_interval (float): 写入文件的间隔（秒）
+    """
+
+    def __init__(self, path=None, process_name='', sample_rate=1.0, max_events=100000, flush_interval=5.0):
+        self.path = path
+        self.enabled = path is not None
+        self.process_name = process_name
+        self.sample_rate = sample_rate
+        self.flush_interval = flush_interval
+        self.pid = os.getpid()
+        self._events = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._closed = threading.Event()
+        if self.enabled:
+            threading.Thread(target=self._run, name='tracer', daemon=True).start()
+
+    def start_trace(self):
+        """按采样率新建追踪，返回追踪ID，未采样时返回None"""
+        if not self.enabled or random.random() >= self.sample_rate:
+            return None
+        return new_trace_id()
+
+    def continue_trace(self, task):
+        """
+        返回任务的追踪ID：任务已带追踪ID时沿用，否则按采样率新建并写入任务数据，
+        使下游进程继续同一个追踪。
+        """
+        trace_id = task.get('trace_id')
+        if trace_id is None and self.enabled:
+            trace_id = self.start_trace()
+            if trace_id is not None:
+                task['trace_id'] = trace_id
+        return trace_id if self.enabled else None
+
+    def add(self, trace_id, name, start, duration, **args):
+        """
+        记录一个span。
+
+        Args:
+            trace_id (str): 追踪ID，为None时不记录
+            name (str): 阶段名称
+            start (float): 开始时间（time.time()）
+            duration (float): 耗时（秒）
+            args: 附加到span上的字段
+        """
+        if trace_id is None or not self.enabled:
+            return
+        args['trace_id'] = trace_id
+        event = {
+            'name': name,
+            'cat': 'task',
+            'ph': 'X', # 完整事件：开始时间 + 耗时
+            'ts': round(start * 1e6), # 微秒
+            'dur': round(max(duration, 0.0) * 1e6),
+            'pid': self.pid,
+            'tid': threading.get_ident(),
+            'args': args
+        }
+        with self._lock:
+            self._events.append(event)
+            self._dirty = True
+
+    def _metadata(self):
+        return [{'name': 'process_name', 'ph': 'M', 'pid': self.pid,
+                 'args': {'name': self.process_name or str(self.pid)}}]
+
+    def export(self):
+        """将缓存的全部span写入文件（先写临时文件再改名）"""
+        if not self.enabled:
+            return
+        with self._lock:
+            events = list(self._events)
+            self._dirty = False
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': self._metadata() + events, 'displayTimeUnit': 'ms'}, f,
+                      ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    def _run(self):
+        while not self._closed.wait(self.flush_interval):
+            if self._dirty:
+                try:
+                    self.export()
+                except Exception as e:
+                    logging.error(f"导出追踪失败 {self.path}: {e}")
+
+    def close(self):
+        """停止后台写入并写出剩余的span"""
+        if not self.enabled or self._closed.is_set():
+            return
+        self._closed.set()
+        self.export()
+
+
+def merge(paths, output):
+    """合并多个进程的追踪文件"""
+    events = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            events.extend(json.load(f)['traceEvents'])
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False, separators=(',', ':'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='追踪文件工具')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    merge_parser = subparsers.add_parser('merge', help='合并多个进程的追踪文件')
+    merge_parser.add_argument('paths', nargs='+', help='各进程的追踪文件')
+    merge_parser.add_argument('-o', '--output', default='trace.json', help='输出文件')
+    args = parser.parse_args()
+    merge(args.paths, args.output)
+    print(f"已合并 {len(args.paths)} 个追踪文件到 {args.output}")
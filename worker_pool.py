@@ -0,0 +1,85 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+
+class QueueFull(Exception):
+    """等待队列已满，任务被拒绝"""
+
+
+class WorkerPool:
+    """
+    从节点的任务执行引擎：固定数量的工作进程 + 有界等待队列。
+
+    图片处理在工作进程中执行，不受GIL限制；工作进程数默认等于CPU核心数。
+    正在执行和排队的任务总数达到上限后，新任务直接被拒绝，而不是无限堆积。
+
+    属性:
+        workers (int): 工作进程数
+        max_pending (int): 等待队列的最大长度（不含正在执行的任务）
+    """
+
+    def __init__(self, workers=None, max_pending=None, initializer=None, initargs=()):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = self.workers * 2 if max_pending is None else max_pending
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'), # 从节点是多线程进程，不使用fork
+            initializer=initializer,
+            initargs=initargs
+        )
+        self._lock = threading.Lock()
+        self._in_flight = 0 # 已提交但未完成的任务数（执行中 + 排队中）
+        self.completed = 0
+        self.rejected = 0
+
+    def submit(self, fn, *args):
+        """
+        提交任务。
+
+        Returns:
+            concurrent.futures.Future: 任务结果
+
+        Raises:
+            QueueFull: 等待队列已满
+        """
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_pending:
+                self.rejected += 1
+                raise QueueFull(f"任务队列已满 ({self.max_pending})")
+            self._in_flight += 1
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future):
+        with self._lock:
+            self._in_flight -= 1
+            self.completed += 1
+
+    def stats(self):
+        """
+        执行引擎状态。
+
+        进程池按提交顺序执行任务，因此任务数不超过进程数时全部在执行，
+        超出部分在队列中等待。
+        """
+        with self._lock:
+            in_flight = self._in_flight
+            rejected = self.rejected
+        return {
+            'workers': self.workers,
+            'active_workers': min(in_flight, self.workers),
+            'queue_depth': max(0, in_flight - self.workers),
+            'max_pending': self.max_pending,
+            'rejected': rejected
+        }
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)